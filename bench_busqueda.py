@@ -0,0 +1,93 @@
+"""
+Benchmark: ?search= de insumos con SearchFilter (OR de icontains) vs search_document.
+
+Crea una BD de prueba aparte (no toca db.sqlite3), siembra N insumos y compara
+el tiempo de:
+  - viejo: Q(nombre__icontains) | Q(codigo__icontains) | Q(referencia__icontains) | Q(observacion__icontains)
+  - nuevo: inventario.busqueda.filtrar (FTS5 trigram en SQLite / GIN pg_trgm en PostgreSQL)
+
+Uso:
+    python bench_busqueda.py [--filas 100000]
+"""
+import os
+import sys
+import time
+import argparse
+from functools import reduce
+from operator import or_
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from inventario.busqueda import documento, filtrar
+from inventario.models import Bodega, Insumo
+
+PALABRAS = ["tela", "botón", "hilo", "cremallera", "etiqueta", "resorte", "forro", "entretela", "broche", "cordón"]
+COLORES = ["azul", "rojo", "negro", "blanco", "verde", "gris", "beige", "café"]
+
+
+def sembrar(filas):
+    bodega = Bodega.objects.create(codigo="B01", nombre="BODEGA")
+    lote = []
+    for i in range(filas):
+        nombre = f"{PALABRAS[i % len(PALABRAS)]} {COLORES[(i // 7) % len(COLORES)]} {i}"
+        codigo = f"INS-{i:06d}"
+        obs = "importado" if i % 13 == 0 else ""
+        lote.append(Insumo(
+            codigo=codigo, referencia=codigo, nombre=nombre, observacion=obs, bodega=bodega,
+            # bulk_create no pasa por save(): el documento se arma aquí
+            search_document=documento(codigo, codigo, nombre, obs),
+        ))
+    Insumo.objects.bulk_create(lote, batch_size=2000)
+
+
+def viejo(texto):
+    qs = Insumo.objects.all()
+    for t in texto.split():
+        qs = qs.filter(reduce(or_, [Q(**{f"{c}__icontains": t}) for c in ("nombre", "codigo", "referencia", "observacion")]))
+    return qs
+
+
+def nuevo(texto):
+    return filtrar(Insumo.objects.all(), texto)
+
+
+def medir(qs, repeticiones=10):
+    n = len(list(qs.values_list("pk", flat=True)[:30]))
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        list(qs.values_list("pk", flat=True)[:30])
+        qs.count()
+    return (time.perf_counter() - t0) / repeticiones * 1000, n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        sembrar(args.filas)
+        with connection.cursor() as cur:
+            cur.execute("ANALYZE")
+
+        for texto in ["cremallera", "azul importado", "INS-0999", "café 4321"]:
+            ms_v, n_v = medir(viejo(texto))
+            ms_n, n_n = medir(nuevo(texto))
+            print(f"{texto!r:<20} viejo {ms_v:8.2f} ms ({n_v})   nuevo {ms_n:8.2f} ms ({n_n})")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
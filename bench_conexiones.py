@@ -0,0 +1,116 @@
+"""
+Benchmark: costo de abrir la conexión a la BD en cada request vs reutilizarla
+(DB_CONN_MAX_AGE / DB_CONN_HEALTH_CHECKS / DB_PGBOUNCER en config/settings.py).
+
+Simula el ciclo de un request de Django sin HTTP: request_started (Django
+cierra ahí las conexiones vencidas o rotas), --consultas SELECT 1 y
+request_finished (con CONN_MAX_AGE=0 cierra la conexión). Modos:
+
+  por-request         CONN_MAX_AGE=0, lo que había antes: conexión nueva cada vez
+  persistente         CONN_MAX_AGE=60, sin health check
+  persistente+check   CONN_MAX_AGE=60 y CONN_HEALTH_CHECKS (un SELECT 1 extra
+                      al reutilizarla en un request nuevo)
+  configurado         lo que diga settings tal cual
+
+Por modo: ms por request (media, p50, p95) y conexiones abiertas. Usa la BD de
+DATABASE_URL y no escribe nada. Contra SQLite local la diferencia es mínima:
+lo que importa es contra Neon (TLS + auth en cada conexión nueva), p. ej.
+
+    DATABASE_URL=postgres://...neon.tech/inventario python bench_conexiones.py --requests 200
+
+Uso:
+    python bench_conexiones.py [--requests 100] [--consultas 3] [--modo por-request --modo persistente]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from inventario.utils.estadistica import percentil
+
+MODOS = {
+    "por-request": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    "persistente": {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": False},
+    "persistente+check": {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True},
+    "configurado": {},
+}
+
+
+def medir(modo, requests, consultas):
+    original = {k: connection.settings_dict[k] for k in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+    connection.close()
+    connection.settings_dict.update(MODOS[modo])
+
+    conexiones = []
+
+    def contar(sender, connection, **kwargs):
+        conexiones.append(connection.alias)
+
+    connection_created.connect(contar)
+    tiempos = []
+    try:
+        for _ in range(requests):
+            inicio = time.perf_counter()
+            request_started.send(sender=None)
+            with connection.cursor() as cursor:
+                for _ in range(consultas):
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+            request_finished.send(sender=None)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    finally:
+        connection_created.disconnect(contar)
+        connection.close()
+        connection.settings_dict.update(original)
+
+    return {
+        "ms_media": statistics.mean(tiempos),
+        "ms_p50": statistics.median(tiempos),
+        "ms_p95": percentil(tiempos, 95),
+        "conexiones": len(conexiones),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--consultas", type=int, default=3, help="SELECT 1 por request.")
+    parser.add_argument("--modo", action="append", choices=list(MODOS), help="Se puede repetir (por defecto todos).")
+    args = parser.parse_args()
+
+    db = connection.settings_dict
+    print(f"BD: {connection.vendor} {db.get('HOST') or db.get('NAME')}  "
+          f"(settings: CONN_MAX_AGE={db['CONN_MAX_AGE']}, CONN_HEALTH_CHECKS={db['CONN_HEALTH_CHECKS']}, "
+          f"pgbouncer={'sí' if settings.DB_PGBOUNCER else 'no'})")
+    print(f"{args.requests} requests de {args.consultas} consultas\n")
+
+    resultados = {}
+    for modo in args.modo or list(MODOS):
+        r = resultados[modo] = medir(modo, args.requests, args.consultas)
+        print(f"  {modo:<20} media {r['ms_media']:8.2f} ms  p50 {r['ms_p50']:8.2f} ms  "
+              f"p95 {r['ms_p95']:8.2f} ms  {r['conexiones']:>5} conexiones")
+
+    base = resultados.get("por-request")
+    if base:
+        print()
+        for modo, r in resultados.items():
+            if modo != "por-request":
+                ahorro = base["ms_media"] - r["ms_media"]
+                print(f"  {modo:<20} {ahorro:+8.2f} ms por request vs por-request "
+                      f"({base['ms_media'] / r['ms_media']:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Benchmark: filtros de fecha de reportes + índices compuestos (migración 0023).
+
+Crea una BD de prueba aparte (no toca db.sqlite3), la lleva a la migración 0022,
+siembra movimientos y compara plan (EXPLAIN) y tiempo de:
+  - filtro viejo:  fecha__date__gte / fecha__date__lte   (no usa índice)
+  - filtro nuevo:  fecha__gte / fecha__lt con datetimes aware (semiabierto)
+antes y después de aplicar 0023_indices_fechas_reportes.
+
+Uso:
+    python bench_indices_fechas.py [--filas 50000]
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from inventario.models import Bodega, Tercero, Insumo, InsumoMovimiento
+from inventario.reportes import _apply_date_range_dt
+
+
+def sembrar(filas):
+    bodegas = Bodega.objects.bulk_create(
+        [Bodega(codigo=f"B{i:02d}", nombre=f"BODEGA {i}") for i in range(10)]
+    )
+    terceros = Tercero.objects.bulk_create(
+        [Tercero(codigo=f"T{i:03d}", nombre=f"TERCERO {i}") for i in range(50)]
+    )
+    insumos = Insumo.objects.bulk_create(
+        [
+            Insumo(codigo=f"INS-{i:04d}", referencia=f"INS-{i:04d}", nombre=f"Insumo {i}", bodega=bodegas[i % 10])
+            for i in range(200)
+        ]
+    )
+
+    tipos = ["ENTRADA", "SALIDA", "CONSUMO_ENSAMBLE", "AJUSTE"]
+    inicio = timezone.now() - timedelta(days=730)
+    lote = []
+    for i in range(filas):
+        lote.append(
+            InsumoMovimiento(
+                insumo=insumos[i % 200],
+                tercero=terceros[i % 50],
+                bodega=bodegas[i % 10],
+                tipo=tipos[i % 4],
+                cantidad=Decimal("1.000"),
+                total=Decimal("10.00"),
+            )
+        )
+    InsumoMovimiento.objects.bulk_create(lote, batch_size=2000)
+
+    # auto_now_add ignora el valor en bulk_create: repartimos las fechas en 2 años
+    ids = list(InsumoMovimiento.objects.values_list("id", flat=True))
+    paso = timedelta(days=730) / max(len(ids), 1)
+    objs = []
+    for i, pk in enumerate(ids):
+        m = InsumoMovimiento(id=pk)
+        m.fecha = inicio + paso * i
+        objs.append(m)
+    InsumoMovimiento.objects.bulk_update(objs, ["fecha"], batch_size=2000)
+    return bodegas[3].id, terceros[7].id
+
+
+def consultas(bodega_id, tercero_id):
+    hoy = timezone.localdate()
+    f = {"fecha_desde": hoy - timedelta(days=30), "fecha_hasta": hoy}
+
+    viejo = InsumoMovimiento.objects.filter(
+        fecha__date__gte=f["fecha_desde"], fecha__date__lte=f["fecha_hasta"]
+    )
+    nuevo = _apply_date_range_dt(InsumoMovimiento.objects.all(), "fecha", f)
+
+    return [
+        ("bodega + rango (viejo)", viejo.filter(bodega_id=bodega_id)),
+        ("bodega + rango (nuevo)", nuevo.filter(bodega_id=bodega_id)),
+        ("tercero + rango (viejo)", viejo.filter(tercero_id=tercero_id)),
+        ("tercero + rango (nuevo)", nuevo.filter(tercero_id=tercero_id)),
+        ("tipo + bodega + rango (viejo)", viejo.filter(tipo__in=["SALIDA", "CONSUMO_ENSAMBLE"], bodega_id=bodega_id)),
+        ("tipo + bodega + rango (nuevo)", nuevo.filter(tipo__in=["SALIDA", "CONSUMO_ENSAMBLE"], bodega_id=bodega_id)),
+    ]
+
+
+def medir(qs, repeticiones=20):
+    agg = qs.order_by().aggregate(x=Sum("cantidad"))
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        qs.order_by().aggregate(x=Sum("cantidad"))
+    return (time.perf_counter() - t0) / repeticiones * 1000, agg["x"]
+
+
+def reporte(titulo, bodega_id, tercero_id):
+    print(f"\n=== {titulo} ===")
+    for nombre, qs in consultas(bodega_id, tercero_id):
+        ms, total = medir(qs)
+        plan = qs.order_by().explain().replace("\n", " | ")
+        print(f"{nombre:<32} {ms:8.2f} ms  suma={total}")
+        print(f"    plan: {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=50000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        call_command("migrate", "inventario", "0022", verbosity=0)
+        bodega_id, tercero_id = sembrar(args.filas)
+        with connection.cursor() as cur:
+            cur.execute("ANALYZE")
+
+        reporte("Sin índices compuestos (0022)", bodega_id, tercero_id)
+
+        call_command("migrate", "inventario", "0023", verbosity=0)
+        with connection.cursor() as cur:
+            cur.execute("ANALYZE")
+
+        reporte("Con índices compuestos (0023)", bodega_id, tercero_id)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Benchmark: render JSON de DRF (JSONRenderer) vs inventario.renderers.FastJSONRenderer (orjson).
+
+Crea una BD de prueba aparte (no toca db.sqlite3), siembra datos y, para cada
+endpoint, arma response.data una vez y mide solo el render:
+  - /api/reportes/bodegas/stock/
+  - /api/productos/?page_size=200
+  - /api/insumo-movimientos/?page_size=200        (kardex de insumos)
+  - /api/excel/kardex-terminado/?page_size=200    (kardex de producto terminado)
+
+También verifica que el JSON sea el mismo (DRF con Decimal → string).
+
+Uso:
+    python bench_renderers.py [--filas 5000] [--repeticiones 50]
+"""
+import os
+import sys
+import time
+import argparse
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from inventario.models import (
+    Bodega, DatosAdicionalesProducto, Impuesto, Insumo, InsumoMovimiento, NotaEnsamble,
+    NotaEnsambleDetalle, PrecioProducto, Producto, ProductoTerminadoMovimiento, Talla, Tercero,
+)
+from inventario.renderers import DecimalStrEncoder, FastJSONRenderer, orjson
+from inventario.reportes import ReporteBodegasStockAPIView
+from inventario.views import ExcelImportViewSet, InsumoMovimientoViewSet, ProductoViewSet
+
+
+class DRFDecimalStr(JSONRenderer):
+    encoder_class = DecimalStrEncoder
+
+
+def sembrar(filas):
+    bodegas = Bodega.objects.bulk_create([Bodega(codigo=f"B{i:02d}", nombre=f"BODEGA {i}") for i in range(5)])
+    tercero = Tercero.objects.create(codigo="T01", nombre="CLIENTE")
+    tallas = Talla.objects.bulk_create([Talla(nombre=n) for n in ("S", "M", "L", "XL")])
+    iva = Impuesto.objects.create(nombre="IVA", valor=Decimal("19"))
+
+    productos = Producto.objects.bulk_create([
+        Producto(codigo_sku=f"SKU-{i:05d}", nombre=f"Producto {i}", unidad_medida="UN", codigo_barras=f"77{i:08d}")
+        for i in range(filas // 10)
+    ])
+    Producto.impuestos.through.objects.bulk_create([
+        Producto.impuestos.through(producto_id=p.pk, impuesto_id=iva.pk) for p in productos
+    ])
+    PrecioProducto.objects.bulk_create([
+        PrecioProducto(producto=p, nombre="Base", valor=Decimal("25000.00")) for p in productos
+    ])
+    DatosAdicionalesProducto.objects.bulk_create([
+        DatosAdicionalesProducto(producto=p, stock=Decimal("10"), stock_minimo=Decimal("2")) for p in productos
+    ])
+
+    insumos = Insumo.objects.bulk_create([
+        Insumo(codigo=f"INS-{i:05d}", referencia=f"INS-{i:05d}", nombre=f"Insumo {i}",
+               bodega=bodegas[i % len(bodegas)], cantidad=Decimal("123.456"), costo_unitario=Decimal("1500.50"))
+        for i in range(filas // 5)
+    ])
+    InsumoMovimiento.objects.bulk_create([
+        InsumoMovimiento(insumo=insumos[i % len(insumos)], tercero=tercero, bodega=bodegas[0], tipo="ENTRADA",
+                         cantidad=Decimal("3.000"), costo_unitario=Decimal("1500.50"), total=Decimal("4501.50"),
+                         saldo_resultante=Decimal(i))
+        for i in range(filas)
+    ], batch_size=2000)
+
+    detalles = []
+    for i, p in enumerate(productos):
+        nota = NotaEnsamble.objects.create(bodega=bodegas[i % len(bodegas)], tercero=tercero) if i % 50 == 0 else nota
+        detalles.extend(
+            NotaEnsambleDetalle(nota=nota, producto=p, talla=t, cantidad=Decimal("4"),
+                                cantidad_disponible=Decimal("4"), bodega_actual=nota.bodega)
+            for t in tallas
+        )
+    NotaEnsambleDetalle.objects.bulk_create(detalles, batch_size=2000)
+
+    sku = productos[0].codigo_sku
+    ProductoTerminadoMovimiento.objects.bulk_create([
+        ProductoTerminadoMovimiento(bodega=bodegas[0], tercero=tercero, producto=productos[0], talla=tallas[i % 4],
+                                    cantidad=Decimal("2.000"), costo_unitario=Decimal("18000.00"),
+                                    total=Decimal("36000.00"), saldo_global_resultante=Decimal(i))
+        for i in range(filas)
+    ], batch_size=2000)
+    return sku
+
+
+def datos(vista, url):
+    request = APIRequestFactory().get(url)
+    response = vista(request)
+    return response.data
+
+
+def medir(renderer, data, repeticiones):
+    salida = renderer.render(data)
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        renderer.render(data)
+    return (time.perf_counter() - t0) / repeticiones * 1000, salida
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson no está instalado: FastJSONRenderer usa el JSON de DRF.")
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        sku = sembrar(args.filas)
+        casos = [
+            ("reportes/bodegas/stock", ReporteBodegasStockAPIView.as_view(), "/api/reportes/bodegas/stock/"),
+            ("productos", ProductoViewSet.as_view({"get": "list"}), "/api/productos/?page_size=200"),
+            ("kardex insumos", InsumoMovimientoViewSet.as_view({"get": "list"}), "/api/insumo-movimientos/?page_size=200"),
+            ("kardex terminado", ExcelImportViewSet.as_view({"get": "kardex_terminado"}),
+             f"/api/excel/kardex-terminado/?sku={sku}&page_size=200"),
+        ]
+        drf, rapido = DRFDecimalStr(), FastJSONRenderer()
+        for nombre, vista, url in casos:
+            data = datos(vista, url)
+            ms_drf, json_drf = medir(drf, data, args.repeticiones)
+            ms_rap, json_rap = medir(rapido, data, args.repeticiones)
+            igual = "igual" if json_drf == json_rap else "DISTINTO"
+            print(f"{nombre:<24} {len(json_drf) / 1024:8.1f} KB   drf {ms_drf:8.2f} ms   "
+                  f"orjson {ms_rap:7.2f} ms   x{ms_drf / ms_rap:5.1f}   {igual}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
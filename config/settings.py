@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
@@ -58,14 +59,44 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "inventario.middleware.metricas.MetricasMiddleware",  # latencia por vista → /metrics
+    "inventario.middleware.grabacion.GrabacionMiddleware",  # tráfico → JSONL (solo con GRABACION_ARCHIVO)
+    "inventario.middleware.compresion.CompresionMiddleware",  # gzip / brotli (JSON, CSV)
+    "inventario.middleware.consultas.ConsultasMiddleware",  # consultas SQL por request
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "inventario.middleware.perfilado.PerfiladoMiddleware",  # X-Perfilar → cProfile + pilas + SQL (PERFILADO_ACTIVO)
 ]
 
+# compresión de respuestas (inventario/middleware/compresion.py)
+COMPRESION_MIN_BYTES = int(os.environ.get("COMPRESION_MIN_BYTES", "1024"))
+COMPRESION_GZIP_NIVEL = 6
+COMPRESION_BROTLI_CALIDAD = 5  # calidad media: para contenido dinámico rinde más que 11
+
+# consultas SQL por request (inventario/middleware/consultas.py)
+CONSULTAS_HEADERS = os.environ.get("CONSULTAS_HEADERS", str(DEBUG)).lower() == "true"  # X-DB-Queries / X-DB-Time
+CONSULTAS_PRESUPUESTO = int(os.environ.get("CONSULTAS_PRESUPUESTO", "50"))  # más consultas → WARNING
+CONSULTAS_MS_LENTO = int(os.environ.get("CONSULTAS_MS_LENTO", "500"))  # más ms de BD → WARNING
+
+# grabación de tráfico para replay_requests (inventario/middleware/grabacion.py)
+GRABACION_ARCHIVO = os.environ.get("GRABACION_ARCHIVO", "")  # vacío = apagado
+GRABACION_MUESTREO = float(os.environ.get("GRABACION_MUESTREO", "1"))  # fracción de requests que se graba
+GRABACION_MAX_CUERPO = 64 * 1024  # bytes; cuerpos más grandes no se guardan
+
+# perfilado a pedido con el header X-Perfilar (inventario/middleware/perfilado.py)
+PERFILADO_ACTIVO = os.environ.get("PERFILADO_ACTIVO", "False").lower() == "true"
+PERFILADO_TOKEN = os.environ.get("PERFILADO_TOKEN", "")  # sin token: solo staff o DEBUG
+PERFILADO_DIR = os.environ.get("PERFILADO_DIR", str(BASE_DIR / "perfiles"))
+PERFILADO_MUESTREO_MS = 5
+
+# spans de InventoryService / FIFO / importaciones (inventario/utils/tracing.py)
+TRACING_ACTIVO = os.environ.get("TRACING_ACTIVO", "False").lower() == "true"
+TRACING_ARCHIVO = os.environ.get("TRACING_ARCHIVO", "")  # vacío → logger "inventario.tracing" (consola)
+
 # --------------------------------------------------
 # URLS / WSGI
 # --------------------------------------------------
@@ -75,23 +106,94 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 # --------------------------------------------------
 # DATABASES (SQLite local / Neon prod)
+# Con Neon abrir conexión (TCP + TLS + auth) cuesta decenas de ms: se
+# reutiliza entre requests (bench_conexiones.py mide la diferencia).
+#   DB_CONN_MAX_AGE      segundos que vive una conexión del worker (0 = una
+#                        por request, None/"" = sin límite)
+#   DB_CONN_HEALTH_CHECKS antes de reutilizarla se prueba; si el servidor la
+#                        cortó (Neon suspende por inactividad) se abre otra
+#   DB_PGBOUNCER         DATABASE_URL apunta a un pgbouncer (o al host
+#                        -pooler de Neon) en modo transacción: sin cursores
+#                        del lado del servidor, que no sobreviven entre
+#                        transacciones; .iterator() trae el resultado entero
 # --------------------------------------------------
 DATABASE_URL = os.environ.get(
     "DATABASE_URL",
     f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
 )
 
-if DATABASE_URL.startswith("sqlite"):
-    DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL)
+_conn_max_age = os.environ.get("DB_CONN_MAX_AGE", "60")
+DB_CONN_MAX_AGE = int(_conn_max_age) if _conn_max_age.strip().lower() not in ("", "none") else None
+DB_CONN_HEALTH_CHECKS = os.environ.get("DB_CONN_HEALTH_CHECKS", "True").lower() == "true"
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "False").lower() == "true"
+
+
+def _config_bd(url):
+    if url.startswith("sqlite"):
+        return dj_database_url.parse(url)
+    return dj_database_url.parse(
+        url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        disable_server_side_cursors=DB_PGBOUNCER,
+        ssl_require=not DEBUG
+    )
+
+
+DATABASES = {
+    "default": _config_bd(DATABASE_URL)
+}
+
+# Réplica de solo lectura para reportes, exportaciones y listas
+# (inventario/replica.py). Sin DATABASE_REPLICA_URL todo va al primario.
+# Para probarlo en local basta una segunda BD, p. ej. una copia de db.sqlite3
+# (atrasada a propósito) o la misma: DATABASE_REPLICA_URL=sqlite:///db.sqlite3
+# En los tests es un espejo de default (no se crea otra BD de prueba).
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL", "")
+DB_REPLICA_ATRASO_MAX = float(os.environ.get("DB_REPLICA_ATRASO_MAX", "10"))  # segundos; con más, al primario
+DB_REPLICA_VERIFICAR_CADA = float(os.environ.get("DB_REPLICA_VERIFICAR_CADA", "5"))  # cada cuánto se mide el atraso
+
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = {**_config_bd(DATABASE_REPLICA_URL), "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["inventario.replica.RouterReplica"]
+
+# --------------------------------------------------
+# CACHE (compartida entre workers/procesos)
+# Guarda tokens de versión por tabla (inventario/utils/versiones.py), salvo
+# con VERSIONES_EN_BD: de ellos salen los ETag / 304 y cuándo se rehacen índices y catálogo, así que
+# tiene que ser la misma para todas las instancias (con LocMemCache, o con
+# archivos locales en varios hosts, una escritura en un host no la verían los
+# demás y seguirían contestando 304 con datos viejos).
+#   REDIS_URL      → Redis (requiere el paquete redis)
+#   si no, con PostgreSQL → tabla inventario_versiontabla en la misma BD
+#                    (VERSIONES_EN_BD): un upsert por commit y un SELECT por
+#                    lectura. La cache queda en archivos, pero no guarda tokens.
+#   si no (SQLite local) → archivos en CACHE_DIR (por defecto en el tmp del sistema)
+# --------------------------------------------------
+REDIS_URL = os.environ.get("REDIS_URL")
+VERSIONES_EN_BD = os.environ.get(
+    "VERSIONES_EN_BD", str(not REDIS_URL and not DATABASE_URL.startswith("sqlite"))
+).lower() == "true"  # tokens en la BD en vez de en la cache
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "TIMEOUT": None,
+        }
     }
 else:
-    DATABASES = {
-        "default": dj_database_url.parse(
-            DATABASE_URL,
-            conn_max_age=0,
-            ssl_require=not DEBUG
-        )
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get(
+                "CACHE_DIR",
+                os.path.join(tempfile.gettempdir(), "inventario_cache")
+            ),
+            "TIMEOUT": None,
+        }
     }
 
 # --------------------------------------------------
@@ -123,6 +225,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # --------------------------------------------------
 # CORS (frontend local y prod)
 # --------------------------------------------------
+CORS_EXPOSE_HEADERS = ["X-DB-Queries", "X-DB-Time", "X-Perfil", "X-Leido-De"]
+
 if DEBUG:
     CORS_ALLOW_ALL_ORIGINS = True
 else:
@@ -138,9 +242,20 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_PAGINATION_CLASS": "inventario.pagination.Default30Pagination",
+    # orjson (si no está instalado caen al JSON de DRF); Decimal → string
+    "DEFAULT_RENDERER_CLASSES": [
+        "inventario.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "inventario.renderers.ColumnarJSONRenderer",  # ?format=columnar
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "inventario.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
-        "rest_framework.filters.SearchFilter",
+        "inventario.busqueda.BusquedaFilter",  # search_document (trigram / FTS5); SearchFilter para el resto
         "rest_framework.filters.OrderingFilter",
     ],
     "EXCEPTION_HANDLER": "inventario.utils.exception_handler.custom_exception_handler",
@@ -170,4 +285,25 @@ TEMPLATES = [
             ],
         },
     }
-]
\ No newline at end of file
+]
+
+# --------------------------------------------------
+# LOGGING
+# --------------------------------------------------
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # WARNING si un request se pasa del presupuesto de consultas; con INFO, una línea JSON por request
+        "inventario.consultas": {
+            "handlers": ["console"],
+            "level": os.environ.get("CONSULTAS_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+        # un span terminado por línea (JSON) cuando TRACING_ACTIVO y no hay TRACING_ARCHIVO
+        "inventario.tracing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
@@ -9,6 +9,8 @@ from inventario.views import (
     ProductoInsumoViewSet, TrasladoProductoViewSet, NotaSalidaProductoViewSet, InsumoMovimientoViewSet,
     ExcelImportViewSet
 )
+from inventario.autocomplete import AutocompleteAPIView
+from inventario.metricas import metrics_view
 
 router = DefaultRouter()
 
@@ -42,4 +44,6 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include(router.urls)),
     path("api/reportes/", include("inventario.reportes_urls")), 
+    path("api/autocomplete/", AutocompleteAPIView.as_view()),
+    path("metrics", metrics_view),
 ]
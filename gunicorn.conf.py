@@ -0,0 +1,25 @@
+"""
+Config de gunicorn (la lee sola si se arranca desde la raíz del proyecto).
+
+Métricas con varios workers (inventario/metricas.py): con PROMETHEUS_MULTIPROC_DIR
+definida, cada worker escribe sus contadores en ese directorio y /metrics los
+suma. Al arrancar se vacía (si no, se sumarían los de la corrida anterior) y
+cuando un worker muere se marcan sus archivos.
+"""
+import os
+import shutil
+
+_metricas_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    if _metricas_dir:
+        shutil.rmtree(_metricas_dir, ignore_errors=True)
+        os.makedirs(_metricas_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if _metricas_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra los receivers)
+        from .busqueda import asegurar_fts_post_migrate
+
+        # SQLite: tablas FTS5 de búsqueda y sus triggers (idempotente)
+        post_migrate.connect(asegurar_fts_post_migrate, sender=self)
@@ -0,0 +1,34 @@
+# inventario/autocomplete.py
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from inventario.services import autocomplete
+
+
+class AutocompleteAPIView(APIView):
+    """
+    GET /api/autocomplete/?q=cam&tipo=producto&limite=10
+
+    tipo: insumo | producto | tercero | bodega (opcional: todos)
+    Busca por prefijo en códigos, código de barras, nombre y palabras del nombre.
+    Responde desde el índice en memoria (services/autocomplete.py), sin consultar la BD.
+    """
+    pagination_class = None
+
+    def get(self, request):
+        q = (request.query_params.get("q") or "").strip()
+        tipo = (request.query_params.get("tipo") or "").strip().lower() or None
+        if tipo and tipo not in autocomplete.TIPOS:
+            return Response(
+                {"detail": f"tipo debe ser uno de: {', '.join(autocomplete.TIPOS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limite = int(request.query_params.get("limite") or autocomplete.LIMITE_DEFAULT)
+        except ValueError:
+            limite = autocomplete.LIMITE_DEFAULT
+        limite = max(1, min(limite, autocomplete.LIMITE_MAX))
+
+        return Response({"q": q, "results": autocomplete.buscar(q, tipo=tipo, limite=limite)})
@@ -0,0 +1,188 @@
+"""
+Búsqueda de texto libre sobre un documento de búsqueda guardado.
+
+Insumo, Producto, NotaEnsamble y NotaSalidaProducto tienen una columna
+`search_document` con el texto buscable ya normalizado (minúsculas y sin
+tildes). Así el ?search= no hace OR de icontains sobre joins (ni DISTINCT):
+
+  - PostgreSQL: índice GIN pg_trgm sobre la columna (migración 0026); el
+    LIKE '%term%' lo resuelve el índice.
+  - SQLite: tabla FTS5 (tokenizer trigram) "sombra" de cada tabla, mantenida
+    por triggers; se crea/repara en post_migrate (ver InventarioConfig.ready).
+
+Quién llena la columna:
+  - Insumo / Producto: en save().
+  - Notas: InventoryService.actualizar_totales_nota / actualizar_totales_salida
+    (dependen de los detalles). El documento copia nombre y SKU de los
+    productos (y el nombre del tercero en las de ensamble): al cambiar un
+    Producto o un Tercero, signals.busqueda_notas rehace el de las notas
+    afectadas (InventoryService.reconstruir_busqueda_notas / _salidas).
+"""
+import unicodedata
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+
+# tabla → tabla FTS5 sombra (SQLite)
+TABLAS_BUSQUEDA = [
+    "inventario_insumo",
+    "inventario_producto",
+    "inventario_notaensamble",
+    "inventario_notasalidaproducto",
+]
+
+# el tokenizer trigram de FTS5 no puede buscar términos de menos de 3 caracteres
+MIN_TRIGRAMA = 3
+
+_fts_disponibles = {}  # alias de BD → set de tablas con FTS listo
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Camisa Niño' → 'camisa nino'."""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+def documento(*partes):
+    """Une las partes (ignora vacías/None, deduplica) en el documento de búsqueda."""
+    vistos = dict.fromkeys(normalizar(p) for p in partes if p not in (None, ""))
+    return " ".join(p for p in vistos if p)
+
+
+def tabla_fts(tabla):
+    return f"{tabla}_fts"
+
+
+# ----------------------------
+# SQLite: FTS5 sombra + triggers
+# ----------------------------
+def asegurar_fts_sqlite(connection, tablas=TABLAS_BUSQUEDA):
+    """
+    Crea (si faltan) las tablas FTS5 y sus triggers. Idempotente.
+
+    Si algún trigger no existía (tabla nueva, o Django rehízo la tabla en una
+    migración de SQLite y se perdieron), se reconstruye el índice completo.
+    Si el SQLite no trae FTS5/trigram no hace nada: la búsqueda cae a LIKE.
+    """
+    _fts_disponibles.pop(connection.alias, None)
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cur:
+        existentes = set(connection.introspection.table_names(cur))
+        for tabla in tablas:
+            if tabla not in existentes:
+                continue
+            fts = tabla_fts(tabla)
+            try:
+                cur.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"search_document, content='{tabla}', content_rowid='rowid', tokenize='trigram')"
+                )
+            except Exception:
+                return
+
+            cur.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                [tabla],
+            )
+            triggers = {r[0] for r in cur.fetchall()}
+            faltantes = {f"{fts}_ai", f"{fts}_ad", f"{fts}_au"} - triggers
+            if not faltantes:
+                continue
+
+            cur.execute(f"DROP TRIGGER IF EXISTS {fts}_ai")
+            cur.execute(f"DROP TRIGGER IF EXISTS {fts}_ad")
+            cur.execute(f"DROP TRIGGER IF EXISTS {fts}_au")
+            cur.execute(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+                f"INSERT INTO {fts}(rowid, search_document) VALUES (new.rowid, new.search_document); END"
+            )
+            cur.execute(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, search_document) VALUES ('delete', old.rowid, old.search_document); END"
+            )
+            cur.execute(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF search_document ON {tabla} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, search_document) VALUES ('delete', old.rowid, old.search_document); "
+                f"INSERT INTO {fts}(rowid, search_document) VALUES (new.rowid, new.search_document); END"
+            )
+            cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def asegurar_fts_post_migrate(sender, using="default", **kwargs):
+    asegurar_fts_sqlite(connections[using])
+
+
+def _fts_listo(connection, tabla):
+    if connection.vendor != "sqlite":
+        return False
+    listas = _fts_disponibles.get(connection.alias)
+    if listas is None:
+        with connection.cursor() as cur:
+            cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s", ["%_fts_au"])
+            listas = {r[0][: -len("_fts_au")] for r in cur.fetchall()}
+        _fts_disponibles[connection.alias] = listas
+    return tabla in listas
+
+
+def _match_fts5(terminos):
+    # cada término como frase ("..." con comillas dobladas) y todos con AND
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terminos)
+
+
+def filtrar(queryset, texto_o_terminos):
+    """
+    Filtra el queryset por el documento de búsqueda: todos los términos deben
+    aparecer (como subcadena) en search_document.
+    """
+    if isinstance(texto_o_terminos, str):
+        terminos = texto_o_terminos.split()
+    else:
+        terminos = texto_o_terminos
+    terminos = [t for t in (normalizar(t) for t in terminos) if t]
+    if not terminos:
+        return queryset
+
+    connection = connections[queryset.db]
+    tabla = queryset.model._meta.db_table
+    largos = [t for t in terminos if len(t) >= MIN_TRIGRAMA]
+
+    condicion = Q()
+    if largos and _fts_listo(connection, tabla):
+        pk = queryset.model._meta.pk.column
+        fts = tabla_fts(tabla)
+        condicion &= Q(pk__in=RawSQL(
+            f'SELECT "{pk}" FROM "{tabla}" WHERE rowid IN '
+            f"(SELECT rowid FROM {fts} WHERE {fts} MATCH %s)",
+            [_match_fts5(largos)],
+        ))
+        terminos = [t for t in terminos if len(t) < MIN_TRIGRAMA]
+
+    # PostgreSQL: LIKE '%term%' servido por el índice GIN gin_trgm_ops
+    for t in terminos:
+        condicion &= Q(search_document__contains=t)
+    return queryset.filter(condicion)
+
+
+class BusquedaFilter(filters.SearchFilter):
+    """
+    SearchFilter que, si el modelo tiene `search_document`, busca ahí (índice
+    trigram / FTS5) en vez de OR de icontains sobre search_fields. Para los demás
+    modelos se comporta igual que SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not any(f.name == "search_document" for f in queryset.model._meta.concrete_fields):
+            return super().filter_queryset(request, queryset, view)
+
+        terminos = self.get_search_terms(request)
+        if not terminos:
+            return queryset
+        return filtrar(queryset, terminos)
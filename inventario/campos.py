@@ -0,0 +1,207 @@
+"""
+Campos dispersos para los viewsets: ?fields=codigo,nombre  /  ?omit=precios,impuestos
+
+  - La respuesta (list / retrieve) trae solo esos campos de primer nivel; los
+    nombres que no existen se ignoran.
+  - Los select_related / prefetch_related del queryset que ya no hacen falta se
+    quitan: un campo pide la relación de su `source` (bodega.nombre → bodega);
+    los SerializerMethodField declaran lo que leen en Meta.campos_relaciones
+    ({"price_breakdown": ("precios", "impuestos")}). Si un campo "*" no está
+    declarado se dejan todas las relaciones.
+  - Si en el list con ?fields= todos los campos son columnas (o columnas de FK,
+    como bodega.nombre, o anotaciones) no se arman instancias ni serializer:
+    se hace .values() y cada valor pasa por el to_representation de su campo.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.response import Response
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+
+ACCIONES = ("list", "retrieve")
+
+
+def _lista(valor):
+    return {c.strip() for c in (valor or "").split(",") if c.strip()}
+
+
+def campos_pedidos(request):
+    """(incluir o None, omitir) según ?fields= / ?omit=."""
+    if request is None:
+        return None, set()
+    params = request.query_params
+    incluir = _lista(params.get(FIELDS_PARAM)) if FIELDS_PARAM in params else None
+    return incluir or None, _lista(params.get(OMIT_PARAM))
+
+
+def podar_serializer(serializer, incluir, omitir):
+    """Saca de serializer.fields (o del child si es many=True) lo que no se pidió."""
+    base = getattr(serializer, "child", serializer)
+    fields = base.fields
+    for nombre in list(fields):
+        if (incluir is not None and nombre not in incluir) or nombre in omitir:
+            fields.pop(nombre)
+    return base
+
+
+def relaciones_necesarias(serializer):
+    """
+    Primer tramo de las relaciones que leen los campos de salida, o None si
+    alguno no se puede saber (hay que dejarlas todas).
+    """
+    declaradas = getattr(getattr(serializer, "Meta", None), "campos_relaciones", {})
+    necesarias = set()
+    for nombre, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if nombre in declaradas:
+            necesarias.update(r.split("__")[0] for r in declaradas[nombre])
+        elif field.source == "*":
+            return None
+        else:
+            necesarias.add(field.source_attrs[0])
+    return necesarias
+
+
+def _rutas_select_related(arbol, prefijo=""):
+    for nombre, hijos in arbol.items():
+        ruta = f"{prefijo}{nombre}"
+        if hijos:
+            yield from _rutas_select_related(hijos, f"{ruta}__")
+        else:
+            yield ruta
+
+
+def podar_queryset(queryset, necesarias):
+    """Quita los select_related / prefetch_related que no empiezan por una relación necesaria."""
+    if necesarias is None:
+        return queryset
+
+    select = queryset.query.select_related
+    if isinstance(select, dict):
+        rutas = [r for r in _rutas_select_related(select) if r.split("__")[0] in necesarias]
+        queryset = queryset.select_related(None)
+        if rutas:
+            queryset = queryset.select_related(*rutas)
+
+    lookups = queryset._prefetch_related_lookups
+    if lookups:
+        def ruta(lookup):
+            return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+        quedan = [l for l in lookups if ruta(l).split("__")[0] in necesarias]
+        if len(quedan) != len(lookups):
+            queryset = queryset.prefetch_related(None)
+            if quedan:
+                queryset = queryset.prefetch_related(*quedan)
+    return queryset
+
+
+def _columna(model, source_attrs, anotaciones):
+    """
+    source_attrs → lookup de .values() si el campo es una columna del modelo,
+    una columna de una FK (bodega.nombre → bodega__nombre) o una anotación.
+    """
+    if len(source_attrs) == 1 and source_attrs[0] in anotaciones:
+        return source_attrs[0]
+    for i, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        ultimo = i == len(source_attrs) - 1
+        if field.is_relation:
+            if ultimo or not (field.many_to_one or field.one_to_one):
+                return None
+            model = field.related_model
+        elif not ultimo:
+            return None
+    return "__".join(source_attrs)
+
+
+def columnas_escalares(serializer, queryset):
+    """[(nombre, lookup, field)] si todos los campos salen de .values(); si no, None."""
+    columnas = []
+    for nombre, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, (serializers.BaseSerializer, serializers.RelatedField,
+                              serializers.ManyRelatedField, serializers.SerializerMethodField)):
+            return None
+        if field.source == "*":
+            return None
+        lookup = _columna(queryset.model, field.source_attrs, queryset.query.annotations)
+        if lookup is None:
+            return None
+        columnas.append((nombre, lookup, field))
+    return columnas or None
+
+
+def _orden(queryset):
+    """Columnas del order_by (y la pk), para que la paginación por cursor las encuentre en la fila."""
+    nombres = [queryset.model._meta.pk.name]
+    for item in queryset.query.order_by or queryset.model._meta.ordering:
+        if isinstance(item, str):
+            nombre = item.lstrip("-")
+            nombres.append(queryset.model._meta.pk.name if nombre == "pk" else nombre)
+    return nombres
+
+
+def filas_a_dict(filas, columnas):
+    """Filas de .values() → mismos dicts que daría el serializer."""
+    return [
+        {
+            nombre: None if fila[lookup] is None else field.to_representation(fila[lookup])
+            for nombre, lookup, field in columnas
+        }
+        for fila in filas
+    ]
+
+
+class CamposDinamicosMixin:
+    """Mixin de viewset: ?fields= / ?omit= en list y retrieve (ver docstring del módulo)."""
+
+    def _campos_pedidos(self):
+        if getattr(self, "action", None) not in ACCIONES:
+            return None, set()
+        return campos_pedidos(getattr(self, "request", None))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        incluir, omitir = self._campos_pedidos()
+        if incluir is not None or omitir:
+            podar_serializer(serializer, incluir, omitir)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        incluir, omitir = self._campos_pedidos()
+        if incluir is None and not omitir:
+            return queryset
+        return podar_queryset(queryset, relaciones_necesarias(self.get_serializer()))
+
+    def list(self, request, *args, **kwargs):
+        incluir, _ = self._campos_pedidos()
+        if incluir is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columnas = columnas_escalares(self.get_serializer(), queryset)
+        if columnas is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        lookups = [lookup for _, lookup, _ in columnas]
+        filas = queryset.prefetch_related(None).values(
+            *dict.fromkeys([*lookups, *_orden(queryset)])
+        )
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            return self.get_paginated_response(filas_a_dict(page, columnas))
+        return Response(filas_a_dict(filas, columnas))
@@ -0,0 +1,79 @@
+"""
+GET condicional (ETag → 304) para viewsets y reportes.
+
+El estado de una respuesta son los tokens de versión de las tablas de las que
+sale (inventario/utils/versiones.py, los cambian los signals al confirmar cada
+escritura). Con eso, antes de consultar nada:
+
+  ETag = W/"hash(ruta con query string, Accept, tokens)"
+
+Si el cliente manda If-None-Match y nada cambió se contesta 304 sin pasar por
+el queryset ni el serializer: solo se leen los tokens.
+
+No se manda Last-Modified ni se atiende If-Modified-Since: tiene resolución de
+un segundo y los tokens son time_ns, así que dos escrituras en el mismo
+segundo darían 304 con datos viejos a quien solo mande If-Modified-Since.
+
+actualizado_en no sirve como validador: los soft delete y los movimientos de
+stock guardan con update_fields sin esa columna, y bulk_update no la toca.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+
+from inventario.utils import versiones
+
+ACCIONES = ("list", "retrieve")
+
+
+def etag_de(request, modelos):
+    """ETag (débil) de una respuesta que sale de esos modelos."""
+    tablas = sorted({m._meta.db_table for m in modelos})
+    tokens = versiones.versiones(*tablas)
+    firma = "|".join([request.get_full_path(), request.META.get("HTTP_ACCEPT", ""), *map(str, tokens)])
+    return "W/" + quote_etag(hashlib.blake2b(firma.encode("utf-8"), digest_size=12).hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    Mixin de viewset / APIView: ETag en GET y 304 cuando el
+    cliente ya tiene la versión actual.
+
+    etag_modelos: modelos (además del del queryset) que cambian la respuesta,
+    p. ej. precios e impuestos en la lista de productos. Los viewsets lo
+    aplican en list y retrieve (etag_acciones); en una APIView, a todo GET.
+    """
+    etag_modelos = ()
+    etag_acciones = ACCIONES
+
+    def get_etag_modelos(self):
+        queryset = getattr(self, "queryset", None)
+        base = (queryset.model,) if queryset is not None else ()
+        return (*base, *self.etag_modelos)
+
+    def _condicional(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return False
+        action_map = getattr(self, "action_map", None)
+        if action_map is not None and action_map.get("get") not in self.etag_acciones:
+            return False
+        return bool(self.get_etag_modelos())
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self._condicional(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag = etag_de(request, self.get_etag_modelos())
+        # sin last_modified: get_conditional_response no mira If-Modified-Since
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        else:
+            response = no_modificado  # 304 (o 412 con If-Match)
+
+        response.headers.setdefault("ETag", etag)
+        # que el navegador revalide siempre con If-None-Match
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,270 @@
+"""
+Mide las operaciones clave contra los datos de la BD (normalmente los de
+seed_inventario) y deja el resultado en JSON para comparar corridas.
+
+    python manage.py seed_inventario --escala 5
+    python manage.py bench_inventario --repeticiones 20
+    python manage.py bench_inventario --comparar bench_resultados/20260101-120000-abc1234.json
+
+Cada caso pasa por el stack completo (URLconf, middleware, vista, serializer,
+render) con APIClient. Las escrituras (crear nota, salida FIFO, traslado
+masivo, importación de insumos) corren dentro de una transacción que se
+revierte: la BD queda igual y cada repetición ve los mismos datos.
+
+Por caso se guardan min / mediana / p95 / promedio en ms y las consultas SQL
+de una repetición. El JSON lleva además commit, motor de BD, versiones y el
+volumen de cada tabla, para no comparar corridas sobre datos distintos.
+"""
+import io
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from inventario.models import (
+    Bodega, Insumo, InsumoMovimiento, NotaEnsamble, NotaEnsambleDetalle, NotaSalidaProducto, Producto,
+    ProductoTerminadoMovimiento, Proveedor, Talla, Tercero, TrasladoProducto,
+)
+from inventario.utils import versiones
+from inventario.utils.estadistica import percentil
+
+LECTURAS = (
+    ("reportes resumen", "/api/reportes/resumen/"),
+    ("reportes insumos top-comprados", "/api/reportes/insumos/top-comprados/"),
+    ("reportes insumos top-consumidos", "/api/reportes/insumos/top-consumidos/"),
+    ("reportes productos top-vendidos", "/api/reportes/productos/top-vendidos/"),
+    ("reportes productos serie-ventas", "/api/reportes/productos/serie-ventas/"),
+    ("reportes produccion top-producidos", "/api/reportes/produccion/top-producidos/"),
+    ("reportes bodegas stock", "/api/reportes/bodegas/stock/"),
+    ("reportes notas salidas resumen", "/api/reportes/notas/salidas/resumen/"),
+    ("reportes operadores resumen", "/api/reportes/operadores/resumen/"),
+    ("reportes exportar-excel", "/api/reportes/exportar-excel/"),
+    ("kardex-terminado exportar csv", "/api/excel/kardex-terminado/exportar/?formato=csv"),
+    ("kardex-terminado exportar xlsx", "/api/excel/kardex-terminado/exportar/?formato=xlsx"),
+)
+
+VOLUMENES = (
+    Bodega, Tercero, Insumo, InsumoMovimiento, Producto, NotaEnsamble, NotaEnsambleDetalle,
+    TrasladoProducto, NotaSalidaProducto, ProductoTerminadoMovimiento,
+)
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = "Mide notas, salidas FIFO, traslados, importación, reportes y exportaciones; escribe el resultado en JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=10)
+        parser.add_argument("--lineas", type=int, default=10, help="Líneas por nota / salida / traslado.")
+        parser.add_argument("--filas-import", type=int, default=200, help="Filas del Excel de importar-insumos.")
+        parser.add_argument("--solo", action="append", default=[], help="Solo casos que contengan este texto.")
+        parser.add_argument("--salida", help="Archivo JSON (por defecto bench_resultados/<fecha>-<commit>.json).")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior: muestra la diferencia por caso.")
+
+    def handle(self, *args, **opts):
+        if not NotaEnsambleDetalle.objects.filter(cantidad_disponible__gte=2).exists():
+            raise CommandError("La BD no tiene stock de producto terminado: corre antes seed_inventario.")
+        self.repeticiones = max(1, opts["repeticiones"])
+        self.tablas = [m._meta.db_table for m in apps.get_app_config("inventario").get_models()]
+
+        setup_test_environment()  # ALLOWED_HOSTS con "testserver" para APIClient
+        log = logging.getLogger("inventario.consultas")
+        nivel = log.level
+        log.setLevel(logging.ERROR)  # una línea por request no sirve acá (middleware/consultas.py)
+        try:
+            self.client = APIClient()
+            casos = self.casos(opts["lineas"], opts["filas_import"])
+            if opts["solo"]:
+                casos = [c for c in casos if any(s in c[0] for s in opts["solo"])]
+            resultados = {}
+            for nombre, hacer, escribe in casos:
+                resultados[nombre] = r = self.medir(nombre, hacer, escribe)
+                self.stdout.write(
+                    f"  {nombre:<36} mediana {r['ms_mediana']:9.1f} ms  p95 {r['ms_p95']:9.1f} ms  "
+                    f"{r['consultas']:>5} consultas"
+                )
+        finally:
+            log.setLevel(nivel)
+            teardown_test_environment()
+
+        fecha = datetime.now()
+        commit = commit_actual()
+        informe = {
+            "fecha": fecha.isoformat(timespec="seconds"),
+            "commit": commit,
+            "bd": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "repeticiones": self.repeticiones,
+            "lineas": opts["lineas"],
+            "filas_import": opts["filas_import"],
+            "volumenes": {m._meta.model_name: m.objects.count() for m in VOLUMENES},
+            "resultados": resultados,
+        }
+        ruta = Path(opts["salida"] or f"bench_resultados/{fecha:%Y%m%d-%H%M%S}-{commit or 'sin-git'}.json")
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Resultados en {ruta}"))
+
+        if opts["comparar"]:
+            self.comparar(json.loads(Path(opts["comparar"]).read_text(encoding="utf-8")), informe)
+
+    # ------------------------------------------------------------------
+    # medición
+    # ------------------------------------------------------------------
+    def medir(self, nombre, hacer, escribe):
+        tiempos, consultas = [], 0
+        for i in range(self.repeticiones + 1):  # la primera calienta catálogos e índices en memoria
+            reset_queries()  # el log de consultas se corta en 9000
+            if escribe:
+                with transaction.atomic():
+                    response, dt, n = self.correr(hacer)
+                    transaction.set_rollback(True)
+                # lo armado en memoria durante la transacción puede traer filas revertidas
+                versiones.invalidar_local(*self.tablas)
+            else:
+                response, dt, n = self.correr(hacer)
+            if response.status_code >= 400:
+                raise CommandError(f"{nombre}: HTTP {response.status_code} {response.content[:500]!r}")
+            if i:
+                tiempos.append(dt * 1000)
+                consultas = n
+        return {
+            "ms_min": round(min(tiempos), 2),
+            "ms_mediana": round(statistics.median(tiempos), 2),
+            "ms_p95": round(percentil(tiempos, 95), 2),
+            "ms_promedio": round(statistics.fmean(tiempos), 2),
+            "consultas": consultas,
+            "status": response.status_code,
+        }
+
+    @staticmethod
+    def correr(hacer):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            response = hacer()
+            dt = time.perf_counter() - t0
+        return response, dt, len(ctx.captured_queries)
+
+    def get(self, url):
+        def hacer():
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            return response
+        return hacer
+
+    def post(self, url, datos, formato="json"):
+        return lambda: self.client.post(url, datos() if callable(datos) else datos, format=formato)
+
+    # ------------------------------------------------------------------
+    # casos (con datos tomados de la BD)
+    # ------------------------------------------------------------------
+    def casos(self, lineas, filas_import):
+        tercero = Tercero.objects.order_by("pk").first()
+
+        # bodega con más combinaciones (producto, talla) repartidas en varios detalles: ejercita el FIFO
+        combos = list(
+            NotaEnsambleDetalle.objects.filter(cantidad_disponible__gt=0, talla__isnull=False)
+            .values("bodega_actual_id", "producto_id", "talla_id", "talla__nombre")
+            .annotate(n=Count("id"), disponible=Sum("cantidad_disponible"))
+            .filter(disponible__gte=2)
+            .order_by("-n", "producto_id", "talla_id")
+        )
+        bodega_id = combos[0]["bodega_actual_id"]
+        combos = [c for c in combos if c["bodega_actual_id"] == bodega_id][:lineas]
+        destino = Bodega.objects.exclude(pk=bodega_id).order_by("pk").first()
+
+        productos = list(Producto.objects.filter(bom_insumos__isnull=False).distinct().order_by("pk")[:lineas])
+        tallas = list(Talla.objects.order_by("pk")[:2])
+
+        nota = {
+            "bodega_id": bodega_id, "tercero_id": tercero.id, "costo_servicio": "1500.00",
+            "detalles_input": [
+                {"producto_id": p.codigo_sku, "talla_id": t.nombre, "cantidad": "1"}
+                for p in productos for t in tallas
+            ][:lineas],
+        }
+        salida = {
+            "fecha": datetime.now().date().isoformat(), "bodega_id": bodega_id, "tercero_id": tercero.id,
+            "detalles_input": [
+                {"producto_id": c["producto_id"], "talla": c["talla__nombre"], "cantidad": "2", "costo_unitario": "59900"}
+                for c in combos
+            ],
+        }
+        traslado = {
+            "tercero_id": tercero.id, "bodega_origen_id": bodega_id, "bodega_destino_id": destino.id,
+            "items": [{"producto_id": c["producto_id"], "talla_id": c["talla_id"], "cantidad": "1"} for c in combos],
+        }
+
+        bodega = Bodega.objects.get(pk=bodega_id)
+        proveedor = Proveedor.objects.order_by("pk").first()
+        filas = [["Codigo Producto", "Referencia", "Descripción", "Cantidad Entrada (Stock)", "Costo Unitario",
+                  "Marca (Proveedor)", "Bodega", "Tercero", "Unidad Medida"]]
+        filas += [
+            [f"BENCH-{i:06d}", f"BENCH-{i:06d}", f"Insumo bench {i}", 20, 350,
+             proveedor.nombre if proveedor else "", bodega.codigo, tercero.codigo, "UN"]
+            for i in range(filas_import)
+        ]
+        libro = self.xlsx(filas)
+
+        def importacion():
+            return {"file": SimpleUploadedFile("bench.xlsx", libro)}
+
+        return [
+            ("crear nota de ensamble", self.post("/api/notas-ensamble/", nota), True),
+            ("salida FIFO", self.post("/api/salidas-producto/", salida), True),
+            ("traslado masivo", self.post("/api/traslados-producto/ejecutar-masivo/", traslado), True),
+            ("importar insumos", self.post("/api/excel/importar-insumos/", importacion, "multipart"), True),
+            *((nombre, self.get(url), False) for nombre, url in LECTURAS),
+        ]
+
+    @staticmethod
+    def xlsx(filas):
+        wb = Workbook()
+        ws = wb.active
+        for fila in filas:
+            ws.append(fila)
+        buf = io.BytesIO()
+        wb.save(buf)
+        return buf.getvalue()
+
+    # ------------------------------------------------------------------
+    # comparación
+    # ------------------------------------------------------------------
+    def comparar(self, anterior, actual):
+        self.stdout.write(f"\nContra {anterior.get('commit')} ({anterior.get('fecha')}):")
+        if anterior.get("volumenes") != actual["volumenes"]:
+            self.stdout.write(self.style.WARNING("  ojo: los volúmenes de datos no son los mismos."))
+        for nombre, r in actual["resultados"].items():
+            previo = anterior.get("resultados", {}).get(nombre)
+            if previo is None:
+                self.stdout.write(f"  {nombre:<36} (nuevo)")
+                continue
+            delta = (r["ms_mediana"] - previo["ms_mediana"]) / previo["ms_mediana"] * 100 if previo["ms_mediana"] else 0
+            texto = (f"  {nombre:<36} {previo['ms_mediana']:9.1f} → {r['ms_mediana']:9.1f} ms ({delta:+6.1f}%)  "
+                     f"consultas {previo['consultas']} → {r['consultas']}")
+            if delta > 10 or r["consultas"] > previo["consultas"]:
+                texto = self.style.WARNING(texto)
+            self.stdout.write(texto)
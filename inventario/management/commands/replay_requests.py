@@ -0,0 +1,170 @@
+"""
+Reproduce un JSONL grabado por middleware/grabacion.py contra una instancia
+local y mide la latencia por endpoint.
+
+    GRABACION_ARCHIVO=grabaciones/trafico.jsonl gunicorn config.wsgi     # grabar
+    python manage.py replay_requests grabaciones/trafico.jsonl --concurrencia 16
+    python manage.py replay_requests trafico.jsonl --solo-lecturas --repeticiones 3 --salida replay.json
+
+Los requests salen por HTTP de verdad (urllib, un hilo por conexión
+concurrente), en el orden del archivo. Por endpoint (la vista grabada, p. ej.
+ProductoViewSet.list) se informan n, errores, p50 / p95 / p99 / máx en ms y la
+p50 que tenía cuando se grabó.
+
+Ojo: las escrituras (POST/PUT/PATCH/DELETE) se repiten de verdad contra la BD
+de esa instancia; --solo-lecturas las salta. Los multipart (importaciones) no
+se graban y se saltan siempre. Los headers no se graban: la autenticación va
+con --header "Authorization: Bearer ...".
+"""
+import json
+import statistics
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.utils.estadistica import percentil
+
+LECTURAS = ("GET", "HEAD", "OPTIONS")
+
+
+def endpoint(registro):
+    return registro.get("vista") or f"{registro['metodo']} {registro['ruta']}"
+
+
+class Command(BaseCommand):
+    help = "Reproduce tráfico grabado (JSONL) contra una instancia local y reporta percentiles por endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base de la instancia destino.")
+        parser.add_argument("--concurrencia", type=int, default=8)
+        parser.add_argument("--repeticiones", type=int, default=1, help="Veces que se recorre el archivo.")
+        parser.add_argument("--solo-lecturas", action="store_true", help="Salta POST/PUT/PATCH/DELETE.")
+        parser.add_argument("--header", action="append", default=[], help='"Nombre: valor", se puede repetir.')
+        parser.add_argument("--timeout", type=float, default=60)
+        parser.add_argument("--salida", help="Escribe el resultado en este JSON.")
+
+    def handle(self, *args, **opts):
+        registros, saltados = self.leer(opts["archivo"], opts["solo_lecturas"])
+        if not registros:
+            raise CommandError("No hay requests para reproducir.")
+        try:
+            self.headers = dict(h.split(":", 1) for h in opts["header"])
+        except ValueError:
+            raise CommandError('--header: formato "Nombre: valor".')
+        self.headers = {k.strip(): v.strip() for k, v in self.headers.items()}
+        self.base = opts["url"].rstrip("/")
+        self.timeout = opts["timeout"]
+
+        cola = registros * max(1, opts["repeticiones"])
+        self.stdout.write(
+            f"{len(cola)} requests ({saltados} saltados) contra {self.base}, concurrencia {opts['concurrencia']}"
+        )
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts["concurrencia"]) as pool:
+            resultados = list(pool.map(self.enviar, cola))
+        total = time.perf_counter() - inicio
+
+        informe = self.resumir(cola, resultados, total)
+        self.reportar(informe)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as fh:
+                json.dump(informe, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados en {opts['salida']}")
+
+    def leer(self, archivo, solo_lecturas):
+        registros, saltados = [], 0
+        try:
+            with open(archivo, encoding="utf-8") as fh:
+                for n, linea in enumerate(fh, 1):
+                    if not linea.strip():
+                        continue
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        raise CommandError(f"{archivo}:{n}: no es JSON")
+                    if registro.get("omitido") or (solo_lecturas and registro["metodo"] not in LECTURAS):
+                        saltados += 1
+                        continue
+                    registros.append(registro)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        return registros, saltados
+
+    def enviar(self, registro):
+        url = self.base + registro["ruta"] + (f"?{registro['query']}" if registro.get("query") else "")
+        headers = dict(self.headers)
+        datos = None
+        cuerpo = registro.get("cuerpo")
+        if cuerpo is not None:
+            datos = (json.dumps(cuerpo) if registro.get("content_type") == "application/json" else str(cuerpo)).encode("utf-8")
+            headers["Content-Type"] = registro.get("content_type") or "application/octet-stream"
+
+        inicio = time.perf_counter()
+        try:
+            with urlopen(Request(url, data=datos, headers=headers, method=registro["metodo"]), timeout=self.timeout) as r:
+                r.read()
+                status = r.status
+        except HTTPError as exc:
+            exc.read()
+            status = exc.code
+        except (URLError, OSError) as exc:
+            return None, (time.perf_counter() - inicio) * 1000, str(exc)
+        return status, (time.perf_counter() - inicio) * 1000, None
+
+    def resumir(self, cola, resultados, total):
+        grupos = defaultdict(lambda: {"ms": [], "grabado": [], "errores": 0, "status": defaultdict(int)})
+        fallas = []
+        for registro, (status, ms, error) in zip(cola, resultados):
+            g = grupos[endpoint(registro)]
+            g["ms"].append(ms)
+            if registro.get("ms") is not None:
+                g["grabado"].append(registro["ms"])
+            g["status"][str(status)] += 1
+            # error = no contestó, o contestó 5xx, o 4xx donde la grabación tuvo éxito
+            if status is None or status >= 500 or (status >= 400 and registro.get("status", 0) < 400):
+                g["errores"] += 1
+                if len(fallas) < 10:
+                    fallas.append(f"{registro['metodo']} {registro['ruta']}: {error or status}")
+
+        endpoints = {}
+        for nombre, g in sorted(grupos.items(), key=lambda x: -sum(x[1]["ms"])):
+            endpoints[nombre] = {
+                "n": len(g["ms"]),
+                "errores": g["errores"],
+                "status": dict(g["status"]),
+                "ms_p50": round(statistics.median(g["ms"]), 1),
+                "ms_p95": round(percentil(g["ms"], 95), 1),
+                "ms_p99": round(percentil(g["ms"], 99), 1),
+                "ms_max": round(max(g["ms"]), 1),
+                "ms_p50_grabado": round(statistics.median(g["grabado"]), 1) if g["grabado"] else None,
+            }
+        todos = [ms for _, ms, _ in resultados]
+        return {
+            "requests": len(cola),
+            "segundos": round(total, 2),
+            "requests_por_segundo": round(len(cola) / total, 2),
+            "ms_p50": round(statistics.median(todos), 1),
+            "ms_p95": round(percentil(todos, 95), 1),
+            "ms_p99": round(percentil(todos, 99), 1),
+            "endpoints": endpoints,
+            "fallas": fallas,
+        }
+
+    def reportar(self, informe):
+        self.stdout.write(
+            f"\n{informe['requests']} requests en {informe['segundos']:.1f} s ({informe['requests_por_segundo']:.1f} req/s), "
+            f"p50 {informe['ms_p50']} ms, p95 {informe['ms_p95']} ms, p99 {informe['ms_p99']} ms\n"
+        )
+        self.stdout.write(f"  {'endpoint':<48} {'n':>6} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'p50 grab.':>10}")
+        for nombre, e in informe["endpoints"].items():
+            grabado = f"{e['ms_p50_grabado']:.1f}" if e["ms_p50_grabado"] is not None else "-"
+            linea = (f"  {nombre[:48]:<48} {e['n']:>6} {e['errores']:>5} {e['ms_p50']:>8.1f} {e['ms_p95']:>8.1f} "
+                     f"{e['ms_p99']:>8.1f} {e['ms_max']:>8.1f} {grabado:>10}")
+            self.stdout.write(self.style.WARNING(linea) if e["errores"] else linea)
+        for falla in informe["fallas"]:
+            self.stdout.write(self.style.ERROR(f"  {falla}"))
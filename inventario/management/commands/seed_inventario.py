@@ -0,0 +1,447 @@
+"""
+Datos sintéticos a escala de producción, para medir con bench_inventario.
+
+    python manage.py seed_inventario --escala 10
+    python manage.py seed_inventario --notas 50000 --salidas 20000 --chunk 5000
+
+Todo entra con bulk_create por bloques de --chunk filas. bulk_create no pasa
+por save() ni manda signals, así que aquí se arma lo que esos harían:
+search_document, los totales guardados de notas y salidas, el número de la
+salida, cantidad_disponible de los detalles, stock de productos e insumos y
+saldo_resultante del kardex; al final se tocan los tokens de versión.
+
+Los datos son coherentes: las notas consumen insumos según la receta (BOM),
+los traslados mueven stock disponible a otra bodega y las salidas descuentan
+FIFO por fecha de nota, con su traza en NotaSalidaAfectacionStock.
+
+Los códigos llevan --prefijo: se puede correr varias veces sobre la misma BD
+con prefijos distintos. Escribe en la BD configurada (DATABASE_URL / db.sqlite3).
+"""
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from inventario.busqueda import documento
+from inventario.models import (
+    Bodega, DatosAdicionalesProducto, Impuesto, Insumo, InsumoMovimiento, NotaEnsamble, NotaEnsambleDetalle,
+    NotaSalidaAfectacionStock, NotaSalidaProducto, NotaSalidaProductoDetalle, Operador, PrecioProducto, Producto,
+    ProductoInsumo, ProductoTerminadoMovimiento, Proveedor, Talla, Tercero, TrasladoProducto,
+)
+from inventario.services.inventory_service import resumen_productos
+from inventario.utils import versiones
+
+TALLAS = ("XS", "S", "M", "L", "XL", "XXL")
+PRENDAS = ("Camisa", "Pantalón", "Chaqueta", "Buzo", "Falda", "Vestido", "Camiseta", "Bermuda", "Blusa", "Jogger")
+INSUMOS = ("Tela", "Botón", "Hilo", "Cremallera", "Etiqueta", "Resorte", "Forro", "Entretela", "Broche", "Cordón")
+COLORES = ("azul", "rojo", "negro", "blanco", "verde", "gris", "beige", "café")
+UNIDADES = ("M", "UN", "UN", "ROLLO", "UN", "M", "M", "M", "UN", "M")
+
+# volúmenes con --escala 1
+VOLUMENES = {
+    "bodegas": 8,
+    "terceros": 50,
+    "operadores": 20,
+    "proveedores": 30,
+    "insumos": 2000,
+    "productos": 1000,
+    "notas": 3000,
+    "traslados": 1500,
+    "salidas": 2000,
+    "kardex": 20000,
+    "kardex_terminado": 5000,
+}
+
+TRES = Decimal("0.001")
+DOS = Decimal("0.01")
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos (bodegas, insumos, productos con BOM, notas, traslados, salidas, kardex) con bulk_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escala", type=float, default=1.0, help="Multiplica todos los volúmenes por defecto.")
+        for nombre, valor in VOLUMENES.items():
+            parser.add_argument(
+                f"--{nombre.replace('_', '-')}", type=int, default=None,
+                help=f"Cantidad de {nombre.replace('_', ' ')} (por defecto {valor} × escala).",
+            )
+        parser.add_argument("--bom", type=int, default=3, help="Insumos por producto en la receta.")
+        parser.add_argument("--detalles-nota", type=int, default=4, help="Líneas (producto × talla) por nota.")
+        parser.add_argument("--detalles-salida", type=int, default=3, help="Líneas por nota de salida.")
+        parser.add_argument("--dias", type=int, default=365, help="Los documentos se reparten en los últimos N días.")
+        parser.add_argument("--chunk", type=int, default=2000, help="Filas por bulk_create.")
+        parser.add_argument("--prefijo", default="SYN", help="Prefijo de los códigos (máx. 8 caracteres).")
+        parser.add_argument("--semilla", type=int, default=42, help="Semilla del generador aleatorio.")
+
+    def handle(self, *args, **opts):
+        self.p = opts["prefijo"].upper()
+        if not self.p.isalnum() or len(self.p) > 8:
+            raise CommandError("--prefijo: solo letras y números, máximo 8.")
+        if Bodega.objects.filter(codigo__startswith=f"{self.p}-").exists():
+            raise CommandError(f"Ya hay datos con el prefijo {self.p}: usa otro --prefijo.")
+
+        self.rnd = random.Random(opts["semilla"])
+        self.chunk = opts["chunk"]
+        self.dias = opts["dias"]
+        self.hoy = timezone.localdate()
+        self.n = {
+            nombre: max(1, int(opts[nombre] if opts[nombre] is not None else valor * opts["escala"]))
+            for nombre, valor in VOLUMENES.items()
+        }
+        self.n["bodegas"] = max(2, self.n["bodegas"])  # los traslados necesitan otra bodega
+        self.n["bom"] = opts["bom"]
+        self.n["detalles_nota"] = opts["detalles_nota"]
+        self.n["detalles_salida"] = opts["detalles_salida"]
+
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            self.catalogos()
+            self.insumos()
+            self.productos()
+            self.notas_ensamble()
+            self.traslados()
+            self.salidas()
+            self.kardex_insumos()
+            self.kardex_terminado()
+            self.stock_productos()
+
+        tablas = [m._meta.db_table for m in (
+            Bodega, Tercero, Operador, Proveedor, Talla, Impuesto, Insumo, InsumoMovimiento, Producto,
+            Producto.impuestos.through, PrecioProducto, DatosAdicionalesProducto, ProductoInsumo, NotaEnsamble,
+            NotaEnsambleDetalle, TrasladoProducto, NotaSalidaProducto, NotaSalidaProductoDetalle,
+            NotaSalidaAfectacionStock, ProductoTerminadoMovimiento,
+        )]
+        versiones.invalidar_local(*tablas)
+        versiones.tocar(*tablas)
+        self.stdout.write(self.style.SUCCESS(f"Listo en {time.perf_counter() - inicio:.1f} s (prefijo {self.p})."))
+
+    # ------------------------------------------------------------------
+    # helpers
+    # ------------------------------------------------------------------
+    def crear(self, model, objs, etiqueta=None):
+        t0 = time.perf_counter()
+        model.objects.bulk_create(objs, batch_size=self.chunk)
+        etiqueta = etiqueta or model._meta.model_name
+        self.stdout.write(f"  {etiqueta:<32} {len(objs):>9} filas  {time.perf_counter() - t0:6.1f} s")
+        return objs
+
+    def tercero(self):
+        return self.rnd.choice(self.terceros)
+
+    def fecha(self, desde=None):
+        """Día al azar entre `desde` (o hace --dias días) y hoy."""
+        inicio = desde or self.hoy - timedelta(days=self.dias)
+        return inicio + timedelta(days=self.rnd.randint(0, max(0, (self.hoy - inicio).days)))
+
+    def fechar(self, model, campo, objs, dias):
+        """Campos auto_now_add: bulk_create los pone en ahora; se corrigen con un UPDATE por día."""
+        por_dia = defaultdict(list)
+        for obj, dia in zip(objs, dias):
+            por_dia[dia].append(obj.pk)
+        for dia, pks in por_dia.items():
+            valor = timezone.make_aware(datetime.combine(dia, dtime(12)))
+            for i in range(0, len(pks), self.chunk):
+                model.objects.filter(pk__in=pks[i:i + self.chunk]).update(**{campo: valor})
+
+    # ------------------------------------------------------------------
+    # fases
+    # ------------------------------------------------------------------
+    def catalogos(self):
+        p = self.p
+        existentes = set(Talla.objects.values_list("nombre", flat=True))
+        self.crear(Talla, [Talla(nombre=t) for t in TALLAS if t not in existentes])
+        self.tallas = list(Talla.objects.filter(nombre__in=TALLAS))
+        self.iva, _ = Impuesto.objects.get_or_create(nombre="IVA", defaults={"valor": Decimal("19")})
+
+        self.bodegas = self.crear(Bodega, [
+            Bodega(codigo=f"{p}-B{i:03d}", nombre=f"{p} BODEGA {i}", ubicacion=f"Sede {i % 4 + 1}")
+            for i in range(self.n["bodegas"])
+        ])
+        self.terceros = self.crear(Tercero, [
+            Tercero(codigo=f"{p}-T{i:05d}", nombre=f"{p} CLIENTE {i}") for i in range(self.n["terceros"])
+        ])
+        self.operadores = self.crear(Operador, [
+            Operador(codigo=f"{p}-OP{i:04d}", nombre=f"{p} TALLER {i}") for i in range(self.n["operadores"])
+        ])
+        self.proveedores = self.crear(Proveedor, [
+            Proveedor(nombre=f"{p} PROVEEDOR {i}") for i in range(self.n["proveedores"])
+        ])
+
+    def insumos(self):
+        p, rnd = self.p, self.rnd
+        objs = []
+        for i in range(self.n["insumos"]):
+            k = i % len(INSUMOS)
+            codigo = f"{p}-INS-{i:06d}"
+            nombre = f"{INSUMOS[k]} {COLORES[(i // len(INSUMOS)) % len(COLORES)]} {i}"
+            objs.append(Insumo(
+                codigo=codigo, referencia=codigo, nombre=nombre, unidad_medida=UNIDADES[k],
+                color=COLORES[i % len(COLORES)], bodega=rnd.choice(self.bodegas),
+                proveedor=rnd.choice(self.proveedores), tercero=self.tercero(),
+                costo_unitario=Decimal(rnd.randint(50, 25000)), stock_minimo=Decimal(rnd.randint(0, 50)),
+                search_document=documento(codigo, codigo, nombre, ""),
+            ))
+        self.lista_insumos = self.crear(Insumo, objs)
+        # kardex de insumos: [(fecha, orden, movimiento)] por insumo; el saldo se calcula al final
+        self.movs_insumo = defaultdict(list)
+
+    def productos(self):
+        p, rnd = self.p, self.rnd
+        productos, precios, impuestos, bom = [], [], [], []
+        self.receta = {}
+        for i in range(self.n["productos"]):
+            sku = f"{p}-SKU-{i:06d}"
+            nombre = f"{PRENDAS[i % len(PRENDAS)]} {COLORES[(i // len(PRENDAS)) % len(COLORES)]} {i}"
+            barras = f"{p}{i:09d}"
+            producto = Producto(
+                codigo_sku=sku, nombre=nombre, codigo_barras=barras, unidad_medida="UN",
+                tercero=self.tercero(), search_document=documento(sku, nombre, barras),
+            )
+            productos.append(producto)
+            base = Decimal(rnd.randint(20, 300) * 1000)
+            precios.append(PrecioProducto(producto=producto, nombre="Detal", valor=base))
+            precios.append(PrecioProducto(producto=producto, nombre="Mayorista", valor=(base * Decimal("0.8")).quantize(DOS)))
+            if i % 10:
+                impuestos.append(Producto.impuestos.through(producto_id=sku, impuesto_id=self.iva.pk))
+            lineas = []
+            for insumo in rnd.sample(self.lista_insumos, min(self.n["bom"], len(self.lista_insumos))):
+                # Insumo.clean(): lo que se mide en unidades no admite decimales
+                enteras = insumo.unidad_medida in ("UN", "ROLLO")
+                cpu = Decimal(rnd.choice(("1", "2", "4", "6") if enteras else ("0.25", "0.5", "1", "1.5", "2")))
+                bom.append(ProductoInsumo(producto=producto, insumo=insumo, cantidad_por_unidad=cpu))
+                lineas.append((insumo, cpu))
+            self.receta[sku] = lineas
+
+        self.lista_productos = self.crear(Producto, productos)
+        self.crear(PrecioProducto, precios)
+        self.crear(Producto.impuestos.through, impuestos, "impuestos de producto")
+        self.crear(ProductoInsumo, bom)
+
+    def notas_ensamble(self):
+        rnd = self.rnd
+        notas, detalles, consumos = [], [], []
+        for _ in range(self.n["notas"]):
+            nota = NotaEnsamble(
+                bodega=rnd.choice(self.bodegas), tercero=self.tercero(),
+                operador=rnd.choice(self.operadores) if rnd.random() < 0.7 else None,
+                fecha_elaboracion=self.fecha(), costo_servicio=Decimal(rnd.randint(0, 200) * 1000),
+                observaciones=rnd.choice(("", "", "Pedido urgente", "Reposición", "Colección temporada")),
+            )
+            lineas = set()
+            while len(lineas) < self.n["detalles_nota"]:
+                lineas.add((rnd.choice(self.lista_productos), rnd.choice(self.tallas)))
+            nota._lineas = []
+            for producto, talla in lineas:
+                cantidad = Decimal(rnd.randint(5, 60))
+                det = NotaEnsambleDetalle(
+                    nota=nota, producto=producto, talla=talla, cantidad=cantidad,
+                    cantidad_disponible=cantidad, bodega_actual=nota.bodega,
+                )
+                det._fecha = nota.fecha_elaboracion
+                nota._lineas.append(det)
+                for insumo, cpu in self.receta[producto.codigo_sku]:
+                    cant = (cantidad * cpu).quantize(TRES)
+                    mov = InsumoMovimiento(
+                        insumo=insumo, tercero=nota.tercero, bodega=nota.bodega, tipo="CONSUMO_ENSAMBLE",
+                        cantidad=cant, unidad_medida=insumo.unidad_medida, costo_unitario=insumo.costo_unitario,
+                        total=(cant * insumo.costo_unitario).quantize(DOS), nota_ensamble=nota,
+                        observacion=f"Consumo ensamble {producto.codigo_sku}",
+                    )
+                    self.movs_insumo[insumo.codigo].append((nota.fecha_elaboracion, -cant, mov))
+                    consumos.append(mov)
+            notas.append(nota)
+            detalles.extend(nota._lineas)
+
+        # totales guardados (InventoryService.actualizar_totales_nota)
+        costo_movs = defaultdict(Decimal)
+        for mov in consumos:
+            costo_movs[id(mov.nota_ensamble)] += mov.total
+        for nota in notas:
+            nota.costo_total = costo_movs[id(nota)] + nota.costo_servicio
+            nota.total_cantidad = sum(d.cantidad for d in nota._lineas)
+            nota.items_count = len(nota._lineas)
+            nota.productos_resumen = resumen_productos(d.producto.nombre for d in nota._lineas)
+            nota.search_document = documento(
+                nota.observaciones, nota.tercero.nombre,
+                *(x for d in nota._lineas for x in (d.producto.nombre, d.producto.codigo_sku)),
+            )
+
+        # bulk_create copia el pk recién asignado de nota a nota_id al crear los hijos
+        self.crear(NotaEnsamble, notas)
+        self.detalles = self.crear(NotaEnsambleDetalle, detalles)
+        self.consumos = consumos
+
+    def traslados(self):
+        rnd = self.rnd
+        destino = {}  # (nota, producto, talla, bodega) → detalle en la bodega destino
+        traslados, dias, nuevos = [], [], []
+        for _ in range(self.n["traslados"]):
+            for _intento in range(10):
+                origen = rnd.choice(self.detalles)
+                if origen.cantidad_disponible >= 1:
+                    break
+            else:
+                continue
+            bodega = rnd.choice([b for b in self.bodegas if b.pk != origen.bodega_actual_id])
+            cantidad = Decimal(rnd.randint(1, int(min(origen.cantidad_disponible, 10))))
+            origen.cantidad_disponible -= cantidad
+
+            clave = (origen.nota_id, origen.producto_id, origen.talla_id, bodega.pk)
+            det = destino.get(clave)
+            if det is None:
+                det = NotaEnsambleDetalle(
+                    nota_id=origen.nota_id, producto=origen.producto, talla=origen.talla,
+                    cantidad=Decimal("0"), cantidad_disponible=Decimal("0"), bodega_actual=bodega,
+                )
+                det._fecha = origen._fecha
+                destino[clave] = det
+                nuevos.append(det)
+            det.cantidad_disponible += cantidad
+
+            traslados.append(TrasladoProducto(
+                tercero=self.tercero(), bodega_origen_id=origen.bodega_actual_id, bodega_destino=bodega,
+                producto=origen.producto, talla=origen.talla, cantidad=cantidad, detalle=origen,
+            ))
+            dias.append(self.fecha(origen._fecha))
+
+        self.detalles += self.crear(NotaEnsambleDetalle, nuevos, "detalles destino de traslados")
+        self.crear(TrasladoProducto, traslados)
+        self.fechar(TrasladoProducto, "creado_en", traslados, dias)
+
+    def salidas(self):
+        rnd, p = self.rnd, self.p
+        # stock FIFO: (bodega, producto, talla) → detalles ordenados por fecha de la nota
+        stock = defaultdict(list)
+        for det in sorted(self.detalles, key=lambda d: (d._fecha, d.pk)):
+            stock[(det.bodega_actual_id, det.producto_id, det.talla_id)].append(det)
+        por_bodega = defaultdict(list)
+        for clave in stock:
+            por_bodega[clave[0]].append(clave)
+
+        salidas, detalles, afectaciones = [], [], []
+        for i in range(self.n["salidas"]):
+            bodega_id = rnd.choice(list(por_bodega))
+            claves = rnd.sample(por_bodega[bodega_id], min(self.n["detalles_salida"], len(por_bodega[bodega_id])))
+            salida = NotaSalidaProducto(
+                bodega_id=bodega_id, tercero=self.tercero(), fecha=self.fecha(),
+                observacion=rnd.choice(("", "", "Despacho cliente", "Venta mostrador")),
+            )
+            salida.numero = f"NS-{salida.fecha:%Y%m%d}-{p}{i:06d}"
+            salida._lineas = []
+            for clave in claves:
+                disponible = sum(d.cantidad_disponible for d in stock[clave])
+                if disponible < 1:
+                    continue
+                restante = cantidad = Decimal(rnd.randint(1, int(min(disponible, 12))))
+                linea = NotaSalidaProductoDetalle(
+                    salida=salida, producto=stock[clave][0].producto, talla=stock[clave][0].talla.nombre,
+                    cantidad=cantidad, costo_unitario=Decimal(rnd.randint(20, 300) * 1000),
+                )
+                for det in stock[clave]:  # FIFO
+                    if restante <= 0:
+                        break
+                    tomar = min(det.cantidad_disponible, restante)
+                    if tomar <= 0:
+                        continue
+                    det.cantidad_disponible -= tomar
+                    restante -= tomar
+                    afectaciones.append(NotaSalidaAfectacionStock(salida_detalle=linea, detalle_stock=det, cantidad=tomar))
+                salida._lineas.append(linea)
+            if not salida._lineas:
+                continue
+
+            # totales guardados (InventoryService.actualizar_totales_salida)
+            salida.total_cantidad = sum(l.cantidad for l in salida._lineas)
+            salida.total_valor = sum(l.cantidad * l.costo_unitario for l in salida._lineas)
+            salida.items_count = len(salida._lineas)
+            salida.productos_resumen = resumen_productos(l.producto.nombre for l in salida._lineas)
+            salida.search_document = documento(
+                salida.numero, salida.observacion,
+                *(x for l in salida._lineas for x in (l.producto.nombre, l.producto.codigo_sku)),
+            )
+            salidas.append(salida)
+            detalles.extend(salida._lineas)
+
+        self.crear(NotaSalidaProducto, salidas)
+        self.crear(NotaSalidaProductoDetalle, detalles)
+        self.crear(NotaSalidaAfectacionStock, afectaciones)
+
+        t0 = time.perf_counter()
+        NotaEnsambleDetalle.objects.bulk_update(self.detalles, ["cantidad_disponible"], batch_size=self.chunk)
+        self.stdout.write(f"  {'cantidad_disponible (update)':<32} {len(self.detalles):>9} filas  {time.perf_counter() - t0:6.1f} s")
+
+    def kardex_insumos(self):
+        """Entradas sueltas + una entrada inicial por insumo que cubre todo el consumo; saldo por fecha."""
+        rnd = self.rnd
+        entradas = []
+        for i in range(self.n["kardex"]):
+            insumo = rnd.choice(self.lista_insumos)
+            cant = Decimal(rnd.randint(10, 500))
+            mov = InsumoMovimiento(
+                insumo=insumo, tercero=self.tercero(), bodega=insumo.bodega, tipo="ENTRADA", cantidad=cant,
+                unidad_medida=insumo.unidad_medida, costo_unitario=insumo.costo_unitario,
+                total=(cant * insumo.costo_unitario).quantize(DOS), factura=f"FAC-{i:07d}",
+            )
+            self.movs_insumo[insumo.codigo].append((self.fecha(), cant, mov))
+            entradas.append(mov)
+
+        apertura = self.hoy - timedelta(days=self.dias + 1)
+        iniciales = []
+        for insumo in self.lista_insumos:
+            movs = self.movs_insumo[insumo.codigo]
+            consumo = -sum((c for _, c, _ in movs if c < 0), Decimal("0"))
+            cant = consumo + Decimal(self.rnd.randint(100, 1000))
+            mov = InsumoMovimiento(
+                insumo=insumo, tercero=insumo.tercero, bodega=insumo.bodega, tipo="ENTRADA", cantidad=cant,
+                unidad_medida=insumo.unidad_medida, costo_unitario=insumo.costo_unitario,
+                total=(cant * insumo.costo_unitario).quantize(DOS), observacion="Inventario inicial",
+            )
+            movs.insert(0, (apertura, cant, mov))
+            iniciales.append(mov)
+
+            saldo = Decimal("0")
+            for _, delta, m in sorted(movs, key=lambda x: x[0]):
+                saldo += delta
+                m.saldo_resultante = saldo
+            insumo.cantidad = saldo
+
+        movimientos = iniciales + self.consumos + entradas
+        dias = {id(m): f for movs in self.movs_insumo.values() for f, _, m in movs}
+        self.crear(InsumoMovimiento, movimientos, "kardex de insumos")
+        self.fechar(InsumoMovimiento, "fecha", movimientos, [dias[id(m)] for m in movimientos])
+        Insumo.objects.bulk_update(self.lista_insumos, ["cantidad"], batch_size=self.chunk)
+
+    def kardex_terminado(self):
+        rnd = self.rnd
+        movs = []
+        for i in range(self.n["kardex_terminado"]):
+            cant = Decimal(rnd.randint(1, 40))
+            costo = Decimal(rnd.randint(10, 150) * 1000)
+            dia = self.fecha()
+            movs.append(ProductoTerminadoMovimiento(
+                fecha=timezone.make_aware(datetime.combine(dia, dtime(rnd.randint(7, 18)))),
+                bodega=rnd.choice(self.bodegas), tercero=self.tercero(), tipo="INGRESO_EXCEL",
+                producto=rnd.choice(self.lista_productos), talla=rnd.choice(self.tallas),
+                cantidad=cant, costo_unitario=costo, total=(cant * costo).quantize(DOS),
+                observacion="Importación sintética",
+            ))
+        self.crear(ProductoTerminadoMovimiento, movs, "kardex de producto terminado")
+
+    def stock_productos(self):
+        stock = defaultdict(Decimal)
+        for det in self.detalles:
+            stock[det.producto_id] += det.cantidad_disponible
+        self.crear(DatosAdicionalesProducto, [
+            DatosAdicionalesProducto(
+                producto=p, referencia=f"REF-{p.codigo_sku}", unidad="UN",
+                stock=stock[p.codigo_sku], stock_minimo=Decimal(self.rnd.randint(0, 30)),
+            )
+            for p in self.lista_productos
+        ])
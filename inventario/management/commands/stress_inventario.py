@@ -0,0 +1,379 @@
+"""
+Carga concurrente sobre el mismo stock, para medir bloqueos y consistencia.
+
+    DATABASE_URL=postgres://... python manage.py stress_inventario --hilos 16 --duracion 30
+    python manage.py stress_inventario --mezcla salida=5,traslado=3 --skus 1 --salida stress.json
+
+Arma un fixture propio (bodegas, productos con receta, insumos y stock inicial,
+todo con prefijo STRESS-) y lanza --hilos hilos a la vez, cada uno con su
+conexión, contra pocos SKUs para que se peleen las mismas filas:
+
+  salida     NotaSalidaProductoSerializer.save()            (FIFO sobre detalles)
+  traslado   TrasladoProductoViewSet.ejecutar                (entre las dos bodegas)
+  insumo     views.aplicar_movimiento_insumo                 (ENTRADA / SALIDA)
+  nota       InventoryService.create_assembly_note           (consume la receta)
+
+Por operación: ok / rechazadas (stock insuficiente: esperado) / deadlocks /
+conflictos (lock timeout, serialización, "database is locked") / errores,
+ops/s, latencia p50 / p95 y tiempo en sentencias SELECT ... FOR UPDATE (la
+espera por bloqueos de fila). Al final revisa invariantes sobre el fixture:
+
+  - cantidad_disponible negativa en NotaEnsambleDetalle
+  - stock global (DatosAdicionalesProducto.stock) ≠ suma de las capas
+  - producido − vendido ≠ suma de las capas (traslados solo mueven)
+  - Insumo.cantidad negativa o ≠ suma del kardex
+
+Pensado para PostgreSQL: en SQLite los escritores se serializan por archivo y
+lo que se mide es "database is locked" (--cualquier-bd para correrlo igual).
+El fixture se borra al terminar salvo con --conservar.
+"""
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, DecimalField, F, Sum, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from inventario.models import (
+    Bodega, DatosAdicionalesProducto, Insumo, InsumoMovimiento, NotaEnsamble, NotaEnsambleDetalle,
+    NotaSalidaProducto, NotaSalidaProductoDetalle, Producto, ProductoInsumo, Talla, Tercero, TrasladoProducto,
+)
+from inventario.serializers import NotaEnsambleSerializer, NotaSalidaProductoSerializer
+from inventario.services.inventory_service import InventoryService
+from inventario.utils import versiones
+from inventario.utils.estadistica import percentil
+from inventario.views import TrasladoProductoViewSet, aplicar_movimiento_insumo
+
+MEZCLA = "salida=4,traslado=3,insumo=2,nota=1"
+TALLAS = ("S", "M")
+
+# SQLSTATE de PostgreSQL
+DEADLOCK = "40P01"
+CONFLICTOS = ("40001", "55P03")  # serialization_failure, lock_not_available
+
+
+def clasificar(exc):
+    if isinstance(exc, (ValidationError, DjangoValidationError)):
+        return "rechazadas"
+    if isinstance(exc, DatabaseError):
+        causa = exc.__cause__
+        codigo = getattr(causa, "sqlstate", None) or getattr(causa, "pgcode", None)
+        if codigo == DEADLOCK:
+            return "deadlocks"
+        # SQLite: "database is locked" o, con caché compartida (BD en memoria de los tests),
+        # "database table is locked"
+        if codigo in CONFLICTOS or re.search(r"database (table )?is locked", str(exc)):
+            return "conflictos"
+    return "errores"
+
+
+class EsperaBloqueos:
+    """execute_wrapper: suma el tiempo de las sentencias SELECT ... FOR UPDATE."""
+
+    def __init__(self):
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if "FOR UPDATE" not in sql:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = "Salidas, traslados, movimientos de insumo y notas en paralelo sobre los mismos SKUs; revisa invariantes de stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8)
+        parser.add_argument("--duracion", type=float, default=20, help="Segundos de carga.")
+        parser.add_argument("--skus", type=int, default=2, help="SKUs en disputa (menos = más contención).")
+        parser.add_argument("--stock", type=int, default=500, help="Unidades iniciales por SKU y talla.")
+        parser.add_argument("--mezcla", default=MEZCLA, help=f"Pesos por operación (por defecto {MEZCLA}).")
+        parser.add_argument("--semilla", type=int, default=7)
+        parser.add_argument("--salida", help="Escribe el resultado en este JSON.")
+        parser.add_argument("--conservar", action="store_true", help="No borra el fixture al terminar.")
+        parser.add_argument("--cualquier-bd", action="store_true", help="Corre aunque la BD no sea PostgreSQL.")
+
+    def handle(self, *args, **opts):
+        if connection.vendor != "postgresql" and not opts["cualquier_bd"]:
+            raise CommandError(
+                f"La BD es {connection.vendor}: los bloqueos de fila solo se miden en PostgreSQL "
+                "(DATABASE_URL=postgres://...). --cualquier-bd para correrlo igual."
+            )
+        try:
+            pesos = {k: int(v) for k, v in (p.split("=") for p in opts["mezcla"].split(","))}
+        except ValueError:
+            raise CommandError(f"--mezcla inválida: {opts['mezcla']!r} (ej. {MEZCLA})")
+        desconocidas = set(pesos) - {"salida", "traslado", "insumo", "nota"}
+        if desconocidas:
+            raise CommandError(f"--mezcla: operaciones desconocidas {sorted(desconocidas)}")
+
+        self.prefijo = f"STRESS-{int(time.time()) % 100000:05d}"
+        self.stdout.write(f"Fixture {self.prefijo}: {opts['skus']} SKU(s) × {len(TALLAS)} tallas, {opts['stock']} u. c/u")
+        self.fixture(opts["skus"], opts["stock"])
+        try:
+            informe = self.cargar(opts["hilos"], opts["duracion"], pesos, opts["semilla"])
+            informe["invariantes"] = self.invariantes()
+        finally:
+            if not opts["conservar"]:
+                self.borrar_fixture()
+
+        informe.update({"bd": connection.vendor, "hilos": opts["hilos"], "skus": opts["skus"], "mezcla": pesos})
+        self.reportar(informe)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as fh:
+                json.dump(informe, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados en {opts['salida']}")
+        if any(informe["invariantes"].values()):
+            raise CommandError("Hay invariantes de stock violados (ver arriba).")
+
+    # ------------------------------------------------------------------
+    # fixture
+    # ------------------------------------------------------------------
+    def fixture(self, skus, stock):
+        p = self.prefijo
+        self.tercero = Tercero.objects.create(codigo=p, nombre=f"{p} TERCERO")
+        self.bodegas = [Bodega.objects.create(codigo=f"{p}-{x}", nombre=f"{p} BODEGA {x}") for x in "AB"]
+        self.tallas = [Talla.objects.get_or_create(nombre=t)[0] for t in TALLAS]
+
+        self.insumos = []
+        for i in range(2):
+            insumo = Insumo.objects.create(
+                codigo=f"{p}-I{i}", referencia=f"{p}-I{i}", nombre=f"{p} insumo {i}", unidad_medida="M",
+                bodega=self.bodegas[0], tercero=self.tercero, costo_unitario=Decimal("100"),
+            )
+            aplicar_movimiento_insumo(
+                insumo=insumo, tercero=self.tercero, tipo="ENTRADA", cantidad=Decimal(stock * skus * 100),
+                bodega=self.bodegas[0], observacion="Stock inicial stress",
+            )
+            self.insumos.append(insumo)
+
+        self.productos = []
+        for i in range(skus):
+            producto = Producto.objects.create(codigo_sku=f"{p}-P{i}", nombre=f"{p} producto {i}", unidad_medida="UN")
+            for insumo in self.insumos:
+                ProductoInsumo.objects.create(producto=producto, insumo=insumo, cantidad_por_unidad=Decimal("0.5"))
+            self.productos.append(producto)
+
+        # stock inicial por el camino normal: mantiene DatosAdicionalesProducto.stock y el kardex
+        self.nota({"cantidad": str(stock), "bodega": self.bodegas[0], "lineas": [
+            (producto, talla) for producto in self.productos for talla in self.tallas
+        ]})
+
+    def borrar_fixture(self):
+        p = self.prefijo
+        with transaction.atomic():
+            NotaSalidaProducto.objects.filter(bodega__codigo__startswith=p).delete()
+            TrasladoProducto.objects.filter(producto__codigo_sku__startswith=p).delete()
+            InsumoMovimiento.objects.filter(insumo__codigo__startswith=p).delete()
+            NotaEnsamble.objects.filter(bodega__codigo__startswith=p).delete()
+            Producto.objects.filter(codigo_sku__startswith=p).delete()
+            Insumo.objects.filter(codigo__startswith=p).delete()
+            Bodega.objects.filter(codigo__startswith=p).delete()
+            Tercero.objects.filter(codigo=p).delete()
+            # delete() por queryset no manda signals en los modelos sin post_delete (signals.py)
+            for modelo in (TrasladoProducto, InsumoMovimiento, Producto, Bodega, Tercero):
+                versiones.borrado(modelo)
+
+    # ------------------------------------------------------------------
+    # operaciones (cada una en su transacción, como en la API)
+    # ------------------------------------------------------------------
+    def salida(self, args):
+        ser = NotaSalidaProductoSerializer(data={
+            "fecha": timezone.localdate().isoformat(), "bodega_id": args["bodega"].id, "tercero_id": self.tercero.id,
+            "detalles_input": [
+                {"producto_id": producto.pk, "talla": talla.nombre, "cantidad": args["cantidad"], "costo_unitario": "1000"}
+                for producto, talla in args["lineas"]
+            ],
+        })
+        ser.is_valid(raise_exception=True)
+        ser.save()
+
+    def traslado(self, args):
+        producto, talla = args["lineas"][0]
+        destino = self.bodegas[1] if args["bodega"] == self.bodegas[0] else self.bodegas[0]
+        request = Request(self.fabrica.post("/api/traslados-producto/ejecutar/", {
+            "tercero_id": self.tercero.id, "bodega_origen_id": args["bodega"].id, "bodega_destino_id": destino.id,
+            "producto_id": producto.pk, "talla_id": talla.nombre, "cantidad": args["cantidad"],
+        }, format="json"), parsers=[JSONParser()])
+        TrasladoProductoViewSet(request=request, format_kwarg=None, action="ejecutar").ejecutar(request)
+
+    def insumo(self, args):
+        aplicar_movimiento_insumo(
+            insumo=args["insumo"], tercero=self.tercero, tipo=args["tipo"], cantidad=args["cantidad"],
+            bodega=self.bodegas[0],
+        )
+
+    def nota(self, args):
+        ser = NotaEnsambleSerializer(data={
+            "bodega_id": args["bodega"].id, "tercero_id": self.tercero.id,
+            "detalles_input": [
+                {"producto_id": producto.pk, "talla_id": talla.nombre, "cantidad": args["cantidad"]}
+                for producto, talla in args["lineas"]
+            ],
+        })
+        ser.is_valid(raise_exception=True)
+        with transaction.atomic():
+            InventoryService.create_assembly_note(ser, ser.validated_data)
+
+    def argumentos(self, op, rnd):
+        lineas = rnd.sample([(p, t) for p in self.productos for t in self.tallas], k=min(2, len(self.productos) * 2))
+        if op == "insumo":
+            return {"insumo": rnd.choice(self.insumos), "tipo": rnd.choice(("ENTRADA", "SALIDA")),
+                    "cantidad": str(rnd.randint(1, 20))}
+        if op == "nota":
+            return {"bodega": rnd.choice(self.bodegas), "lineas": lineas, "cantidad": str(rnd.randint(1, 5))}
+        return {"bodega": rnd.choice(self.bodegas), "lineas": lineas, "cantidad": str(rnd.randint(1, 4))}
+
+    # ------------------------------------------------------------------
+    # carga
+    # ------------------------------------------------------------------
+    def cargar(self, hilos, duracion, pesos, semilla):
+        self.fabrica = APIRequestFactory()
+        ops, w = zip(*pesos.items())
+        barrera = threading.Barrier(hilos)
+        registros = []
+        candado = threading.Lock()
+
+        def trabajador(n):
+            rnd = random.Random(semilla + n)
+            propios = []
+            espera = EsperaBloqueos()
+            try:
+                with connection.execute_wrapper(espera):
+                    barrera.wait()
+                    fin = time.monotonic() + duracion
+                    while time.monotonic() < fin:
+                        op = rnd.choices(ops, w)[0]
+                        args = self.argumentos(op, rnd)
+                        antes = espera.segundos
+                        inicio = time.perf_counter()
+                        try:
+                            getattr(self, op)(args)
+                            resultado = "ok"
+                        except Exception as exc:
+                            resultado = clasificar(exc)
+                            if resultado == "errores":
+                                self.stderr.write(f"  [{op}] {type(exc).__name__}: {exc}")
+                        propios.append((op, resultado, time.perf_counter() - inicio, espera.segundos - antes))
+            finally:
+                connection.close()
+                with candado:
+                    registros.extend(propios)
+
+        self.stdout.write(f"Carga: {hilos} hilos × {duracion:g} s ...")
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        total = time.perf_counter() - inicio
+
+        operaciones = {}
+        for op in ops:
+            filas = [r for r in registros if r[0] == op]
+            conteo = defaultdict(int)
+            for _, resultado, _, _ in filas:
+                conteo[resultado] += 1
+            latencias = [r[2] * 1000 for r in filas if r[1] in ("ok", "rechazadas")]
+            esperas = [r[3] * 1000 for r in filas]
+            operaciones[op] = {
+                "ok": conteo["ok"], "rechazadas": conteo["rechazadas"], "deadlocks": conteo["deadlocks"],
+                "conflictos": conteo["conflictos"], "errores": conteo["errores"],
+                "ops_por_segundo": round(conteo["ok"] / total, 2),
+                "ms_p50": round(statistics.median(latencias), 2) if latencias else 0.0,
+                "ms_p95": round(percentil(latencias, 95), 2),
+                "espera_bloqueo_ms_total": round(sum(esperas), 2),
+                "espera_bloqueo_ms_p95": round(percentil(esperas, 95), 2),
+            }
+        return {
+            "segundos": round(total, 2),
+            "ops_por_segundo": round(sum(1 for r in registros if r[1] == "ok") / total, 2),
+            "operaciones": operaciones,
+        }
+
+    # ------------------------------------------------------------------
+    # invariantes
+    # ------------------------------------------------------------------
+    def invariantes(self):
+        p = self.prefijo
+        capas = NotaEnsambleDetalle.objects.filter(producto__codigo_sku__startswith=p)
+        negativas = [
+            f"detalle {d['id']} ({d['producto_id']} {d['talla__nombre']}): {d['cantidad_disponible']}"
+            for d in capas.filter(cantidad_disponible__lt=0).values("id", "producto_id", "talla__nombre", "cantidad_disponible")
+        ]
+
+        disponible = dict(capas.values_list("producto_id").annotate(s=Sum("cantidad_disponible")))
+        producido = dict(capas.values_list("producto_id").annotate(s=Sum("cantidad")))
+        vendido = dict(
+            NotaSalidaProductoDetalle.objects.filter(producto__codigo_sku__startswith=p)
+            .values_list("producto_id").annotate(s=Sum("cantidad"))
+        )
+        globales = dict(
+            DatosAdicionalesProducto.objects.filter(producto__codigo_sku__startswith=p).values_list("producto_id", "stock")
+        )
+        cero = Decimal("0")
+        stock_global = [
+            f"{sku}: stock {globales.get(sku, cero)} ≠ capas {disponible.get(sku, cero)}"
+            for sku in sorted(disponible) if globales.get(sku, cero) != disponible.get(sku, cero)
+        ]
+        conservacion = [
+            f"{sku}: producido {producido[sku]} − vendido {vendido.get(sku, cero)} ≠ capas {disponible[sku]}"
+            for sku in sorted(disponible) if producido[sku] - vendido.get(sku, cero) != disponible[sku]
+        ]
+
+        kardex = dict(
+            InsumoMovimiento.objects.filter(insumo__codigo__startswith=p).values_list("insumo_id").annotate(s=Sum(Case(
+                When(tipo__in=("CREACION", "ENTRADA", "AJUSTE"), then=F("cantidad")),
+                When(tipo__in=("SALIDA", "CONSUMO_ENSAMBLE"), then=-F("cantidad")),
+                default=0, output_field=DecimalField(),
+            )))
+        )
+        insumos = [
+            f"{codigo}: cantidad {cantidad} ≠ kardex {kardex.get(codigo, cero)}"
+            for codigo, cantidad in Insumo.objects.filter(codigo__startswith=p).values_list("codigo", "cantidad")
+            if cantidad < 0 or cantidad != kardex.get(codigo, cero)
+        ]
+        return {
+            "disponible_negativo": negativas,
+            "stock_global_distinto_de_capas": stock_global,
+            "producido_menos_vendido_distinto_de_capas": conservacion,
+            "insumo_negativo_o_distinto_de_kardex": insumos,
+        }
+
+    def reportar(self, informe):
+        self.stdout.write(f"\n{informe['segundos']:.1f} s, {informe['ops_por_segundo']:.1f} ops/s ok en total\n")
+        self.stdout.write(
+            f"  {'operación':<10} {'ok':>6} {'rechaz':>7} {'deadlk':>7} {'confl':>6} {'error':>6} "
+            f"{'ops/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'bloqueo ms':>11} {'bloq p95':>9}"
+        )
+        for op, r in informe["operaciones"].items():
+            self.stdout.write(
+                f"  {op:<10} {r['ok']:>6} {r['rechazadas']:>7} {r['deadlocks']:>7} {r['conflictos']:>6} "
+                f"{r['errores']:>6} {r['ops_por_segundo']:>7.1f} {r['ms_p50']:>8.1f} {r['ms_p95']:>8.1f} "
+                f"{r['espera_bloqueo_ms_total']:>11.1f} {r['espera_bloqueo_ms_p95']:>9.1f}"
+            )
+        self.stdout.write("\nInvariantes:")
+        for nombre, violaciones in informe["invariantes"].items():
+            if not violaciones:
+                self.stdout.write(self.style.SUCCESS(f"  {nombre}: ok"))
+                continue
+            self.stdout.write(self.style.ERROR(f"  {nombre}: {len(violaciones)}"))
+            for v in violaciones[:10]:
+                self.stdout.write(f"    {v}")
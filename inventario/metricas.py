@@ -0,0 +1,101 @@
+"""
+Métricas en formato Prometheus, servidas en /metrics (sin servicio externo).
+
+  - por request (middleware/metricas.py), con etiquetas vista / accion / status:
+      inventario_http_request_seconds   histograma de latencia
+      inventario_http_db_seconds        histograma de tiempo en BD
+      inventario_http_db_consultas      histograma de consultas SQL
+  - de negocio:
+      inventario_movimientos_total{kardex, tipo}    movimientos de kardex escritos (signals)
+      inventario_bloqueos_stock_total{tabla}        select_for_update sobre filas de stock
+      inventario_importacion_filas_total{importacion, resultado}
+
+Con varios workers de gunicorn cada uno tiene sus contadores: si está definida
+la variable PROMETHEUS_MULTIPROC_DIR (antes de arrancar, directorio compartido
+y vacío; gunicorn.conf.py lo limpia) prometheus_client los escribe ahí y
+/metrics suma los de todos. Sin la variable, /metrics muestra solo el proceso
+que contesta.
+
+prometheus_client es opcional: sin él todo esto no hace nada y /metrics da 503.
+"""
+import os
+
+from django.http import HttpResponse
+
+from inventario.utils import tracing
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:  # opcional: sin prometheus_client no hay métricas
+    prometheus_client = None
+
+MULTIPROCESO = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+ETIQUETAS = ("vista", "accion", "status")
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+if prometheus_client is not None:
+    request_seconds = Histogram(
+        "inventario_http_request_seconds", "Latencia de los requests", ETIQUETAS, buckets=BUCKETS_SEGUNDOS,
+    )
+    db_seconds = Histogram(
+        "inventario_http_db_seconds", "Tiempo en BD por request", ETIQUETAS, buckets=BUCKETS_SEGUNDOS,
+    )
+    db_consultas = Histogram(
+        "inventario_http_db_consultas", "Consultas SQL por request", ETIQUETAS, buckets=BUCKETS_CONSULTAS,
+    )
+    movimientos = Counter("inventario_movimientos", "Movimientos de kardex escritos", ("kardex", "tipo"))
+    bloqueos_stock = Counter("inventario_bloqueos_stock", "select_for_update sobre filas de stock", ("tabla",))
+    filas_importacion = Counter(
+        "inventario_importacion_filas", "Filas procesadas en importaciones", ("importacion", "resultado"),
+    )
+
+
+def observar_request(vista, accion, status, segundos, db_segundos, consultas):
+    if prometheus_client is None:
+        return
+    etiquetas = (vista, accion, str(status))
+    request_seconds.labels(*etiquetas).observe(segundos)
+    db_seconds.labels(*etiquetas).observe(db_segundos)
+    db_consultas.labels(*etiquetas).observe(consultas)
+
+
+def movimiento_escrito(kardex, tipo, n=1):
+    if prometheus_client is not None and n:
+        movimientos.labels(kardex, tipo).inc(n)
+
+
+def bloqueo_stock(model):
+    tracing.sumar("bloqueos")  # en los spans abiertos (utils/tracing.py)
+    if prometheus_client is not None:
+        bloqueos_stock.labels(model._meta.model_name).inc()
+
+
+def filas_importadas(importacion, ok, errores):
+    if prometheus_client is None:
+        return
+    if ok:
+        filas_importacion.labels(importacion, "ok").inc(ok)
+    if errores:
+        filas_importacion.labels(importacion, "error").inc(errores)
+
+
+def exponer():
+    """(cuerpo, content type) con todas las métricas; sumadas entre procesos si hay multiproceso."""
+    if MULTIPROCESO:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def metrics_view(request):
+    if prometheus_client is None:
+        return HttpResponse("prometheus_client no está instalado\n", status=503, content_type="text/plain")
+    cuerpo, content_type = exponer()
+    return HttpResponse(cuerpo, content_type=content_type)
@@ -0,0 +1,161 @@
+"""
+Compresión de respuestas (gzip, o brotli si está instalado) según Accept-Encoding.
+
+Solo se comprime lo que vale la pena:
+  - tipos de texto (JSON, CSV, HTML...); xlsx / pdf / imágenes ya vienen
+    comprimidos y se dejan tal cual;
+  - respuestas normales de al menos COMPRESION_MIN_BYTES (las chicas no pagan
+    la CPU); las streaming (export CSV del kardex) se comprimen por chunks;
+  - nada que ya traiga Content-Encoding, ni 304 / 204.
+
+Parecido a django.middleware.gzip.GZipMiddleware, más brotli y el filtro por
+tipo y tamaño.
+"""
+import gzip
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+    "image/svg+xml",
+)
+
+_re_codificacion = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*")
+
+
+def _aceptadas(accept_encoding):
+    """{codificación: q} de un Accept-Encoding."""
+    aceptadas = {}
+    for parte in (accept_encoding or "").lower().split(","):
+        m = _re_codificacion.fullmatch(parte)
+        if not m:
+            continue
+        try:
+            q = float(m.group(2)) if m.group(2) else 1.0
+        except ValueError:
+            q = 0.0
+        aceptadas[m.group(1)] = q
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding):
+    """'br', 'gzip' o None según lo que acepta el cliente (brotli primero si está instalado)."""
+    aceptadas = _aceptadas(accept_encoding)
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+    mejor, mejor_q = None, 0.0
+    for cod in candidatas:
+        q = aceptadas.get(cod, comodin)
+        if q > mejor_q:
+            mejor, mejor_q = cod, q
+    return mejor
+
+
+def comprimible(content_type):
+    tipo = (content_type or "").split(";")[0].strip().lower()
+    return tipo.startswith(TIPOS_COMPRIMIBLES)
+
+
+class _Gzip:
+    def __init__(self, nivel):
+        # wbits 16+MAX_WBITS: formato gzip (con cabecera y CRC)
+        self._c = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data):
+        return self._c.compress(data)
+
+    def finish(self):
+        return self._c.flush(zlib.Z_FINISH)
+
+
+def _compresor(codificacion):
+    if codificacion == "br":
+        return brotli.Compressor(quality=getattr(settings, "COMPRESION_BROTLI_CALIDAD", 5))
+    return _Gzip(getattr(settings, "COMPRESION_GZIP_NIVEL", 6))
+
+
+def comprimir(data, codificacion):
+    if codificacion == "br":
+        return brotli.compress(data, quality=getattr(settings, "COMPRESION_BROTLI_CALIDAD", 5))
+    return gzip.compress(data, compresslevel=getattr(settings, "COMPRESION_GZIP_NIVEL", 6), mtime=0)
+
+
+def comprimir_stream(chunks, codificacion):
+    """
+    Comprime un iterable de chunks sin juntarlo en memoria. No se hace flush por
+    chunk (el CSV manda una fila por chunk y se perdería la compresión): sale lo
+    que el compresor va soltando a medida que llena su buffer.
+    """
+    compresor = _compresor(codificacion)
+    for chunk in chunks:
+        salida = compresor.process(chunk)
+        if salida:
+            yield salida
+    yield compresor.finish()
+
+
+async def _comprimir_stream_async(chunks, codificacion):
+    compresor = _compresor(codificacion)
+    async for chunk in chunks:
+        salida = compresor.process(chunk)
+        if salida:
+            yield salida
+    yield compresor.finish()
+
+
+class CompresionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, "COMPRESION_MIN_BYTES", 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.procesar(request, response)
+
+    def procesar(self, request, response):
+        if response.status_code in (204, 304) or response.has_header("Content-Encoding"):
+            return response
+        if not comprimible(response.get("Content-Type")):
+            return response
+
+        # de aquí en adelante la respuesta depende del Accept-Encoding (caches intermedias)
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        codificacion = elegir_codificacion(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if codificacion is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _comprimir_stream_async(response.streaming_content, codificacion)
+            else:
+                response.streaming_content = comprimir_stream(response.streaming_content, codificacion)
+            # el largo final no se conoce
+            del response.headers["Content-Length"]
+        else:
+            if len(response.content) < self.min_bytes:
+                return response
+            comprimido = comprimir(response.content, codificacion)
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers["Content-Length"] = str(len(comprimido))
+
+        # la representación cambió: un ETag fuerte ya no aplica byte a byte
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = codificacion
+        return response
@@ -0,0 +1,119 @@
+"""
+Cuántas consultas SQL hace cada request y cuánto tiempo pasan en la BD.
+
+Por request se registra: número de consultas, tiempo total en BD, la consulta
+más lenta (el SQL con placeholders, sin parámetros) y la vista/acción. Sale:
+
+  - en headers X-DB-Queries / X-DB-Time (ms) si CONSULTAS_HEADERS está activo;
+  - como WARNING en el logger "inventario.consultas" si pasa
+    CONSULTAS_PRESUPUESTO consultas o CONSULTAS_MS_LENTO ms de BD (la pista
+    típica de un N+1);
+  - el resto como INFO, una línea JSON por request: solo se ve con
+    CONSULTAS_LOG_LEVEL=INFO (por defecto WARNING).
+
+La ruta va con la query string saneada (grabacion.sanear_query): sin el valor
+de token, password, ... .
+
+Se mide con connection.execute_wrapper, así que funciona sin DEBUG. Lo que se
+consulta mientras se recorre una respuesta streaming (export CSV) ya no entra.
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("inventario.consultas")
+
+MAX_SQL_LOG = 500  # caracteres de la consulta más lenta en el log
+
+
+class Medicion:
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.mas_lenta = (0.0, "")
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo += duracion
+            if duracion > self.mas_lenta[0]:
+                self.mas_lenta = (duracion, sql)
+
+
+def vista_accion(request):
+    """('ProductoViewSet', 'list'), ('ReporteBodegasStockAPIView', 'get'); (None, None) si no resolvió."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None, None
+    func = match.func
+    cls = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if cls is None:
+        return match._func_path, request.method.lower()
+    acciones = getattr(func, "actions", None) or {}
+    return cls.__name__, acciones.get(request.method.lower(), request.method.lower())
+
+
+def nombre_vista(request):
+    """'ProductoViewSet.list' o la ruta si no resolvió."""
+    vista, accion = vista_accion(request)
+    return f"{vista}.{accion}" if vista else request.path
+
+
+class ConsultasMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, "CONSULTAS_HEADERS", settings.DEBUG)
+        self.presupuesto = getattr(settings, "CONSULTAS_PRESUPUESTO", 50)
+        self.ms_lento = getattr(settings, "CONSULTAS_MS_LENTO", 500)
+
+    def __call__(self, request):
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(medicion))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        db_ms = medicion.tiempo * 1000
+        request.consultas = medicion  # lo lee middleware/metricas.py
+
+        if self.headers:
+            response.headers["X-DB-Queries"] = str(medicion.consultas)
+            response.headers["X-DB-Time"] = f"{db_ms:.1f}"
+
+        self.registrar(request, response, medicion, db_ms, total_ms)
+        return response
+
+    def registrar(self, request, response, medicion, db_ms, total_ms):
+        excedido = medicion.consultas > self.presupuesto or db_ms > self.ms_lento
+        nivel = logging.WARNING if excedido else logging.INFO
+        if not logger.isEnabledFor(nivel):
+            return
+
+        from inventario.middleware.grabacion import sanear_query  # grabacion importa este módulo
+
+        lenta_s, lenta_sql = medicion.mas_lenta
+        query = sanear_query(request.META.get("QUERY_STRING", ""))
+        datos = {
+            "vista": nombre_vista(request),
+            "metodo": request.method,
+            "ruta": f"{request.path}?{query}" if query else request.path,
+            "status": response.status_code,
+            "consultas": medicion.consultas,
+            "db_ms": round(db_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "mas_lenta_ms": round(lenta_s * 1000, 1),
+            "mas_lenta_sql": lenta_sql[:MAX_SQL_LOG],
+        }
+        if excedido:
+            datos["presupuesto"] = self.presupuesto
+        logger.log(nivel, json.dumps(datos, ensure_ascii=False))
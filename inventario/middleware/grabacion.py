@@ -0,0 +1,113 @@
+"""
+Graba el tráfico real en un JSONL para reproducirlo después (replay_requests).
+
+Apagado por defecto: se activa con GRABACION_ARCHIVO (variable de entorno)
+apuntando al archivo donde agregar las líneas. Una línea por request:
+
+  {"ts": 1767225600.123, "metodo": "POST", "ruta": "/api/salidas-producto/",
+   "query": "", "content_type": "application/json", "cuerpo": {...},
+   "status": 201, "ms": 84.2, "vista": "NotaSalidaProductoViewSet.create"}
+
+Se sanea antes de escribir: no se guardan headers (ni cookies ni
+Authorization) y en query string y cuerpo se reemplaza el valor de las claves
+sensibles (password, token, secret, ...). Los multipart (importaciones Excel)
+se marcan como omitidos sin guardar el archivo; cuerpos de más de
+GRABACION_MAX_CUERPO bytes, igual.
+
+GRABACION_MUESTREO (0..1) graba solo una fracción de los requests. Cada línea
+se escribe con un solo write() en modo append, así que varios workers pueden
+compartir el archivo.
+"""
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from inventario.middleware.consultas import nombre_vista
+
+SENSIBLES = ("password", "passwd", "token", "secret", "authorization", "api_key", "apikey", "access", "refresh")
+OCULTO = "***"
+EXCLUIR = ("/metrics", "/admin/", "/static/")
+
+
+def sensible(clave):
+    clave = str(clave).lower()
+    return any(s in clave for s in SENSIBLES)
+
+
+def sanear(valor):
+    """Copia de un JSON con los valores de claves sensibles reemplazados."""
+    if isinstance(valor, dict):
+        return {k: OCULTO if sensible(k) else sanear(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [sanear(v) for v in valor]
+    return valor
+
+
+def sanear_query(query):
+    if not query:
+        return ""
+    return urlencode([(k, OCULTO if sensible(k) else v) for k, v in parse_qsl(query, keep_blank_values=True)], safe="*")
+
+
+class GrabacionMiddleware:
+    def __init__(self, get_response):
+        self.archivo = getattr(settings, "GRABACION_ARCHIVO", "")
+        if not self.archivo:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = getattr(settings, "GRABACION_MUESTREO", 1.0)
+        self.max_cuerpo = getattr(settings, "GRABACION_MAX_CUERPO", 64 * 1024)
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if request.path.startswith(EXCLUIR) or (self.muestreo < 1 and random.random() >= self.muestreo):
+            return self.get_response(request)
+
+        # el cuerpo se lee antes de la vista (después el stream ya se consumió)
+        cuerpo = self.cuerpo(request)
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        ms = (time.perf_counter() - inicio) * 1000
+
+        registro = {
+            "ts": round(time.time(), 3),
+            "metodo": request.method,
+            "ruta": request.path,
+            "query": sanear_query(request.META.get("QUERY_STRING", "")),
+            "content_type": request.content_type if cuerpo["cuerpo"] is not None else "",
+            **cuerpo,
+            "status": response.status_code,
+            "ms": round(ms, 1),
+            "vista": nombre_vista(request),
+        }
+        linea = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        with self.lock, open(self.archivo, "a", encoding="utf-8") as fh:
+            fh.write(linea)
+        return response
+
+    def cuerpo(self, request):
+        if request.method in ("GET", "HEAD", "OPTIONS", "DELETE"):
+            return {"cuerpo": None}
+        if request.content_type.startswith("multipart/"):
+            return {"cuerpo": None, "omitido": "multipart"}
+        try:
+            largo = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            largo = 0
+        if largo > self.max_cuerpo:
+            return {"cuerpo": None, "omitido": f"cuerpo de {largo} bytes"}
+
+        crudo = request.body.decode("utf-8", errors="replace")
+        if request.content_type == "application/json":
+            try:
+                return {"cuerpo": sanear(json.loads(crudo or "null"))}
+            except ValueError:
+                pass
+        if request.content_type == "application/x-www-form-urlencoded":
+            return {"cuerpo": sanear_query(crudo)}
+        return {"cuerpo": crudo}
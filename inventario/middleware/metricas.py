@@ -0,0 +1,34 @@
+"""
+Latencia, tiempo en BD y consultas de cada request para /metrics
+(inventario/metricas.py), por vista, acción y status.
+
+Va antes de ConsultasMiddleware en MIDDLEWARE: lee la medición que ese deja en
+request.consultas. Las rutas que no resuelven (404 de URL) van todas con
+vista "-" para no abrir una serie por ruta.
+"""
+import time
+
+from inventario import metricas
+from inventario.middleware.consultas import vista_accion
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        segundos = time.perf_counter() - inicio
+
+        vista, accion = vista_accion(request)
+        medicion = getattr(request, "consultas", None)
+        metricas.observar_request(
+            vista or "-",
+            accion or "-",
+            response.status_code,
+            segundos,
+            medicion.tiempo if medicion else 0.0,
+            medicion.consultas if medicion else 0,
+        )
+        return response
@@ -0,0 +1,170 @@
+"""
+Perfilado a pedido de un request puntual (¿el tiempo se va en SQL, Decimal,
+openpyxl o el serializer?).
+
+Doble llave: PERFILADO_ACTIVO en settings (si no, el middleware ni se carga)
+y el header X-Perfilar en el request, que vale si:
+  - coincide con PERFILADO_TOKEN (si está definido), o
+  - no hay token y el usuario es staff o DEBUG está activo.
+
+    curl -H "X-Perfilar: $PERFILADO_TOKEN" https://staging/api/reportes/exportar-excel/
+
+El request se corre bajo cProfile y, a la vez, un muestreador que cada
+PERFILADO_MUESTREO_MS ms toma la pila del hilo. En PERFILADO_DIR queda:
+
+  <id>.pstats     cProfile  (python -m pstats, snakeviz)
+  <id>.folded     pilas colapsadas "a;b;c N" (flamegraph.pl, speedscope)
+  <id>.sql.json   línea de tiempo SQL: inicio y duración en ms de cada consulta
+  <id>.txt        las 40 funciones con más tiempo acumulado
+
+y la respuesta lleva X-Perfil: <id>. Lo que se hace al recorrer una respuesta
+streaming (export CSV) ocurre después y no entra.
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from inventario.middleware.consultas import nombre_vista
+
+HEADER = "X-Perfilar"
+
+
+class LineaSQL:
+    """execute_wrapper: cada consulta con su inicio (relativo al request) y duración."""
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            fin = time.perf_counter()
+            self.consultas.append({
+                "inicio_ms": round((inicio - self.inicio) * 1000, 3),
+                "ms": round((fin - inicio) * 1000, 3),
+                "bd": context["connection"].alias,
+                "many": many,
+                "sql": sql,
+            })
+
+
+def nombre_marco(code):
+    ruta = code.co_filename
+    if "site-packages" in ruta:
+        ruta = ruta.split("site-packages", 1)[1].lstrip(os.sep)
+    elif ruta.startswith(str(settings.BASE_DIR)):
+        ruta = os.path.relpath(ruta, settings.BASE_DIR)
+    return f"{code.co_name} ({ruta}:{code.co_firstlineno})"
+
+
+class Muestreador(threading.Thread):
+    """Toma la pila de otro hilo cada `intervalo` segundos y cuenta pilas iguales."""
+
+    def __init__(self, hilo, intervalo):
+        super().__init__(daemon=True)
+        self.hilo = hilo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.parar = threading.Event()
+
+    def run(self):
+        while not self.parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo)
+            pila = []
+            while frame is not None:
+                pila.append(nombre_marco(frame.f_code))
+                frame = frame.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def colapsado(self):
+        return "".join(f"{pila} {n}\n" for pila, n in self.pilas.most_common())
+
+
+class PerfiladoMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PERFILADO_ACTIVO", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.token = getattr(settings, "PERFILADO_TOKEN", "")
+        self.directorio = Path(getattr(settings, "PERFILADO_DIR", settings.BASE_DIR / "perfiles"))
+        self.intervalo = getattr(settings, "PERFILADO_MUESTREO_MS", 5) / 1000
+
+    def autorizado(self, request):
+        valor = request.headers.get(HEADER)
+        if not valor:
+            return False
+        if self.token:
+            return hmac.compare_digest(valor, self.token)
+        usuario = getattr(request, "user", None)
+        return settings.DEBUG or bool(usuario and usuario.is_staff)
+
+    def __call__(self, request):
+        if not self.autorizado(request):
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        linea = LineaSQL(inicio)
+        muestreador = Muestreador(threading.get_ident(), self.intervalo)
+        perfil = cProfile.Profile()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(linea))
+            muestreador.start()
+            perfil.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                perfil.disable()
+                muestreador.parar.set()
+                muestreador.join()
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        id_perfil = self.guardar(request, response, perfil, muestreador, linea, total_ms)
+        response.headers["X-Perfil"] = id_perfil
+        return response
+
+    def guardar(self, request, response, perfil, muestreador, linea, total_ms):
+        vista = re.sub(r"[^A-Za-z0-9_.-]+", "_", nombre_vista(request)).strip("_")[:60]
+        id_perfil = f"{time.strftime('%Y%m%d-%H%M%S')}-{vista}-{secrets.token_hex(3)}"
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        base = self.directorio / id_perfil
+
+        perfil.dump_stats(f"{base}.pstats")
+        Path(f"{base}.folded").write_text(muestreador.colapsado(), encoding="utf-8")
+
+        sql_ms = sum(c["ms"] for c in linea.consultas)
+        Path(f"{base}.sql.json").write_text(json.dumps({
+            "metodo": request.method,
+            "ruta": request.get_full_path(),
+            "vista": nombre_vista(request),
+            "status": response.status_code,
+            "total_ms": round(total_ms, 1),
+            "sql_ms": round(sql_ms, 1),
+            "consultas": linea.consultas,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+        texto = io.StringIO()
+        texto.write(f"{request.method} {request.get_full_path()}  {total_ms:.1f} ms, "
+                    f"SQL {sql_ms:.1f} ms en {len(linea.consultas)} consultas\n\n")
+        pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(40)
+        Path(f"{base}.txt").write_text(texto.getvalue(), encoding="utf-8")
+        return id_perfil
@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0022_notaensamble_costo_servicio_notaensamble_operador'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='insumomovimiento',
+            index=models.Index(fields=['bodega', 'fecha'], name='inventario__bodega__f0271c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insumomovimiento',
+            index=models.Index(fields=['tercero', 'fecha'], name='inventario__tercero_9bbee0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insumomovimiento',
+            index=models.Index(fields=['tipo', 'bodega', 'fecha'], name='inventario__tipo_0b119e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notaensamble',
+            index=models.Index(fields=['fecha_elaboracion'], name='inventario__fecha_e_0fbc49_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notaensamble',
+            index=models.Index(fields=['bodega', 'fecha_elaboracion'], name='inventario__bodega__c10aa8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notaensamble',
+            index=models.Index(fields=['tercero', 'fecha_elaboracion'], name='inventario__tercero_662e9d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notasalidaproducto',
+            index=models.Index(fields=['fecha'], name='inventario__fecha_bcdc74_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notasalidaproducto',
+            index=models.Index(fields=['bodega', 'fecha'], name='inventario__bodega__549569_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notasalidaproducto',
+            index=models.Index(fields=['tercero', 'fecha'], name='inventario__tercero_0ac198_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productoterminadomovimiento',
+            index=models.Index(fields=['tercero', '-fecha'], name='inventario__tercero_d69fef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trasladoproducto',
+            index=models.Index(fields=['creado_en'], name='inventario__creado__aae43c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trasladoproducto',
+            index=models.Index(fields=['bodega_origen', 'creado_en'], name='inventario__bodega__19312c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trasladoproducto',
+            index=models.Index(fields=['bodega_destino', 'creado_en'], name='inventario__bodega__545134_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trasladoproducto',
+            index=models.Index(fields=['tercero', 'creado_en'], name='inventario__tercero_09c520_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:35
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_totales(apps, schema_editor):
+    NotaEnsamble = apps.get_model("inventario", "NotaEnsamble")
+    NotaEnsambleDetalle = apps.get_model("inventario", "NotaEnsambleDetalle")
+    InsumoMovimiento = apps.get_model("inventario", "InsumoMovimiento")
+
+    costos = dict(
+        InsumoMovimiento.objects.filter(nota_ensamble__isnull=False)
+        .values("nota_ensamble")
+        .annotate(x=Sum("total"))
+        .values_list("nota_ensamble", "x")
+    )
+
+    lineas = {}
+    for nota_id, cantidad, nombre in (
+        NotaEnsambleDetalle.objects.filter(cantidad__gt=0)
+        .order_by("nota_id", "id")
+        .values_list("nota_id", "cantidad", "producto__nombre")
+    ):
+        lineas.setdefault(nota_id, []).append((cantidad, nombre))
+
+    notas = []
+    for nota in NotaEnsamble.objects.all().only("id", "costo_servicio"):
+        detalles = lineas.get(nota.id, [])
+        nombres = list(dict.fromkeys(n for _, n in detalles if n))
+        if not nombres:
+            resumen = "—"
+        elif len(nombres) == 1:
+            resumen = nombres[0]
+        else:
+            resumen = f"{nombres[0]} (+{len(nombres)-1})"
+
+        nota.costo_total = (costos.get(nota.id) or Decimal("0")) + (nota.costo_servicio or Decimal("0"))
+        nota.total_cantidad = sum((c for c, _ in detalles), Decimal("0"))
+        nota.items_count = len(detalles)
+        nota.productos_resumen = resumen
+        notas.append(nota)
+
+    NotaEnsamble.objects.bulk_update(
+        notas, ["costo_total", "total_cantidad", "items_count", "productos_resumen"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0023_indices_fechas_reportes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notaensamble',
+            name='costo_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='notaensamble',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notaensamble',
+            name='productos_resumen',
+            field=models.CharField(blank=True, default='—', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='notaensamble',
+            name='total_cantidad',
+            field=models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.RunPython(backfill_totales, migrations.RunPython.noop),
+    ]
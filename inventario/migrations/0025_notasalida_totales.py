@@ -0,0 +1,68 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:36
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_totales(apps, schema_editor):
+    NotaSalidaProducto = apps.get_model("inventario", "NotaSalidaProducto")
+    NotaSalidaProductoDetalle = apps.get_model("inventario", "NotaSalidaProductoDetalle")
+
+    lineas = {}
+    for salida_id, cantidad, costo, nombre in (
+        NotaSalidaProductoDetalle.objects.order_by("salida_id", "id")
+        .values_list("salida_id", "cantidad", "costo_unitario", "producto__nombre")
+    ):
+        lineas.setdefault(salida_id, []).append((cantidad, costo, nombre))
+
+    salidas = []
+    for salida in NotaSalidaProducto.objects.all().only("id"):
+        detalles = lineas.get(salida.id, [])
+        nombres = list(dict.fromkeys(n for _, _, n in detalles if n))
+        if not nombres:
+            resumen = "—"
+        elif len(nombres) == 1:
+            resumen = nombres[0]
+        else:
+            resumen = f"{nombres[0]} (+{len(nombres)-1})"
+
+        salida.total_cantidad = sum((c for c, _, _ in detalles), Decimal("0"))
+        salida.total_valor = sum((c * cu for c, cu, _ in detalles if cu is not None), Decimal("0"))
+        salida.items_count = len(detalles)
+        salida.productos_resumen = resumen
+        salidas.append(salida)
+
+    NotaSalidaProducto.objects.bulk_update(
+        salidas, ["total_cantidad", "total_valor", "items_count", "productos_resumen"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0024_notaensamble_totales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notasalidaproducto',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notasalidaproducto',
+            name='productos_resumen',
+            field=models.CharField(blank=True, default='—', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='notasalidaproducto',
+            name='total_cantidad',
+            field=models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='notasalidaproducto',
+            name='total_valor',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16),
+        ),
+        migrations.RunPython(backfill_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+from inventario.busqueda import TABLAS_BUSQUEDA, documento, tabla_fts
+
+
+def backfill_documentos(apps, schema_editor):
+    Insumo = apps.get_model("inventario", "Insumo")
+    Producto = apps.get_model("inventario", "Producto")
+    NotaEnsamble = apps.get_model("inventario", "NotaEnsamble")
+    NotaEnsambleDetalle = apps.get_model("inventario", "NotaEnsambleDetalle")
+    NotaSalidaProducto = apps.get_model("inventario", "NotaSalidaProducto")
+    NotaSalidaProductoDetalle = apps.get_model("inventario", "NotaSalidaProductoDetalle")
+
+    insumos = list(Insumo.objects.only("codigo", "referencia", "nombre", "observacion"))
+    for i in insumos:
+        i.search_document = documento(i.codigo, i.referencia, i.nombre, i.observacion)
+    Insumo.objects.bulk_update(insumos, ["search_document"], batch_size=500)
+
+    productos = list(Producto.objects.only("codigo_sku", "nombre", "codigo_barras"))
+    for p in productos:
+        p.search_document = documento(p.codigo_sku, p.nombre, p.codigo_barras)
+    Producto.objects.bulk_update(productos, ["search_document"], batch_size=500)
+
+    lineas = {}
+    for nota_id, nombre, sku in (
+        NotaEnsambleDetalle.objects.order_by("nota_id", "id")
+        .values_list("nota_id", "producto__nombre", "producto_id")
+    ):
+        lineas.setdefault(nota_id, []).extend([nombre, sku])
+
+    notas = list(NotaEnsamble.objects.select_related("tercero").only("id", "observaciones", "tercero__nombre"))
+    for n in notas:
+        n.search_document = documento(
+            n.observaciones, n.tercero.nombre if n.tercero_id else None, *lineas.get(n.id, [])
+        )
+    NotaEnsamble.objects.bulk_update(notas, ["search_document"], batch_size=500)
+
+    lineas = {}
+    for salida_id, nombre, sku in (
+        NotaSalidaProductoDetalle.objects.order_by("salida_id", "id")
+        .values_list("salida_id", "producto__nombre", "producto_id")
+    ):
+        lineas.setdefault(salida_id, []).extend([nombre, sku])
+
+    salidas = list(NotaSalidaProducto.objects.only("id", "numero", "observacion"))
+    for s in salidas:
+        s.search_document = documento(s.numero, s.observacion, *lineas.get(s.id, []))
+    NotaSalidaProducto.objects.bulk_update(salidas, ["search_document"], batch_size=500)
+
+
+def crear_indices_trigram(apps, schema_editor):
+    # Solo PostgreSQL. En SQLite las tablas FTS5 las crea post_migrate (inventario.busqueda).
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for tabla in TABLAS_BUSQUEDA:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {tabla}_search_trgm "
+            f"ON {tabla} USING gin (search_document gin_trgm_ops)"
+        )
+
+
+def borrar_indices_trigram(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla in TABLAS_BUSQUEDA:
+        if vendor == "postgresql":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {tabla}_search_trgm")
+        elif vendor == "sqlite":
+            # los triggers leen search_document: se van antes de quitar la columna
+            for sufijo in ("ai", "ad", "au"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {tabla_fts(tabla)}_{sufijo}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {tabla_fts(tabla)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0025_notasalida_totales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insumo',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='notaensamble',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='notasalidaproducto',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_documentos, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices_trigram, borrar_indices_trigram),
+    ]
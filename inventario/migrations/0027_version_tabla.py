@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-19 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0026_busqueda_documento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionTabla',
+            fields=[
+                ('clave', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('token', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -4,6 +4,8 @@ from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 
+from .busqueda import documento
+
 class Proveedor(models.Model):
     nombre = models.CharField(max_length=100, db_index=True)
     es_activo = models.BooleanField(default=True)
@@ -91,9 +93,21 @@ class Producto(models.Model):
     actualizado_en = models.DateTimeField(auto_now=True)
     es_activo = models.BooleanField(default=True)
 
+    # texto normalizado para ?search= (ver inventario/busqueda.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
+
+    CAMPOS_BUSQUEDA = ("codigo_sku", "nombre", "codigo_barras")
+
     def __str__(self):
         return f"{self.codigo_sku} - {self.nombre}"
 
+    def save(self, *args, **kwargs):
+        self.search_document = documento(*(getattr(self, c) for c in self.CAMPOS_BUSQUEDA))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.CAMPOS_BUSQUEDA):
+            kwargs["update_fields"] = {*update_fields, "search_document"}
+        super().save(*args, **kwargs)
+
     @property
     def subtotal_sin_impuestos(self):
         total = Decimal("0")
@@ -258,6 +272,11 @@ class Insumo(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    # texto normalizado para ?search= (ver inventario/busqueda.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
+
+    CAMPOS_BUSQUEDA = ("codigo", "referencia", "nombre", "observacion")
+
     def clean(self):
         super().clean()
         # Si la unidad es "unidad" (o similar), validar que la cantidad sea entera
@@ -276,6 +295,10 @@ class Insumo(models.Model):
         # si referencia viene vacía (por seguridad), se setea al código
         if not self.referencia:
             self.referencia = self.codigo
+        self.search_document = documento(*(getattr(self, c) for c in self.CAMPOS_BUSQUEDA))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.CAMPOS_BUSQUEDA):
+            kwargs["update_fields"] = {*update_fields, "search_document"}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -290,9 +313,28 @@ class NotaEnsamble(models.Model):
     observaciones = models.TextField(null=True, blank=True)
     costo_servicio = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0"))
 
+    # Totales guardados (los mantiene InventoryService.actualizar_totales_nota)
+    # para que el historial se liste sin agregados ni joins a detalles/movimientos.
+    # Solo cuentan las líneas producidas: los detalles con cantidad 0 que crean
+    # los traslados en la bodega destino no suman a items_count (antes el
+    # Count("detalles") los contaba).
+    costo_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+    total_cantidad = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal("0"))
+    items_count = models.PositiveIntegerField(default=0)
+    productos_resumen = models.CharField(max_length=200, blank=True, default="—")
+    # texto normalizado para ?search=: observaciones, tercero y productos (ver inventario/busqueda.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
+
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["fecha_elaboracion"]),
+            models.Index(fields=["bodega", "fecha_elaboracion"]),
+            models.Index(fields=["tercero", "fecha_elaboracion"]),
+        ]
+
     def __str__(self):
         return f"NotaEns#{self.id}"
 
@@ -425,6 +467,14 @@ class TrasladoProducto(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["creado_en"]),
+            models.Index(fields=["bodega_origen", "creado_en"]),
+            models.Index(fields=["bodega_destino", "creado_en"]),
+            models.Index(fields=["tercero", "creado_en"]),
+        ]
+
     def __str__(self):
         return f"Traslado {self.id} {self.producto_id} {self.cantidad} {self.bodega_origen_id}->{self.bodega_destino_id}"
 
@@ -440,10 +490,24 @@ class NotaSalidaProducto(models.Model):
 
     observacion = models.TextField(blank=True)
 
+    # Totales guardados (los mantiene InventoryService.actualizar_totales_salida)
+    # para paginar el historial sin agregados ni joins a detalles/productos.
+    total_cantidad = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal("0"))
+    total_valor = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0"))
+    items_count = models.PositiveIntegerField(default=0)
+    productos_resumen = models.CharField(max_length=200, blank=True, default="—")
+    # texto normalizado para ?search=: número, observación y productos (ver inventario/busqueda.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
+
     creado_en = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["fecha"]),
+            models.Index(fields=["bodega", "fecha"]),
+            models.Index(fields=["tercero", "fecha"]),
+        ]
 
     def __str__(self):
         return self.numero or f"SALIDA-{self.id}"
@@ -540,6 +604,10 @@ class InsumoMovimiento(models.Model):
         indexes = [
             models.Index(fields=["insumo", "-fecha"]),
             models.Index(fields=["tipo", "-fecha"]),
+            # Predicados de reportes: bodega/tercero + rango de fechas
+            models.Index(fields=["bodega", "fecha"]),
+            models.Index(fields=["tercero", "fecha"]),
+            models.Index(fields=["tipo", "bodega", "fecha"]),
         ]
 
 class ProductoTerminadoMovimiento(models.Model):
@@ -585,6 +653,7 @@ class ProductoTerminadoMovimiento(models.Model):
             models.Index(fields=["producto", "-fecha"]),
             models.Index(fields=["bodega", "-fecha"]),
             models.Index(fields=["tipo", "-fecha"]),
+            models.Index(fields=["tercero", "-fecha"]),
         ]
 
     def clean(self):
@@ -594,4 +663,12 @@ class ProductoTerminadoMovimiento(models.Model):
     def save(self, *args, **kwargs):
         if self.total is None or self.total == Decimal("0.00"):
             self.total = (Decimal(str(self.cantidad or 0)) * Decimal(str(self.costo_unitario or 0))).quantize(Decimal("0.01"))
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class VersionTabla(models.Model):
+    """
+    Tokens de versión por tabla (inventario/utils/versiones.py) cuando no hay
+    Redis: una fila por clave, se escriben todas con un solo upsert.
+    """
+    clave = models.CharField(max_length=120, primary_key=True)
+    token = models.BigIntegerField()
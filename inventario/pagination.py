@@ -1,6 +1,238 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
 class Default30Pagination(PageNumberPagination):
     page_size = 30
     page_size_query_param = "page_size"  # opcional (si quieres permitir cambiar)
-    max_page_size = 200
\ No newline at end of file
+    max_page_size = 200
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre el order_by que ya trae el queryset.
+
+    El cursor guarda los valores de la última fila de la página y la siguiente se
+    pide con WHERE (a, b) < (x, y) expandido en OR/AND: la página N cuesta lo mismo
+    que la 1 (usa el índice de orden, sin OFFSET) y no se hace COUNT(*).
+
+    Requisitos: los campos de orden no pueden ser NULL; si el orden no incluye la PK
+    se agrega como desempate con la dirección del último campo.
+    """
+    page_size = Default30Pagination.page_size
+    page_size_query_param = "page_size"
+    max_page_size = Default30Pagination.max_page_size
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Cursor inválido."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self._model_field(queryset.model, name) for _, name in self.ordering]
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor["r"])
+
+        qs = queryset.order_by(*self._order_by(reverse))
+        if cursor is not None:
+            qs = qs.filter(self._keyset_filter(cursor["v"], reverse))
+
+        # una fila de más para saber si hay otra página
+        rows = list(qs[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    # ----------------------------
+    # Orden
+    # ----------------------------
+    def get_ordering(self, queryset):
+        order_by = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not order_by:
+            order_by = ["-pk"]
+
+        ordering = []
+        for item in order_by:
+            if not isinstance(item, str):
+                raise ValueError("KeysetPagination solo soporta order_by por nombre de campo.")
+            desc = item.startswith("-")
+            name = item.lstrip("-")
+            if name == "pk":
+                name = queryset.model._meta.pk.name
+            ordering.append((desc, name))
+
+        pk_name = queryset.model._meta.pk.name
+        if pk_name not in [name for _, name in ordering]:
+            ordering.append((ordering[-1][0], pk_name))
+        return ordering
+
+    def _order_by(self, reverse):
+        return [
+            ("-" if desc != reverse else "") + name
+            for desc, name in self.ordering
+        ]
+
+    def _keyset_filter(self, values, reverse):
+        """
+        (a, b, c) después de (x, y, z):
+            a > x  OR  (a = x AND b > y)  OR  (a = x AND b = y AND c > z)
+        con < / > según la dirección de cada campo.
+        """
+        condition = Q()
+        igualdad = {}
+        for (desc, name), value in zip(self.ordering, values):
+            lookup = "lt" if desc != reverse else "gt"
+            condition |= Q(**igualdad, **{f"{name}__{lookup}": value})
+            igualdad[name] = value
+        return condition
+
+    @staticmethod
+    def _model_field(model, name):
+        field = None
+        for part in name.split("__"):
+            field = model._meta.get_field(part)
+            if field.is_relation:
+                model = field.related_model
+        if field.is_relation:
+            field = field.target_field
+        return field
+
+    def _row_values(self, obj):
+        if isinstance(obj, dict):  # queryset .values() (campos.CamposDinamicosMixin)
+            return [obj[name] for _, name in self.ordering]
+        values = []
+        for _, name in self.ordering:
+            value = obj
+            for part in name.split("__"):
+                value = getattr(value, part)
+            if hasattr(value, "pk"):
+                value = value.pk
+            values.append(value)
+        return values
+
+    # ----------------------------
+    # Cursor
+    # ----------------------------
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw:
+            try:
+                size = int(raw)
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (TypeError, ValueError):
+                pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            raw_values = payload["v"]
+            if len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [field.to_python(v) for field, v in zip(self.fields, raw_values)]
+            return {"v": values, "r": bool(payload.get("r"))}
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        raw_values = [_to_text(value) for value in self._row_values(obj)]
+        payload = {"v": raw_values}
+        if reverse:
+            payload["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode("ascii"))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+def _to_text(value):
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class KardexPagination(Default30Pagination):
+    """
+    Paginación de historiales (kardex, traslados, notas).
+
+    Por defecto es la misma paginación por número de página (count + results) que
+    usa el frontend. Con ?paginacion=cursor (o si llega ?cursor=...) pasa a
+    KeysetPagination: sin COUNT(*) y sin OFFSET.
+    """
+    mode_query_param = "paginacion"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._keyset = None
+        modo = (request.query_params.get(self.mode_query_param) or "").lower()
+        if modo == "cursor" or request.query_params.get(KeysetPagination.cursor_query_param):
+            self._keyset = KeysetPagination()
+            return self._keyset.paginate_queryset(queryset, request, view=view)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self._keyset is not None:
+            return self._keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if getattr(self, "_keyset", None) is not None:
+            return self._keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if getattr(self, "_keyset", None) is not None:
+            return self._keyset.get_previous_link()
+        return super().get_previous_link()
@@ -0,0 +1,176 @@
+"""
+Lecturas pesadas (reportes, exportaciones, listas) en la réplica de solo
+lectura, para que no compitan con salidas, ensambles e importaciones en el
+primario.
+
+La réplica es el alias "replica" de DATABASES (DATABASE_REPLICA_URL). No se
+manda por modelo sino por vista: LecturaReplicaMixin marca el request y
+RouterReplica manda a la réplica las lecturas de ese request. Todo lo demás,
+y todas las escrituras, van al primario.
+
+Se lee del primario cuando:
+  - no hay réplica configurada o no contesta;
+  - su atraso supera DB_REPLICA_ATRASO_MAX segundos (se mide como mucho cada
+    DB_REPLICA_VERIFICAR_CADA segundos por proceso);
+  - en las acciones que no toleran atraso (las listas), alguna tabla de la
+    respuesta cambió hace menos de DB_REPLICA_ATRASO_MAX segundos (token de
+    versión, utils/versiones.py): la réplica podría no tenerlo todavía, y quien
+    acaba de crear una nota la espera ver en la lista.
+
+Los reportes y exportaciones toleran atraso: salen de la réplica igual, pero
+si sus tablas cambiaron hace poco se contestan sin ETag, que se calcula con
+los tokens del primario y dejaría al cliente con datos viejos bajo una versión
+nueva.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from inventario.utils import versiones
+
+ALIAS = "replica"
+
+logger = logging.getLogger(__name__)
+
+_leer_replica = ContextVar("inventario_leer_replica", default=False)
+_estado = {"verificado": None, "atraso": None}
+_lock = threading.Lock()
+
+# 0 en un primario (p. ej. una segunda BD local) o en una réplica sin nada pendiente
+SQL_ATRASO = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def configurada():
+    return ALIAS in settings.DATABASES
+
+
+def medir_atraso():
+    """Atraso de la réplica en segundos (0 si no es PostgreSQL)."""
+    conn = connections[ALIAS]
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_ATRASO if conn.vendor == "postgresql" else "SELECT 0")
+        return float(cursor.fetchone()[0])
+
+
+def atraso():
+    """Último atraso medido (se remide cada DB_REPLICA_VERIFICAR_CADA s); None si no contesta."""
+    ahora = time.monotonic()
+    verificado = _estado["verificado"]
+    if verificado is not None and ahora - verificado < settings.DB_REPLICA_VERIFICAR_CADA:
+        return _estado["atraso"]
+    with _lock:
+        if _estado["verificado"] is None or ahora - _estado["verificado"] >= settings.DB_REPLICA_VERIFICAR_CADA:
+            try:
+                _estado["atraso"] = medir_atraso()
+            except Exception as exc:
+                logger.warning("Réplica %r sin respuesta, se lee del primario: %s", ALIAS, exc)
+                connections[ALIAS].close()
+                _estado["atraso"] = None
+            _estado["verificado"] = ahora
+        return _estado["atraso"]
+
+
+def olvidar():
+    """Descarta el atraso medido: el próximo request lo vuelve a medir."""
+    _estado["verificado"] = None
+
+
+def disponible():
+    if not configurada():
+        return False
+    medido = atraso()
+    return medido is not None and medido <= settings.DB_REPLICA_ATRASO_MAX
+
+
+def cambio_reciente(modelos):
+    """¿Alguna de las tablas cambió dentro de la ventana de atraso tolerada?"""
+    tablas = sorted({m._meta.db_table for m in modelos})
+    if not tablas:
+        return True
+    ultimo = max(versiones.versiones(*tablas))
+    return time.time_ns() - ultimo < settings.DB_REPLICA_ATRASO_MAX * 1_000_000_000
+
+
+@contextmanager
+def leyendo_replica():
+    token = _leer_replica.set(True)
+    try:
+        yield
+    finally:
+        _leer_replica.reset(token)
+
+
+def alias_lectura():
+    """Alias del que lee el request en curso (para fijarlo con .using() en lo que se evalúa después)."""
+    return ALIAS if _leer_replica.get() else DEFAULT_DB_ALIAS
+
+
+class RouterReplica:
+    """DATABASE_ROUTERS: lecturas a la réplica solo dentro de leyendo_replica()."""
+
+    def db_for_read(self, model, **hints):
+        if not _leer_replica.get():
+            return None
+        # dentro de una transacción del primario se lee de él (ve sus propias escrituras)
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # mismos datos
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != ALIAS  # la réplica se migra sola (replicación)
+
+
+class LecturaReplicaMixin:
+    """
+    Mixin de viewset / APIView (antes de ConditionalGetMixin): las acciones de
+    replica_acciones leen de la réplica si está al día con sus tablas (las de
+    get_etag_modelos o replica_modelos); las de replica_acciones_atraso, aunque
+    no lo esté. En una APIView la acción es "get".
+    """
+    replica_acciones = ("list",)
+    replica_acciones_atraso = ()
+    replica_modelos = ()  # si la vista no tiene get_etag_modelos
+
+    def _accion_replica(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        action_map = getattr(self, "action_map", None)
+        return action_map.get("get") if action_map is not None else "get"
+
+    def _modelos_replica(self):
+        get_modelos = getattr(self, "get_etag_modelos", None)
+        return get_modelos() if get_modelos else self.replica_modelos
+
+    def dispatch(self, request, *args, **kwargs):
+        accion = self._accion_replica(request)
+        tolera = accion in self.replica_acciones_atraso
+        if not (tolera or accion in self.replica_acciones) or not disponible():
+            return super().dispatch(request, *args, **kwargs)
+
+        reciente = cambio_reciente(self._modelos_replica())
+        if reciente and not tolera:
+            return super().dispatch(request, *args, **kwargs)
+
+        with leyendo_replica():
+            response = super().dispatch(request, *args, **kwargs)
+        if reciente:
+            response.headers.pop("ETag", None)
+        response.headers["X-Leido-De"] = ALIAS
+        return response
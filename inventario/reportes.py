@@ -1,17 +1,18 @@
 # inventario/reportes.py
 from __future__ import annotations
 
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 from decimal import Decimal
 
 from django.db.models import (
     Sum, Count, F, Value, Q,
-    DecimalField,
+    DecimalField, QuerySet,
 )
 from django.db.models.functions import (
     TruncDay, TruncMonth,
     Coalesce, Cast,
 )
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -22,7 +23,10 @@ from inventario.models import (
     NotaEnsamble, NotaEnsambleDetalle,
     TrasladoProducto,
     NotaSalidaProducto, NotaSalidaProductoDetalle,
+    Bodega, Operador, Talla, Tercero,
 )
+from inventario.condicional import ConditionalGetMixin
+from inventario.replica import LecturaReplicaMixin
 
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
@@ -50,6 +54,37 @@ def _dec_str(x) -> str:
     except Exception:
         return str(x)
 
+def _txt(x) -> str:
+    return x or ""
+
+def _es_columnar(request) -> bool:
+    """?format=columnar (renderers.ColumnarJSONRenderer)."""
+    return getattr(getattr(request, "accepted_renderer", None), "format", None) == "columnar"
+
+def _filas(request, rows, columnas):
+    """
+    "rows" de un reporte. columnas: [(nombre en la respuesta, campo del values(), formato)]
+    con formato _dec_str, _txt o None (tal cual).
+
+    Normal: lista de dicts. Con ?format=columnar: {"columns": [...], "data": [[...], ...]};
+    si rows es un queryset aún sin evaluar, data sale directo de .values_list()
+    (sin dict por fila; los Decimal los pasa a string el renderer).
+    """
+    if not _es_columnar(request):
+        return [{nombre: fmt(x[campo]) if fmt else x[campo] for nombre, campo, fmt in columnas} for x in rows]
+
+    if isinstance(rows, QuerySet) and rows._result_cache is None:
+        data = list(rows.values_list(*[
+            Coalesce(campo, Value("")) if fmt is _txt else campo for _, campo, fmt in columnas
+        ]))
+    else:
+        # ya evaluado (p. ej. para los charts): no se vuelve a consultar
+        data = [[_txt(x[campo]) if fmt is _txt else x[campo] for _, campo, fmt in columnas] for x in rows]
+    return {"columns": [nombre for nombre, _, _ in columnas], "data": data}
+
+def _n_filas(filas) -> int:
+    return len(filas["data"]) if isinstance(filas, dict) else len(filas)
+
 def _to_date(s: str | None) -> date | None:
     if not s:
         return None
@@ -75,12 +110,20 @@ def _get_filters(request):
         "group_by": group_by,
     }
 
+def _inicio_dia(d: date) -> datetime:
+    """Medianoche de `d` en la zona horaria activa (TIME_ZONE), como datetime aware."""
+    return timezone.make_aware(datetime.combine(d, time.min))
+
 def _apply_date_range_dt(qs, field_name: str, f):
-    """Para DateTimeField (ej: fecha en InsumoMovimiento, creado_en en TrasladoProducto)."""
+    """
+    Para DateTimeField (ej: fecha en InsumoMovimiento, creado_en en TrasladoProducto).
+    Usa límites semiabiertos [desde 00:00, hasta+1 00:00) en vez de `__date`,
+    así el filtro compara la columna directamente y puede usar los índices (x, fecha).
+    """
     if f["fecha_desde"]:
-        qs = qs.filter(**{f"{field_name}__date__gte": f["fecha_desde"]})
+        qs = qs.filter(**{f"{field_name}__gte": _inicio_dia(f["fecha_desde"])})
     if f["fecha_hasta"]:
-        qs = qs.filter(**{f"{field_name}__date__lte": f["fecha_hasta"]})
+        qs = qs.filter(**{f"{field_name}__lt": _inicio_dia(f["fecha_hasta"] + timedelta(days=1))})
     return qs
 
 def _apply_date_range_date(qs, field_name: str, f):
@@ -112,11 +155,16 @@ def _labels_from_period(qs, field="periodo"):
     return out
 
 
+class ReporteReplicaMixin(LecturaReplicaMixin):
+    """Los reportes leen de la réplica aunque esté unos segundos atrasada."""
+    replica_acciones_atraso = ("get",)
+
+
 # ============================================================
 # 1) Dashboard / Resumen
 # ============================================================
 
-class ReporteResumenAPIView(APIView):
+class ReporteResumenAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/resumen/
     KPIs globales + series:
@@ -124,6 +172,7 @@ class ReporteResumenAPIView(APIView):
     - compras insumos por periodo
     - producción por periodo
     """
+    etag_modelos = (InsumoMovimiento, NotaSalidaProducto, NotaSalidaProductoDetalle, NotaEnsamble, NotaEnsambleDetalle, TrasladoProducto)
 
     def get(self, request):
         f = _get_filters(request)
@@ -277,7 +326,7 @@ class ReporteResumenAPIView(APIView):
                 "filters": _filters_payload(f),
                 "kpis": kpis,
                 "charts": charts,
-                "rows": [],
+                "rows": _filas(request, [], []),
             },
             status=status.HTTP_200_OK,
         )
@@ -287,11 +336,12 @@ class ReporteResumenAPIView(APIView):
 # 2) INSUMOS
 # ============================================================
 
-class ReporteInsumosTopCompradosAPIView(APIView):
+class ReporteInsumosTopCompradosAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/insumos/top-comprados/
     Top insumos por cantidad y valor.
     """
+    etag_modelos = (InsumoMovimiento, Insumo)
 
     def get(self, request):
         f = _get_filters(request)
@@ -333,27 +383,25 @@ class ReporteInsumosTopCompradosAPIView(APIView):
                         ],
                     }
                 ],
-                "rows": [
-                    {
-                        "insumo_id": x["insumo_id"],
-                        "codigo": x["insumo__codigo"],
-                        "nombre": x["insumo__nombre"],
-                        "cantidad": _dec_str(x["cantidad"]),
-                        "valor": _dec_str(x["valor"]),
-                        "movimientos": x["movimientos"],
-                    }
-                    for x in rows
-                ],
+                "rows": _filas(request, rows, [
+                    ("insumo_id", "insumo_id", None),
+                    ("codigo", "insumo__codigo", None),
+                    ("nombre", "insumo__nombre", None),
+                    ("cantidad", "cantidad", _dec_str),
+                    ("valor", "valor", _dec_str),
+                    ("movimientos", "movimientos", None),
+                ]),
             },
             status=status.HTTP_200_OK,
         )
 
 
-class ReporteInsumosTopConsumidosAPIView(APIView):
+class ReporteInsumosTopConsumidosAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/insumos/top-consumidos/
     Top insumos consumidos (SALIDA + CONSUMO_ENSAMBLE).
     """
+    etag_modelos = (InsumoMovimiento, Insumo)
 
     def get(self, request):
         f = _get_filters(request)
@@ -391,16 +439,13 @@ class ReporteInsumosTopConsumidosAPIView(APIView):
                         "series": [{"name": "Cantidad", "data": [_dec_str(x["cantidad"]) for x in rows]}],
                     }
                 ],
-                "rows": [
-                    {
-                        "insumo_id": x["insumo_id"],
-                        "codigo": x["insumo__codigo"],
-                        "nombre": x["insumo__nombre"],
-                        "cantidad": _dec_str(x["cantidad"]),
-                        "movimientos": x["movimientos"],
-                    }
-                    for x in rows
-                ],
+                "rows": _filas(request, rows, [
+                    ("insumo_id", "insumo_id", None),
+                    ("codigo", "insumo__codigo", None),
+                    ("nombre", "insumo__nombre", None),
+                    ("cantidad", "cantidad", _dec_str),
+                    ("movimientos", "movimientos", None),
+                ]),
             },
             status=status.HTTP_200_OK,
         )
@@ -410,11 +455,12 @@ class ReporteInsumosTopConsumidosAPIView(APIView):
 # 3) PRODUCTOS (SALIDAS / "ventas" en unidades)
 # ============================================================
 
-class ReporteProductosTopVendidosAPIView(APIView):
+class ReporteProductosTopVendidosAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/productos/top-vendidos/
     Top productos por unidades vendidas (desde NotaSalidaProductoDetalle).
     """
+    etag_modelos = (NotaSalidaProducto, NotaSalidaProductoDetalle, Producto)
 
     def get(self, request):
         f = _get_filters(request)
@@ -469,28 +515,26 @@ class ReporteProductosTopVendidosAPIView(APIView):
                         ],
                     }
                 ],
-                "rows": [
-                    {
-                        "producto_id": x["producto_id"],
-                        "sku": x["producto__codigo_sku"],
-                        "producto_nombre": x["producto__nombre"],
-                        "talla": x["talla"] or "",
-                        "unidades": _dec_str(x["unidades"]),
-                        "valor_costo": _dec_str(x["valor_costo"]),
-                        "lineas": x["lineas"],
-                    }
-                    for x in rows
-                ],
+                "rows": _filas(request, rows, [
+                    ("producto_id", "producto_id", None),
+                    ("sku", "producto__codigo_sku", None),
+                    ("producto_nombre", "producto__nombre", None),
+                    ("talla", "talla", _txt),
+                    ("unidades", "unidades", _dec_str),
+                    ("valor_costo", "valor_costo", _dec_str),
+                    ("lineas", "lineas", None),
+                ]),
             },
             status=status.HTTP_200_OK,
         )
 
 
-class ReporteProductosSerieVentasAPIView(APIView):
+class ReporteProductosSerieVentasAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/productos/serie-ventas/?group_by=dia|mes
     Serie temporal de unidades vendidas.
     """
+    etag_modelos = (NotaSalidaProducto, NotaSalidaProductoDetalle)
 
     def get(self, request):
         f = _get_filters(request)
@@ -534,7 +578,11 @@ class ReporteProductosSerieVentasAPIView(APIView):
                         "series": [{"name": "Unidades", "data": data}],
                     }
                 ],
-                "rows": [{"periodo": labels[i], "unidades": data[i]} for i in range(len(labels))],
+                "rows": _filas(
+                    request,
+                    [{"periodo": labels[i], "unidades": data[i]} for i in range(len(labels))],
+                    [("periodo", "periodo", None), ("unidades", "unidades", None)],
+                ),
             },
             status=status.HTTP_200_OK,
         )
@@ -544,11 +592,12 @@ class ReporteProductosSerieVentasAPIView(APIView):
 # 4) PRODUCCIÓN (ENSAMBLE)
 # ============================================================
 
-class ReporteProduccionTopProducidosAPIView(APIView):
+class ReporteProduccionTopProducidosAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/produccion/top-producidos/
     Top productos producidos desde NotaEnsambleDetalle.
     """
+    etag_modelos = (NotaEnsamble, NotaEnsambleDetalle, Producto, Talla, Bodega)
 
     def get(self, request):
         f = _get_filters(request)
@@ -592,18 +641,15 @@ class ReporteProduccionTopProducidosAPIView(APIView):
                         "series": [{"name": "Unidades", "data": [_dec_str(x["unidades"]) for x in rows]}],
                     }
                 ],
-                "rows": [
-                    {
-                        "producto_id": x["producto_id"],
-                        "sku": x["producto__codigo_sku"],
-                        "producto_nombre": x["producto__nombre"],
-                        "talla": x["talla__nombre"] or "",
-                        "bodega_id": x["bodega_actual_id"],
-                        "bodega_nombre": x["bodega_actual__nombre"] or "",
-                        "unidades": _dec_str(x["unidades"]),
-                    }
-                    for x in rows
-                ],
+                "rows": _filas(request, rows, [
+                    ("producto_id", "producto_id", None),
+                    ("sku", "producto__codigo_sku", None),
+                    ("producto_nombre", "producto__nombre", None),
+                    ("talla", "talla__nombre", _txt),
+                    ("bodega_id", "bodega_actual_id", None),
+                    ("bodega_nombre", "bodega_actual__nombre", _txt),
+                    ("unidades", "unidades", _dec_str),
+                ]),
             },
             status=status.HTTP_200_OK,
         )
@@ -613,11 +659,12 @@ class ReporteProduccionTopProducidosAPIView(APIView):
 # 5) OPERADORES
 # ============================================================
 
-class ReporteOperadoresResumenAPIView(APIView):
+class ReporteOperadoresResumenAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/operadores/resumen/
     Resumen de trabajo por operador: notas, unidades y costo de servicio.
     """
+    etag_modelos = (NotaEnsamble, Operador)
 
     def get(self, request):
         f = _get_filters(request)
@@ -633,7 +680,7 @@ class ReporteOperadoresResumenAPIView(APIView):
             ens.values("operador_id", "operador__nombre")
             .annotate(
                 notas_count=Count("id"),
-                total_unidades=Coalesce(Sum("detalles__cantidad"), D0_3(), output_field=DEC3),
+                total_unidades=Coalesce(Sum("total_cantidad"), D0_3(), output_field=DEC3),
                 total_costo_servicio=Coalesce(Sum("costo_servicio"), D0(), output_field=DEC),
             )
             .order_by("-total_unidades")
@@ -667,15 +714,12 @@ class ReporteOperadoresResumenAPIView(APIView):
                         "series": [{"name": "Valor", "data": [_dec_str(x["total_costo_servicio"]) for x in rows]}],
                     }
                 ],
-                "rows": [
-                    {
-                        "operador": x["operador__nombre"],
-                        "notas_realizadas": x["notas_count"],
-                        "unidades_producidas": _dec_str(x["total_unidades"]),
-                        "costo_servicio_total": _dec_str(x["total_costo_servicio"]),
-                    }
-                    for x in rows
-                ],
+                "rows": _filas(request, rows, [
+                    ("operador", "operador__nombre", None),
+                    ("notas_realizadas", "notas_count", None),
+                    ("unidades_producidas", "total_unidades", _dec_str),
+                    ("costo_servicio_total", "total_costo_servicio", _dec_str),
+                ]),
             },
             status=status.HTTP_200_OK,
         )
@@ -685,13 +729,14 @@ class ReporteOperadoresResumenAPIView(APIView):
 # 6) BODEGAS / INVENTARIO (snapshot)
 # ============================================================
 
-class ReporteBodegasStockAPIView(APIView):
+class ReporteBodegasStockAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/bodegas/stock/
     Snapshot:
     - Insumos por bodega (Insumo.cantidad)
     - Producto terminado por bodega/talla (NotaEnsambleDetalle.cantidad)
     """
+    etag_modelos = (Insumo, Bodega, NotaEnsambleDetalle, Producto, Talla)
 
     def get(self, request):
         f = _get_filters(request)
@@ -741,39 +786,37 @@ class ReporteBodegasStockAPIView(APIView):
             }
         ]
 
+        # rows primero: con ?format=columnar salen de values_list sin evaluar los querysets antes
+        insumos = _filas(request, ins_rows, [
+            ("bodega_id", "bodega_id", None),
+            ("bodega", "bodega__nombre", None),
+            ("codigo", "codigo", None),
+            ("nombre", "nombre", None),
+            ("unidad_medida", "unidad_medida", _txt),
+            ("cantidad", "cantidad", _dec_str),
+        ])
+        productos = _filas(request, prod_rows, [
+            ("bodega_id", "bodega_actual_id", None),
+            ("bodega", "bodega_actual__nombre", None),
+            ("producto_id", "producto_id", None),
+            ("sku", "producto__codigo_sku", None),
+            ("producto", "producto__nombre", None),
+            ("talla", "talla__nombre", _txt),
+            ("cantidad", "cantidad", _dec_str),
+        ])
+
         return Response(
             {
                 "ok": True,
                 "filters": {"bodega_id": f["bodega_id"]},
                 "kpis": {
-                    "insumos_items": len(ins_rows),
-                    "productos_items": len(prod_rows),
+                    "insumos_items": _n_filas(insumos),
+                    "productos_items": _n_filas(productos),
                 },
                 "charts": charts,
                 "rows": {
-                    "insumos": [
-                        {
-                            "bodega_id": x["bodega_id"],
-                            "bodega": x["bodega__nombre"],
-                            "codigo": x["codigo"],
-                            "nombre": x["nombre"],
-                            "unidad_medida": x.get("unidad_medida") or "",
-                            "cantidad": _dec_str(x["cantidad"]),
-                        }
-                        for x in ins_rows
-                    ],
-                    "productos": [
-                        {
-                            "bodega_id": x["bodega_actual_id"],
-                            "bodega": x["bodega_actual__nombre"],
-                            "producto_id": x["producto_id"],
-                            "sku": x["producto__codigo_sku"],
-                            "producto": x["producto__nombre"],
-                            "talla": x["talla__nombre"] or "",
-                            "cantidad": _dec_str(x["cantidad"]),
-                        }
-                        for x in prod_rows
-                    ],
+                    "insumos": insumos,
+                    "productos": productos,
                 },
             },
             status=status.HTTP_200_OK,
@@ -784,11 +827,12 @@ class ReporteBodegasStockAPIView(APIView):
 # 6) NOTAS (salidas resumen)
 # ============================================================
 
-class ReporteNotasSalidasResumenAPIView(APIView):
+class ReporteNotasSalidasResumenAPIView(ReporteReplicaMixin, ConditionalGetMixin, APIView):
     """
     GET /api/reportes/notas/salidas/resumen/
     KPIs de notas de salida.
     """
+    etag_modelos = (NotaSalidaProducto, NotaSalidaProductoDetalle, Tercero)
 
     def get(self, request):
         f = _get_filters(request)
@@ -856,7 +900,7 @@ class ReporteNotasSalidasResumenAPIView(APIView):
                 "filters": _filters_payload(f),
                 "kpis": kpis,
                 "charts": charts,
-                "rows": [],
+                "rows": _filas(request, [], []),
             },
             status=status.HTTP_200_OK,
         )
@@ -866,7 +910,7 @@ class ReporteNotasSalidasResumenAPIView(APIView):
 # 7) EXPORTAR TODO A EXCEL
 # ============================================================
 
-class ReporteExportarExcelCompletoAPIView(APIView):
+class ReporteExportarExcelCompletoAPIView(ReporteReplicaMixin, APIView):
     """
     GET /api/reportes/exportar-excel/?fecha_desde=...&fecha_hasta=...&bodega_id=...&tercero_id=...
     Genera un archivo Excel con múltiples pestañas (insumos, productos, notas de ensamble y salida).
@@ -922,7 +966,7 @@ class ReporteExportarExcelCompletoAPIView(APIView):
         headers_prod = ["SKU", "Nombre", "Unidad", "Stock Global", "Precio Total", "Tercero"]
         write_header(ws_prod, headers_prod)
         
-        prod_qs = Producto.objects.select_related("tercero", "datos_adicionales").all()
+        prod_qs = Producto.objects.select_related("tercero", "datos_adicionales").prefetch_related("precios", "impuestos")
         if f["tercero_id"]: prod_qs = prod_qs.filter(tercero_id=f["tercero_id"])
 
         for r_idx, obj in enumerate(prod_qs, start=2):
@@ -963,7 +1007,7 @@ class ReporteExportarExcelCompletoAPIView(APIView):
             .values("operador__nombre")
             .annotate(
                 notas_count=Count("id"),
-                total_unidades=Coalesce(Sum("detalles__cantidad"), D0_3(), output_field=DEC3),
+                total_unidades=Coalesce(Sum("total_cantidad"), D0_3(), output_field=DEC3),
                 total_costo_servicio=Coalesce(Sum("costo_servicio"), D0(), output_field=DEC),
             )
             .order_by("-total_unidades")
@@ -980,7 +1024,7 @@ class ReporteExportarExcelCompletoAPIView(APIView):
             ens_filtered.values("operador__nombre")
             .annotate(
                 notas_count=Count("id"),
-                total_unidades=Coalesce(Sum("detalles__cantidad"), D0_3(), output_field=DEC3),
+                total_unidades=Coalesce(Sum("total_cantidad"), D0_3(), output_field=DEC3),
                 total_costo_servicio=Coalesce(Sum("costo_servicio"), D0(), output_field=DEC),
             )
             .order_by("-total_unidades")
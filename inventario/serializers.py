@@ -1,3 +1,4 @@
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
 from rest_framework import serializers
 from .models import (
     Insumo, Proveedor, Producto, Bodega, Impuesto, PrecioProducto,
@@ -8,17 +9,151 @@ from .models import (
 )
 from django.db import transaction
 from .services.pricing import calculate_product_prices
+from .services.inventory_service import InventoryService
+from .services import catalogo
+from . import metricas
+from .utils import tracing, versiones
 from decimal import Decimal
 from django.db.models import Q, Sum
 
 
-class ProveedorSerializer(serializers.ModelSerializer):
+# ============================================================
+# Catálogo en memoria (services/catalogo.py)
+# ============================================================
+class CatalogoPKField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que valida contra el catálogo en memoria (sin SELECT por id)."""
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        if catalogo.es_catalogo(model) and not isinstance(data, bool):
+            obj = catalogo.obtener(model, data)
+            if obj is not None:
+                return obj
+        # no está (o aún no llegó al catálogo de este proceso): consulta normal
+        return super().to_internal_value(data)
+
+
+class CatalogoSlugField(serializers.SlugRelatedField):
+    """SlugRelatedField (p. ej. talla por nombre) resuelto desde el catálogo en memoria."""
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        if catalogo.es_catalogo(model):
+            obj = catalogo.por_campo(model, self.slug_field, data)
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
+
+class DesdeCatalogoMixin:
+    """
+    Para serializers de tablas de catálogo usados anidados (read_only): el objeto
+    sale del catálogo por <campo>_id, sin join ni consulta extra por fila.
+    """
+
+    def get_attribute(self, instance):
+        if len(self.source_attrs) == 1 and hasattr(instance, "_meta"):
+            try:
+                field = instance._meta.get_field(self.source_attrs[0])
+            except FieldDoesNotExist:
+                field = None
+            if field is not None and field.concrete and field.many_to_one and catalogo.es_catalogo(field.related_model):
+                pk = getattr(instance, field.attname)
+                if pk is None:
+                    return None
+                obj = catalogo.obtener(field.related_model, pk, copiar=False)
+                if obj is not None:
+                    return obj
+        return super().get_attribute(instance)
+
+
+# ============================================================
+# Relaciones resueltas por lote (many=True)
+# ============================================================
+class LoteRelacionMixin:
+    """
+    Campo relacionado que, dentro de un LoteListSerializer, toma el objeto de lo
+    ya resuelto para todo el lote (un solo __in por modelo) en vez de hacer un
+    SELECT por línea. Fuera de un lote se comporta igual que el campo base.
+    """
+
+    def lote_campo(self):
+        return getattr(self, "slug_field", None) or "pk"
+
+    def lote_clave(self, valor):
+        if valor in (None, "") or isinstance(valor, (bool, dict, list)):
+            return None
+        if self.lote_campo() == "pk":
+            try:
+                return self.get_queryset().model._meta.pk.to_python(valor)
+            except (DjangoValidationError, TypeError, ValueError):
+                return None
+        return str(valor)
+
+    def to_internal_value(self, data):
+        resueltos = getattr(self.parent, "_lote_resueltos", None)
+        if resueltos and self.field_name in resueltos:
+            obj = resueltos[self.field_name].get(self.lote_clave(data))
+            if obj is not None:
+                return obj
+        # no vino en el lote (o no existe): camino normal, con su mensaje de error
+        return super().to_internal_value(data)
+
+
+class LotePKField(LoteRelacionMixin, serializers.PrimaryKeyRelatedField):
+    pass
+
+
+class LoteListSerializer(serializers.ListSerializer):
+    """
+    list_serializer_class para serializers de líneas (detalles, items...).
+
+    Antes de validar línea por línea junta, para cada LoteRelacionMixin del
+    child, todos los valores del lote y los resuelve con una consulta
+    `<campo>__in`. Las tablas del catálogo en memoria no se consultan.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child._lote_resueltos = self._resolver(data)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.child._lote_resueltos = None
+
+    def _resolver(self, data):
+        resueltos = {}
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, LoteRelacionMixin):
+                continue
+            queryset = field.get_queryset()
+            if catalogo.es_catalogo(queryset.model):
+                continue
+
+            claves = {
+                field.lote_clave(item.get(name))
+                for item in data
+                if isinstance(item, dict)
+            }
+            claves.discard(None)
+            if not claves:
+                continue
+
+            campo = field.lote_campo()
+            resueltos[name] = {
+                field.lote_clave(getattr(obj, campo)): obj
+                for obj in queryset.filter(**{f"{campo}__in": claves})
+            }
+        return resueltos
+
+
+class ProveedorSerializer(DesdeCatalogoMixin, serializers.ModelSerializer):
     class Meta:
         model = Proveedor
         fields = ["id", "nombre", "es_activo"]
 
 
-class BodegaSerializer(serializers.ModelSerializer):
+class BodegaSerializer(DesdeCatalogoMixin, serializers.ModelSerializer):
     insumos_count = serializers.IntegerField(read_only=True)
     productos_count = serializers.IntegerField(read_only=True)
 
@@ -32,19 +167,19 @@ class BodegaSerializer(serializers.ModelSerializer):
         ]
 
 
-class TerceroSerializer(serializers.ModelSerializer):
+class TerceroSerializer(DesdeCatalogoMixin, serializers.ModelSerializer):
     class Meta:
         model = Tercero
         fields = ["id", "codigo", "nombre", "es_activo"]
 
 
-class OperadorSerializer(serializers.ModelSerializer):
+class OperadorSerializer(DesdeCatalogoMixin, serializers.ModelSerializer):
     class Meta:
         model = Operador
         fields = ["id", "codigo", "nombre", "es_activo"]
 
 
-class ImpuestoSerializer(serializers.ModelSerializer):
+class ImpuestoSerializer(DesdeCatalogoMixin, serializers.ModelSerializer):
     class Meta:
         model = Impuesto
         fields = ["id", "nombre", "valor", "es_activo"]
@@ -108,7 +243,7 @@ class DatosAdicionalesProductoSerializer(serializers.ModelSerializer):
 class ProductoSerializer(serializers.ModelSerializer):
     price_breakdown = serializers.SerializerMethodField(read_only=True)
     impuestos = ImpuestoSerializer(many=True, read_only=True)
-    impuesto_ids = serializers.PrimaryKeyRelatedField(
+    impuesto_ids = CatalogoPKField(
         many=True,
         queryset=Impuesto.objects.all(),
         source="impuestos",
@@ -117,7 +252,7 @@ class ProductoSerializer(serializers.ModelSerializer):
     )
 
     tercero = TerceroSerializer(read_only=True)
-    tercero_id = serializers.PrimaryKeyRelatedField(
+    tercero_id = CatalogoPKField(
         queryset=Tercero.objects.all(),
         source="tercero",
         write_only=True,
@@ -151,6 +286,12 @@ class ProductoSerializer(serializers.ModelSerializer):
             "actualizado_en",
             "es_activo",
         ]
+        # relaciones que leen los SerializerMethodField (para ?fields= / ?omit=, ver campos.py)
+        campos_relaciones = {
+            "price_breakdown": ("precios", "impuestos"),
+            "subtotal_sin_impuestos": ("precios",),
+            "precio_total": ("precios", "impuestos"),
+        }
 
     def get_subtotal_sin_impuestos(self, obj):
         return str(obj.subtotal_sin_impuestos or 0)
@@ -180,14 +321,14 @@ class DatosAdicionalesWriteSerializer(serializers.ModelSerializer):
 
 class InsumoSerializer(serializers.ModelSerializer):
     bodega = BodegaSerializer(read_only=True)
-    bodega_id = serializers.PrimaryKeyRelatedField(
+    bodega_id = CatalogoPKField(
         queryset=Bodega.objects.all(),
         source="bodega",
         write_only=True
     )
 
     proveedor = ProveedorSerializer(read_only=True)
-    proveedor_id = serializers.PrimaryKeyRelatedField(
+    proveedor_id = CatalogoPKField(
         queryset=Proveedor.objects.all(),
         source="proveedor",
         write_only=True,
@@ -196,7 +337,7 @@ class InsumoSerializer(serializers.ModelSerializer):
     )
 
     tercero = TerceroSerializer(read_only=True)
-    tercero_id = serializers.PrimaryKeyRelatedField(
+    tercero_id = CatalogoPKField(
         queryset=Tercero.objects.all(),
         source="tercero",
         write_only=True,
@@ -273,7 +414,7 @@ class InsumoSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class TallaSerializer(serializers.ModelSerializer):
+class TallaSerializer(DesdeCatalogoMixin, serializers.ModelSerializer):
     class Meta:
         model = Talla
         fields = ["nombre", "es_activo"]
@@ -318,8 +459,8 @@ class NotaEnsambleDetalleSerializer(serializers.ModelSerializer):
 
 
 class NotaEnsambleDetalleWriteSerializer(serializers.ModelSerializer):
-    producto_id = serializers.PrimaryKeyRelatedField(queryset=Producto.objects.all(), source="producto")
-    talla_id = serializers.SlugRelatedField(
+    producto_id = LotePKField(queryset=Producto.objects.all(), source="producto")
+    talla_id = CatalogoSlugField(
         slug_field="nombre", 
         queryset=Talla.objects.all(), 
         source="talla", 
@@ -330,6 +471,7 @@ class NotaEnsambleDetalleWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = NotaEnsambleDetalle
         fields = ["producto_id", "talla_id", "cantidad"]
+        list_serializer_class = LoteListSerializer
 
 
 # -----------------------------
@@ -348,12 +490,15 @@ class NotaEnsambleInsumoSerializer(serializers.ModelSerializer):
 
 
 class NotaEnsambleInsumoWriteSerializer(serializers.Serializer):
-    insumo_codigo = serializers.CharField()
+    insumo_codigo = LotePKField(queryset=Insumo.objects.all(), source="insumo")
     cantidad = serializers.DecimalField(max_digits=12, decimal_places=3)
     costo_unitario = serializers.DecimalField(
         max_digits=14, decimal_places=2, required=False, allow_null=True
     )
 
+    class Meta:
+        list_serializer_class = LoteListSerializer
+
 
 # -----------------------------
 # ✅ NOTA ENSAMBLE: SERIALIZER PRINCIPAL
@@ -404,13 +549,13 @@ class NotaEnsambleSerializer(serializers.ModelSerializer):
     costo_total = serializers.SerializerMethodField(read_only=True)
 
     # --- ESCRITURA (ids) ---
-    bodega_id = serializers.PrimaryKeyRelatedField(
+    bodega_id = CatalogoPKField(
         queryset=Bodega.objects.all(),
         source="bodega",
         write_only=True
     )
 
-    tercero_id = serializers.PrimaryKeyRelatedField(
+    tercero_id = CatalogoPKField(
         queryset=Tercero.objects.all(),
         source="tercero",
         write_only=True,
@@ -418,7 +563,7 @@ class NotaEnsambleSerializer(serializers.ModelSerializer):
         allow_null=True
     )
 
-    operador_id = serializers.PrimaryKeyRelatedField(
+    operador_id = CatalogoPKField(
         queryset=Operador.objects.all(),
         source="operador",
         write_only=True,
@@ -454,12 +599,11 @@ class NotaEnsambleSerializer(serializers.ModelSerializer):
             "insumos_input",
             "costo_servicio",
         ]
+        campos_relaciones = {"costo_total": ()}
 
     def get_costo_total(self, obj):
-        movs = obj.insumomovimientos.all()
-        total_movs = sum(m.total for m in movs) if movs.exists() else 0
-        total = total_movs + (obj.costo_servicio or 0)
-        return str(total)
+        # Guardado en la nota por InventoryService.actualizar_totales_nota
+        return str(obj.costo_total)
 
 class NotaEnsambleListSerializer(serializers.ModelSerializer):
 
@@ -469,7 +613,7 @@ class NotaEnsambleListSerializer(serializers.ModelSerializer):
     operador_nombre = serializers.CharField(source="operador.nombre", read_only=True)
     costo_total = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True) 
     total_cantidad = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
-    productos_resumen = serializers.SerializerMethodField(read_only=True)
+    productos_resumen = serializers.CharField(read_only=True)
 
 
     class Meta:
@@ -489,36 +633,6 @@ class NotaEnsambleListSerializer(serializers.ModelSerializer):
             "creado_en",
         ]
 
-    def get_productos_resumen(self, obj):
-        detalles = list(obj.detalles.all())
-        if not detalles: return "—"
-        
-        # Agrupar por producto (usualmente hay pocos en la nota)
-        nombres = []
-        seen = set()
-        for d in detalles:
-            if d.producto and d.producto.nombre not in seen:
-                nombres.append(d.producto.nombre)
-                seen.add(d.producto.nombre)
-        
-        if not nombres: return "—"
-        if len(nombres) == 1: return nombres[0]
-        return f"{nombres[0]} (+{len(nombres)-1})"
-
-
-
-
-    def get_costo_total(self, obj):
-        # Si fue anotado en el queryset (lo cual hicimos en views.py)
-        if hasattr(obj, "costo_total"):
-            return str(obj.costo_total)
-
-        movs = obj.insumomovimientos.all()
-        total_movs = sum(m.total for m in movs) if movs.exists() else 0
-        total = total_movs + (obj.costo_servicio or 0)
-        return str(total)
-
-
     def validate(self, attrs):
         insumos_data = attrs.get("insumos_input") or []
         tercero = attrs.get("tercero")  # viene por source="tercero"
@@ -538,12 +652,12 @@ class TrasladoProductoSerializer(serializers.ModelSerializer):
     bodega_origen = BodegaSerializer(read_only=True)
     bodega_destino = BodegaSerializer(read_only=True)
 
-    tercero_id = serializers.PrimaryKeyRelatedField(queryset=Tercero.objects.all(), source="tercero", write_only=True)
-    bodega_origen_id = serializers.PrimaryKeyRelatedField(queryset=Bodega.objects.all(), source="bodega_origen", write_only=True)
-    bodega_destino_id = serializers.PrimaryKeyRelatedField(queryset=Bodega.objects.all(), source="bodega_destino", write_only=True)
+    tercero_id = CatalogoPKField(queryset=Tercero.objects.all(), source="tercero", write_only=True)
+    bodega_origen_id = CatalogoPKField(queryset=Bodega.objects.all(), source="bodega_origen", write_only=True)
+    bodega_destino_id = CatalogoPKField(queryset=Bodega.objects.all(), source="bodega_destino", write_only=True)
 
     producto_id = serializers.PrimaryKeyRelatedField(queryset=Producto.objects.all(), source="producto", write_only=True)
-    talla_id = serializers.SlugRelatedField(
+    talla_id = CatalogoSlugField(
         slug_field="nombre", 
         queryset=Talla.objects.all(), 
         source="talla", 
@@ -569,12 +683,41 @@ class TrasladoProductoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "creado_en", "detalle"]
 
+class TrasladoMasivoItemSerializer(serializers.Serializer):
+    producto_id = LotePKField(queryset=Producto.objects.all(), source="producto")
+    talla_id = CatalogoPKField(queryset=Talla.objects.all(), source="talla", required=False, allow_null=True)
+    cantidad = serializers.DecimalField(max_digits=12, decimal_places=3)
+
+    class Meta:
+        list_serializer_class = LoteListSerializer
+
+    def validate_cantidad(self, v):
+        if v is None or v <= 0:
+            raise serializers.ValidationError("La cantidad debe ser mayor a 0.")
+        return v
+
+
+class TrasladoMasivoSerializer(serializers.Serializer):
+    tercero_id = CatalogoPKField(queryset=Tercero.objects.all(), source="tercero")
+    bodega_origen_id = CatalogoPKField(queryset=Bodega.objects.all(), source="bodega_origen")
+    bodega_destino_id = CatalogoPKField(queryset=Bodega.objects.all(), source="bodega_destino")
+    items = TrasladoMasivoItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        if attrs["bodega_origen"].pk == attrs["bodega_destino"].pk:
+            raise serializers.ValidationError({"bodega_destino_id": "Destino debe ser diferente a origen."})
+        return attrs
+
+
 class NotaSalidaProductoDetalleInputSerializer(serializers.Serializer):
-    producto_id = serializers.CharField()
+    producto_id = LotePKField(queryset=Producto.objects.all(), source="producto")
     talla = serializers.CharField(required=False, allow_blank=True)
     cantidad = serializers.DecimalField(max_digits=12, decimal_places=3)
     costo_unitario = serializers.DecimalField(max_digits=14, decimal_places=2, required=True)
 
+    class Meta:
+        list_serializer_class = LoteListSerializer
+
     def validate_cantidad(self, v):
         if v is None or v <= 0:
             raise serializers.ValidationError("La cantidad debe ser mayor a 0.")
@@ -583,7 +726,7 @@ class NotaSalidaProductoDetalleInputSerializer(serializers.Serializer):
 
 class NotaSalidaAfectacionStockSerializer(serializers.ModelSerializer):
     detalle_stock_id = serializers.IntegerField(source="detalle_stock.id", read_only=True)
-    nota_ensamble_id = serializers.IntegerField(source="detalle_stock.nota.id", read_only=True)
+    nota_ensamble_id = serializers.IntegerField(source="detalle_stock.nota_id", read_only=True)
 
     class Meta:
         model = NotaSalidaAfectacionStock
@@ -613,8 +756,8 @@ class NotaSalidaProductoDetalleSerializer(serializers.ModelSerializer):
 
 
 class NotaSalidaProductoSerializer(serializers.ModelSerializer):
-    bodega_id = serializers.PrimaryKeyRelatedField(queryset=Bodega.objects.all(), source="bodega", write_only=True)
-    tercero_id = serializers.PrimaryKeyRelatedField(
+    bodega_id = CatalogoPKField(queryset=Bodega.objects.all(), source="bodega", write_only=True)
+    tercero_id = CatalogoPKField(
         queryset=Tercero.objects.all(), source="tercero", write_only=True, required=False, allow_null=True
     )
 
@@ -634,6 +777,7 @@ class NotaSalidaProductoSerializer(serializers.ModelSerializer):
             "detalles", "detalles_input",
             "creado_en",
         ]
+        campos_relaciones = {"bodega": ("bodega",), "tercero": ("tercero",)}
 
     def get_bodega(self, obj):
         return {"id": obj.bodega.id, "codigo": obj.bodega.codigo, "nombre": obj.bodega.nombre}
@@ -643,11 +787,13 @@ class NotaSalidaProductoSerializer(serializers.ModelSerializer):
             return None
         return {"id": obj.tercero.id, "codigo": obj.tercero.codigo, "nombre": obj.tercero.nombre}
 
+    @tracing.trazar("salida.crear")
     @transaction.atomic
     def create(self, validated_data):
         detalles_input = validated_data.pop("detalles_input", [])
         salida = NotaSalidaProducto.objects.create(**validated_data)
         self._aplicar_detalles(salida, detalles_input)
+        InventoryService.actualizar_totales_salida(salida)
         return salida
 
     @transaction.atomic
@@ -671,6 +817,7 @@ class NotaSalidaProductoSerializer(serializers.ModelSerializer):
             
             # Limpiar detalles anteriores
             instance.detalles.all().delete()
+            versiones.borrado(NotaSalidaProductoDetalle)  # delete() por queryset no manda signals
 
         # 2. Actualizar metadata de la nota
         instance = super().update(instance, validated_data)
@@ -679,68 +826,75 @@ class NotaSalidaProductoSerializer(serializers.ModelSerializer):
         if detalles_input is not None:
             self._aplicar_detalles(instance, detalles_input)
 
+        # totales y documento de búsqueda (la observación también entra en search_document)
+        InventoryService.actualizar_totales_salida(instance)
+
         return instance
 
+    @tracing.trazar("salida.fifo")
     def _aplicar_detalles(self, salida, detalles_input):
         # FIFO: descuenta de NotaEnsambleDetalle en la bodega efectiva
         for d in detalles_input:
-            producto = Producto.objects.get(codigo_sku=d["producto_id"])
+            producto = d["producto"]  # resuelto por lote en la validación
             talla = (d.get("talla") or "").strip()
             cantidad_req = d["cantidad"]
 
-            # 1. Descontar del stock global
-            datos = DatosAdicionalesProducto.objects.filter(producto=producto).first()
-            if datos:
-                datos.stock = (datos.stock - cantidad_req)
-                datos.save(update_fields=["stock"])
-
-            # 2. Descontar de la bodega (FIFO)
-            bodega = salida.bodega
-            qs_stock = (
-                NotaEnsambleDetalle.objects
-                .select_for_update()
-                .filter(producto=producto, talla__nombre=talla)
-                .filter(
-                    Q(bodega_actual=bodega) |
-                    Q(bodega_actual__isnull=True, nota__bodega=bodega)
-                )
-                .order_by("nota__fecha_elaboracion", "id")
-            )
-
-            disponible = qs_stock.aggregate(s=Sum("cantidad_disponible"))["s"] or Decimal("0")
-            if disponible < cantidad_req:
-                raise serializers.ValidationError(
-                    f"Stock insuficiente para {producto.codigo_sku} talla '{talla or '-'}' en bodega {bodega.nombre}. "
-                    f"Disponible: {disponible}, requerido: {cantidad_req}"
+            with tracing.span("salida.linea", producto=producto.pk, talla=talla, cantidad=str(cantidad_req)):
+                # 1. Descontar del stock global
+                datos = DatosAdicionalesProducto.objects.filter(producto=producto).first()
+                if datos:
+                    datos.stock = (datos.stock - cantidad_req)
+                    datos.save(update_fields=["stock"])
+
+                # 2. Descontar de la bodega (FIFO)
+                bodega = salida.bodega
+                metricas.bloqueo_stock(NotaEnsambleDetalle)
+                qs_stock = (
+                    NotaEnsambleDetalle.objects
+                    .select_for_update()
+                    .filter(producto=producto, talla__nombre=talla)
+                    .filter(
+                        Q(bodega_actual=bodega) |
+                        Q(bodega_actual__isnull=True, nota__bodega=bodega)
+                    )
+                    .order_by("nota__fecha_elaboracion", "id")
                 )
 
-            det_salida = NotaSalidaProductoDetalle.objects.create(
-                salida=salida,
-                producto=producto,
-                talla=talla,
-                cantidad=cantidad_req,
-                costo_unitario=d.get("costo_unitario", None),
-            )
-
-            restante = cantidad_req
-            for stock_row in qs_stock:
-                if restante <= 0:
-                    break
-
-                tomar = min(restante, stock_row.cantidad_disponible)
-                if tomar <= 0:
-                    continue
-
-                stock_row.cantidad_disponible = (stock_row.cantidad_disponible - tomar)
-                stock_row.save(update_fields=["cantidad_disponible"])
-
-                NotaSalidaAfectacionStock.objects.create(
-                    salida_detalle=det_salida,
-                    detalle_stock=stock_row,
-                    cantidad=tomar,
+                disponible = qs_stock.aggregate(s=Sum("cantidad_disponible"))["s"] or Decimal("0")
+                if disponible < cantidad_req:
+                    raise serializers.ValidationError(
+                        f"Stock insuficiente para {producto.codigo_sku} talla '{talla or '-'}' en bodega {bodega.nombre}. "
+                        f"Disponible: {disponible}, requerido: {cantidad_req}"
+                    )
+
+                det_salida = NotaSalidaProductoDetalle.objects.create(
+                    salida=salida,
+                    producto=producto,
+                    talla=talla,
+                    cantidad=cantidad_req,
+                    costo_unitario=d.get("costo_unitario", None),
                 )
 
-                restante -= tomar
+                restante = cantidad_req
+                for stock_row in qs_stock:
+                    if restante <= 0:
+                        break
+
+                    tomar = min(restante, stock_row.cantidad_disponible)
+                    if tomar <= 0:
+                        continue
+
+                    stock_row.cantidad_disponible = (stock_row.cantidad_disponible - tomar)
+                    stock_row.save(update_fields=["cantidad_disponible"])
+
+                    NotaSalidaAfectacionStock.objects.create(
+                        salida_detalle=det_salida,
+                        detalle_stock=stock_row,
+                        cantidad=tomar,
+                    )
+                    tracing.sumar("capas")
+
+                    restante -= tomar
 
 class NotaSalidaProductoListSerializer(serializers.ModelSerializer):
 
@@ -750,7 +904,7 @@ class NotaSalidaProductoListSerializer(serializers.ModelSerializer):
     tercero_nombre = serializers.CharField(source="tercero.nombre", read_only=True)
     total_cantidad = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     total_valor = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
-    productos_resumen = serializers.SerializerMethodField(read_only=True)
+    productos_resumen = serializers.CharField(read_only=True)
 
 
     class Meta:
@@ -768,19 +922,6 @@ class NotaSalidaProductoListSerializer(serializers.ModelSerializer):
             "creado_en",
         ]
 
-    def get_productos_resumen(self, obj):
-        detalles = list(obj.detalles.all())
-        if not detalles: return "—"
-        nombres = []
-        seen = set()
-        for d in detalles:
-            if d.producto and d.producto.nombre not in seen:
-                nombres.append(d.producto.nombre)
-                seen.add(d.producto.nombre)
-        if not nombres: return "—"
-        if len(nombres) == 1: return nombres[0]
-        return f"{nombres[0]} (+{len(nombres)-1})"
-
 class InsumoMovimientoInputSerializer(serializers.Serializer):
 
     tipo = serializers.ChoiceField(choices=[
@@ -0,0 +1,124 @@
+"""
+Índice de prefijos en memoria (por proceso) para el autocompletado.
+
+Por cada tipo (insumo, producto, tercero, bodega) se guarda una lista ordenada
+de claves normalizadas (códigos, código de barras, nombre y cada palabra del
+nombre) y se busca con bisect: O(log n) + los resultados, sin tocar la BD.
+
+El índice es una versiones.MemoriaVersionada: se rehace cuando un
+post_save/post_delete de este proceso lo invalida (inventario/signals.py) o
+cuando cambió el token de versión de la tabla (otro proceso guardó), lo que
+se revisa como máximo cada VERIFICAR_CADA segundos. Los saves que solo tocan
+otras columnas (el stock de un insumo) no lo invalidan.
+"""
+from bisect import bisect_left
+
+from inventario.busqueda import normalizar
+from inventario.models import Bodega, Insumo, Producto, Tercero
+from inventario.utils import versiones
+
+VERIFICAR_CADA = 1.0  # segundos entre lecturas del token compartido
+LIMITE_DEFAULT = 10
+LIMITE_MAX = 50
+
+
+def _claves(*partes, palabras_de=None):
+    claves = {normalizar(p) for p in partes if p}
+    if palabras_de:
+        claves.update(normalizar(palabras_de).split())
+    claves.discard("")
+    return claves
+
+
+def _filas_insumo():
+    for codigo, referencia, nombre in (
+        Insumo.objects.filter(es_activo=True).values_list("codigo", "referencia", "nombre")
+    ):
+        item = {"tipo": "insumo", "id": codigo, "codigo": codigo, "nombre": nombre}
+        yield _claves(codigo, referencia, nombre, palabras_de=nombre), item
+
+
+def _filas_producto():
+    for sku, barras, nombre in (
+        Producto.objects.filter(es_activo=True).values_list("codigo_sku", "codigo_barras", "nombre")
+    ):
+        item = {"tipo": "producto", "id": sku, "codigo": sku, "codigo_barras": barras, "nombre": nombre}
+        yield _claves(sku, barras, nombre, palabras_de=nombre), item
+
+
+def _filas_tercero():
+    for pk, codigo, nombre in Tercero.objects.filter(es_activo=True).values_list("id", "codigo", "nombre"):
+        item = {"tipo": "tercero", "id": pk, "codigo": codigo, "nombre": nombre}
+        yield _claves(codigo, nombre, palabras_de=nombre), item
+
+
+def _filas_bodega():
+    for pk, codigo, nombre in Bodega.objects.filter(es_activo=True).values_list("id", "codigo", "nombre"):
+        item = {"tipo": "bodega", "id": pk, "codigo": codigo, "nombre": nombre}
+        yield _claves(codigo, nombre, palabras_de=nombre), item
+
+
+# tipo → (tabla cuyo token se vigila, función que lee las filas, campos que lee)
+FUENTES = {
+    "insumo": (Insumo._meta.db_table, _filas_insumo, ("codigo", "referencia", "nombre", "es_activo")),
+    "producto": (Producto._meta.db_table, _filas_producto, ("codigo_sku", "codigo_barras", "nombre", "es_activo")),
+    "tercero": (Tercero._meta.db_table, _filas_tercero, ("codigo", "nombre", "es_activo")),
+    "bodega": (Bodega._meta.db_table, _filas_bodega, ("codigo", "nombre", "es_activo")),
+}
+TIPOS = tuple(FUENTES)
+
+
+class IndicePrefijos:
+    def __init__(self, filas):
+        entradas = [(clave, i, item) for i, (claves, item) in enumerate(filas) for clave in claves]
+        entradas.sort(key=lambda e: (e[0], e[1]))
+        self.claves = [e[0] for e in entradas]
+        self.items = [e[2] for e in entradas]
+
+    def buscar(self, prefijo, limite):
+        """[(clave, item)] de los primeros `limite` items cuyo alguna clave empieza por prefijo."""
+        out = []
+        vistos = set()
+        i = bisect_left(self.claves, prefijo)
+        n = len(self.claves)
+        while i < n and len(out) < limite and self.claves[i].startswith(prefijo):
+            item = self.items[i]
+            if id(item) not in vistos:
+                vistos.add(id(item))
+                out.append((self.claves[i], item))
+            i += 1
+        return out
+
+
+_indices = {
+    tipo: versiones.MemoriaVersionada(
+        lambda leer=leer: IndicePrefijos(leer()), tabla, columnas=columnas, verificar_cada=VERIFICAR_CADA
+    )
+    for tipo, (tabla, leer, columnas) in FUENTES.items()
+}
+
+
+def invalidar(*tipos):
+    """Descarta el índice local (se rehace en la próxima búsqueda)."""
+    for tipo in tipos or TIPOS:
+        _indices[tipo].invalidar()
+
+
+def _indice(tipo):
+    return _indices[tipo].obtener()
+
+
+def buscar(q, tipo=None, limite=LIMITE_DEFAULT):
+    prefijo = normalizar(q)
+    if not prefijo:
+        return []
+
+    tipos = [tipo] if tipo else TIPOS
+    encontrados = []
+    for t in tipos:
+        encontrados.extend(_indice(t).buscar(prefijo, limite))
+
+    if len(tipos) > 1:
+        # mezcla de tipos: coincidencia exacta primero, luego orden alfabético de la clave
+        encontrados.sort(key=lambda e: (e[0] != prefijo, e[0]))
+    return [item for _, item in encontrados[:limite]]
@@ -0,0 +1,104 @@
+"""
+Catálogo en memoria de las tablas de referencia pequeñas
+(Bodega, Tercero, Talla, Impuesto, Operador, Proveedor).
+
+Cada tabla se carga completa una vez por proceso (versiones.MemoriaVersionada):
+se descarta con los signals de este proceso y se rehace cuando otro proceso
+cambia el token de versión de la tabla. Sirve para validar ids en serializers,
+para los serializers anidados de salida, para las importaciones y los traslados
+sin volver a consultar la BD.
+
+Los objetos que devuelve obtener()/por_campo() son copias: se pueden modificar
+o guardar sin ensuciar el catálogo compartido.
+"""
+import copy
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.shortcuts import get_object_or_404
+
+from inventario.models import Bodega, Impuesto, Operador, Proveedor, Talla, Tercero
+from inventario.utils import versiones
+
+MODELOS = (Bodega, Tercero, Talla, Impuesto, Operador, Proveedor)
+
+
+class _Tabla:
+    def __init__(self, model):
+        self.model = model
+        self.por_pk = {obj.pk: obj for obj in model.objects.all()}
+        self._indices = {}
+
+    def indice(self, campo, clave):
+        """{clave(valor del campo): obj}, armado la primera vez que se pide."""
+        k = (campo, clave)
+        if k not in self._indices:
+            self._indices[k] = {
+                clave(getattr(obj, campo)): obj
+                for obj in self.por_pk.values()
+                if getattr(obj, campo) not in (None, "")
+            }
+        return self._indices[k]
+
+
+_tablas = {
+    model: versiones.MemoriaVersionada(lambda model=model: _Tabla(model), model._meta.db_table)
+    for model in MODELOS
+}
+
+
+def es_catalogo(model):
+    return model in _tablas
+
+
+def _tabla(model):
+    return _tablas[model].obtener()
+
+
+def _pk(model, valor):
+    try:
+        return model._meta.pk.to_python(valor)
+    except (DjangoValidationError, TypeError, ValueError):
+        return None
+
+
+def obtener(model, pk, copiar=True):
+    """Objeto por pk (acepta "3" o 3) o None si no está en el catálogo."""
+    pk = _pk(model, pk)
+    if pk is None:
+        return None
+    obj = _tabla(model).por_pk.get(pk)
+    if obj is None or not copiar:
+        return obj
+    return copy.copy(obj)
+
+
+def por_campo(model, campo, valor, clave=None, copiar=True):
+    """
+    Objeto cuyo `campo` coincide con valor (clave normaliza ambos lados, p. ej.
+    str.lower). None si no hay.
+    """
+    clave = clave or (lambda v: v)
+    if valor in (None, ""):
+        return None
+    obj = _tabla(model).indice(campo, clave).get(clave(valor))
+    if obj is None or not copiar:
+        return obj
+    return copy.copy(obj)
+
+
+def todos(model):
+    """Copias de todos los objetos de la tabla."""
+    return [copy.copy(obj) for obj in _tabla(model).por_pk.values()]
+
+
+def invalidar(*models):
+    for model in models or MODELOS:
+        _tablas[model].invalidar()
+
+
+def obtener_o_404(model, pk):
+    """obtener() o, si no está en el catálogo, get_object_or_404 normal."""
+    obj = obtener(model, pk)
+    if obj is not None:
+        return obj
+    return get_object_or_404(model, pk=pk)
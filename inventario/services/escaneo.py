@@ -0,0 +1,89 @@
+"""
+Escaneo de códigos (despacho / bodega).
+
+codigo_barras o codigo_sku → producto, con un índice en memoria
+(versiones.MemoriaVersionada sobre la tabla de productos), y el stock
+disponible por talla en la bodega con UNA consulta agregada para todo el lote.
+"""
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from inventario.models import NotaEnsambleDetalle, Producto
+from inventario.utils import versiones
+
+MAX_LOTE = 500
+
+
+def normalizar_codigo(codigo):
+    return str(codigo or "").strip().upper()
+
+
+def _construir_indice():
+    """{CODIGO: (sku, nombre)} con códigos de barras y SKUs (los de barras ganan si chocan)."""
+    por_sku = {}
+    por_barras = {}
+    for sku, barras, nombre in Producto.objects.filter(es_activo=True).values_list(
+        "codigo_sku", "codigo_barras", "nombre"
+    ):
+        por_sku[normalizar_codigo(sku)] = (sku, nombre)
+        if barras:
+            por_barras[normalizar_codigo(barras)] = (sku, nombre)
+    return {**por_sku, **por_barras}
+
+
+_indice = versiones.MemoriaVersionada(
+    _construir_indice, Producto._meta.db_table, columnas=("codigo_sku", "codigo_barras", "nombre", "es_activo")
+)
+
+
+def resolver(codigo):
+    return _indice.obtener().get(normalizar_codigo(codigo))
+
+
+def stock_por_talla(skus, bodega_id=None):
+    """{sku: [(talla, cantidad)]} con lo disponible (en la bodega efectiva si viene bodega_id)."""
+    qs = NotaEnsambleDetalle.objects.filter(producto_id__in=skus, cantidad_disponible__gt=0)
+    if bodega_id is not None:
+        qs = (
+            qs.annotate(bodega_efectiva=Coalesce("bodega_actual_id", "nota__bodega_id"))
+            .filter(bodega_efectiva=bodega_id)
+        )
+
+    stock = {}
+    for sku, talla, cantidad in (
+        qs.values("producto_id", "talla__nombre")
+        .annotate(cantidad=Sum("cantidad_disponible"))
+        .order_by("producto_id", "talla__nombre")
+        .values_list("producto_id", "talla__nombre", "cantidad")
+    ):
+        stock.setdefault(sku, []).append((talla, cantidad or Decimal("0")))
+    return stock
+
+
+def escanear(codigos, bodega_id=None):
+    """
+    Resuelve un lote de códigos escaneados (en el mismo orden, con repetidos).
+    Una sola consulta a BD (el stock); los códigos salen del índice en memoria.
+    """
+    resueltos = [(c, resolver(c)) for c in codigos]
+    skus = {r[0] for _, r in resueltos if r}
+    stock = stock_por_talla(skus, bodega_id) if skus else {}
+
+    resultados = []
+    for codigo, r in resueltos:
+        if not r:
+            resultados.append({"codigo": codigo, "encontrado": False})
+            continue
+        sku, nombre = r
+        tallas = stock.get(sku, [])
+        resultados.append({
+            "codigo": codigo,
+            "encontrado": True,
+            "sku": sku,
+            "nombre": nombre,
+            "stock": [{"talla": t or "Sin talla", "cantidad": str(c)} for t, c in tallas],
+            "total": str(sum((c for _, c in tallas), Decimal("0"))),
+        })
+    return resultados
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from decimal import Decimal
 from django.db import transaction
 from django.db.models import Sum, Case, When, Value, F, DecimalField
@@ -5,8 +6,11 @@ from rest_framework.exceptions import ValidationError
 from inventario.models import (
     Insumo, InsumoMovimiento, NotaEnsamble, NotaEnsambleDetalle,
     NotaEnsambleInsumo, ProductoInsumo, DatosAdicionalesProducto,
-    TrasladoProducto, NotaSalidaAfectacionStock
+    TrasladoProducto, NotaSalidaAfectacionStock, NotaSalidaProducto, NotaSalidaProductoDetalle
 )
+from inventario.busqueda import documento
+from inventario import metricas
+from inventario.utils import tracing, versiones
 
 def _d(x):
     try:
@@ -17,6 +21,28 @@ def _d(x):
 def _round3(d):
     return _d(d).quantize(Decimal('0.001'))
 
+def resumen_productos(nombres):
+    """
+    Texto corto para listas: "Camisa", "Camisa (+2)" o "—".
+    Los nombres se deduplican conservando el orden.
+    """
+    unicos = list(dict.fromkeys(n for n in nombres if n))
+    if not unicos:
+        return "—"
+    if len(unicos) == 1:
+        return unicos[0]
+    return f"{unicos[0]} (+{len(unicos)-1})"
+
+def documento_nota(nota, tercero_nombre, lineas):
+    """search_document de una nota de ensamble; lineas: (nombre, sku) de sus detalles."""
+    return documento(nota.observaciones, tercero_nombre, *(x for n, sku in lineas for x in (n, sku)))
+
+def documento_salida(salida, lineas):
+    """search_document de una nota de salida; lineas: (nombre, sku) de sus detalles."""
+    return documento(salida.numero, salida.observacion, *(x for n, sku in lineas for x in (n, sku)))
+
+LOTE_BUSQUEDA = 500
+
 class InventoryService:
     @staticmethod
     def registrar_movimiento_sin_afectar_stock(*, insumo, tercero, tipo, cantidad, costo_unitario, bodega=None, factura="", observacion="", nota_ensamble=None):
@@ -47,11 +73,13 @@ class InventoryService:
         return mov
 
     @staticmethod
+    @tracing.trazar("insumo.descontar_global")
     def descontar_insumo_global(codigo, cantidad_total, bodega_preferida, tercero=None, nota_ensamble=None, tipo_movimiento=None, observacion_p=None):
         """
         Descuenta stock de un insumo (por código) buscando en múltiples bodegas.
         Prioriza la bodega_preferida.
         """
+        tracing.anotar(insumo=codigo, cantidad=str(cantidad_total))
         if tipo_movimiento is None:
             tipo_movimiento = InsumoMovimiento.Tipo.CONSUMO_ENSAMBLE
 
@@ -77,6 +105,7 @@ class InventoryService:
 
         # 2. Descontar priorizando bodega_preferida
         # 🔒 Bloqueo pesimista para evitar race conditions
+        metricas.bloqueo_stock(Insumo)
         insumos_qs = Insumo.objects.select_for_update().filter(codigo=codigo, es_activo=True).order_by(
             Case(When(bodega=bodega_preferida, then=Value(0)), default=Value(1)),
             '-cantidad'
@@ -111,14 +140,17 @@ class InventoryService:
             restante -= a_descontar
 
     @staticmethod
+    @tracing.trazar("nota.consumir_bom")
     def consumir_insumos_por_delta(producto, bodega, cantidad_producto, nota_ensamble=None, observacion_p=None):
         cantidad_producto = _d(cantidad_producto)
+        tracing.anotar(producto=producto.pk, cantidad=str(cantidad_producto))
         if cantidad_producto == 0:
             return
 
         lineas_bom = ProductoInsumo.objects.filter(producto=producto).select_related("insumo")
         if not lineas_bom.exists():
             return
+        tracing.anotar(lineas_bom=len(lineas_bom))
 
         for li in lineas_bom:
             cpu = _d(li.cantidad_por_unidad)
@@ -139,9 +171,11 @@ class InventoryService:
                 # Reversar (devolver a la bodega de la nota)
                 can_abs = abs(requerido)
                 # 🔒 Bloqueo pesimista
+                metricas.bloqueo_stock(Insumo)
                 ins_pref = Insumo.objects.select_for_update().filter(codigo=li.insumo.codigo, bodega=bodega).first()
                 if not ins_pref:
                     # Si no existe en esa bodega, buscamos el original (pero con lock)
+                    metricas.bloqueo_stock(Insumo)
                     ins_pref = Insumo.objects.select_for_update().filter(pk=li.insumo.pk).first()
                 
                 ins_pref.cantidad = _round3(_d(ins_pref.cantidad) + can_abs)
@@ -179,17 +213,119 @@ class InventoryService:
             codigo_arancelario="N/A",
         )
 
+    @staticmethod
+    @tracing.trazar("nota.totales")
+    def actualizar_totales_nota(nota):
+        """
+        Recalcula y guarda los totales de la nota (costo_total, total_cantidad,
+        items_count, productos_resumen). Se llama al final de cada operación que
+        cambia detalles o movimientos de la nota.
+
+        items_count y productos_resumen salen de las líneas producidas
+        (cantidad > 0): los traslados no los recalculan, así que contar sus
+        detalles de destino haría depender el número de cuándo se recalculó.
+        """
+        costo_movs = (
+            InsumoMovimiento.objects.filter(nota_ensamble=nota)
+            .aggregate(x=Sum("total"))["x"]
+        ) or Decimal("0")
+
+        lineas = list(
+            NotaEnsambleDetalle.objects.filter(nota=nota)
+            .order_by("id")
+            .values_list("cantidad", "producto__nombre", "producto_id")
+        )
+        # Solo líneas producidas: los traslados crean detalles con cantidad 0 en destino
+        detalles = [(c, n) for c, n, _ in lineas if c > 0]
+        tercero_nombre = nota.tercero.nombre if nota.tercero_id else None
+
+        nota.costo_total = costo_movs + _d(nota.costo_servicio)
+        nota.total_cantidad = sum((_d(c) for c, _ in detalles), Decimal("0"))
+        nota.items_count = len(detalles)
+        nota.productos_resumen = resumen_productos(n for _, n in detalles)
+        nota.search_document = documento_nota(nota, tercero_nombre, [(n, sku) for _, n, sku in lineas])
+        nota.save(update_fields=["costo_total", "total_cantidad", "items_count", "productos_resumen", "search_document"])
+
+    @staticmethod
+    @tracing.trazar("salida.totales")
+    def actualizar_totales_salida(salida):
+        """
+        Recalcula y guarda los totales de la nota de salida (total_cantidad,
+        total_valor, items_count, productos_resumen) a partir de sus detalles.
+        """
+        detalles = list(
+            NotaSalidaProductoDetalle.objects.filter(salida=salida)
+            .order_by("id")
+            .values_list("cantidad", "costo_unitario", "producto__nombre", "producto_id")
+        )
+
+        salida.total_cantidad = sum((_d(c) for c, _, _, _ in detalles), Decimal("0"))
+        salida.total_valor = sum((_d(c) * _d(cu) for c, cu, _, _ in detalles if cu is not None), Decimal("0"))
+        salida.items_count = len(detalles)
+        salida.productos_resumen = resumen_productos(n for _, _, n, _ in detalles)
+        salida.search_document = documento_salida(salida, [(n, sku) for _, _, n, sku in detalles])
+        salida.save(update_fields=["total_cantidad", "total_valor", "items_count", "productos_resumen", "search_document"])
+
+    @staticmethod
+    def reconstruir_busqueda_notas(nota_ids):
+        """
+        Rehace el search_document de esas notas de ensamble (copia nombres y SKU
+        de productos y el nombre del tercero: se llama cuando cambian, ver
+        signals.busqueda_notas). Por lotes, con bulk_update.
+        """
+        nota_ids = sorted(set(nota_ids))
+        for i in range(0, len(nota_ids), LOTE_BUSQUEDA):
+            lote = nota_ids[i:i + LOTE_BUSQUEDA]
+            lineas = defaultdict(list)
+            for nota_id, nombre, sku in (
+                NotaEnsambleDetalle.objects.filter(nota_id__in=lote)
+                .order_by("nota_id", "id")
+                .values_list("nota_id", "producto__nombre", "producto_id")
+            ):
+                lineas[nota_id].append((nombre, sku))
+            notas = list(NotaEnsamble.objects.filter(pk__in=lote).select_related("tercero").only(
+                "id", "observaciones", "tercero__nombre"
+            ))
+            for nota in notas:
+                tercero_nombre = nota.tercero.nombre if nota.tercero_id else None
+                nota.search_document = documento_nota(nota, tercero_nombre, lineas[nota.id])
+            NotaEnsamble.objects.bulk_update(notas, ["search_document"])
+        if nota_ids:
+            versiones.tocar_al_confirmar(NotaEnsamble._meta.db_table)  # bulk_update no manda signals
+
+    @staticmethod
+    def reconstruir_busqueda_salidas(salida_ids):
+        """Igual que reconstruir_busqueda_notas, para notas de salida."""
+        salida_ids = sorted(set(salida_ids))
+        for i in range(0, len(salida_ids), LOTE_BUSQUEDA):
+            lote = salida_ids[i:i + LOTE_BUSQUEDA]
+            lineas = defaultdict(list)
+            for salida_id, nombre, sku in (
+                NotaSalidaProductoDetalle.objects.filter(salida_id__in=lote)
+                .order_by("salida_id", "id")
+                .values_list("salida_id", "producto__nombre", "producto_id")
+            ):
+                lineas[salida_id].append((nombre, sku))
+            salidas = list(NotaSalidaProducto.objects.filter(pk__in=lote).only("id", "numero", "observacion"))
+            for salida in salidas:
+                salida.search_document = documento_salida(salida, lineas[salida.id])
+            NotaSalidaProducto.objects.bulk_update(salidas, ["search_document"])
+        if salida_ids:
+            versiones.tocar_al_confirmar(NotaSalidaProducto._meta.db_table)
+
     @staticmethod
     def _total_productos_nota(nota):
         return sum(_d(d.cantidad) for d in nota.detalles.all())
 
     @staticmethod
+    @tracing.trazar("nota.aplicar_detalles")
     def _aplicar_detalles(nota, detalles, signo=Decimal("1"), observacion_p=None):
         """
         Aplica o revierte:
         - Consumo por receta (BOM)
         - Stock del producto terminado
         """
+        tracing.anotar(nota=nota.pk, signo=str(signo))
         for det in detalles:
             producto = det.producto
             cantidad = _d(det.cantidad) * signo
@@ -199,6 +335,7 @@ class InventoryService:
 
             # Stock producto terminado
             # 🔒 Lock para evitar race conditions en stock de producto
+            metricas.bloqueo_stock(DatosAdicionalesProducto)
             datos = DatosAdicionalesProducto.objects.select_for_update().filter(producto=producto).first()
             if not datos:
                  # Si no existe, crearlo (esto no se puede lockear preventivamente fácil sin lockear tabla o producto, pero asumimos create atomic)
@@ -212,6 +349,7 @@ class InventoryService:
             datos.save(update_fields=["stock"])
 
     @staticmethod
+    @tracing.trazar("nota.aplicar_insumos_manuales")
     def _aplicar_insumos_manuales(nota, signo=Decimal("1"), observacion_p=None):
         """
         Interpreta ni.cantidad como: cantidad POR UNIDAD de producto terminado.
@@ -238,8 +376,10 @@ class InventoryService:
                 # Reversar (devolver a la bodega de la nota)
                 can_abs = abs(cant_total)
                 # 🔒 Lock
+                metricas.bloqueo_stock(Insumo)
                 ins_pref = Insumo.objects.select_for_update().filter(codigo=ni.insumo.codigo, bodega=nota.bodega).first()
                 if not ins_pref:
+                    metricas.bloqueo_stock(Insumo)
                     ins_pref = Insumo.objects.select_for_update().get(pk=ni.insumo.pk)
                 
                 ins_pref.cantidad = _round3(_d(ins_pref.cantidad) + can_abs)
@@ -259,6 +399,7 @@ class InventoryService:
                 )
 
     @staticmethod
+    @tracing.trazar("nota.crear")
     @transaction.atomic
     def create_assembly_note(serializer, validated_data):
         """
@@ -281,6 +422,7 @@ class InventoryService:
         insumos_data = validated_data.pop("insumos_input", [])
         
         nota = NotaEnsamble.objects.create(**validated_data)
+        tracing.anotar(nota=nota.pk, detalles=len(detalles_data), insumos_manuales=len(insumos_data))
 
         # 2. Detalles (Productos Terminados)
         NotaEnsambleDetalle.objects.bulk_create(
@@ -297,26 +439,18 @@ class InventoryService:
 
         # 3. Insumos Manuales (Relación)
         if insumos_data:
-            codigos = [x["insumo_codigo"] for x in insumos_data]
-            insumos_qs = Insumo.objects.filter(codigo__in=codigos)
-            insumos_map = {i.codigo: i for i in insumos_qs}
-
-            insumo_objs = []
-            for item in insumos_data:
-                codigo = item["insumo_codigo"]
-                cantidad = item["cantidad"]
-                ins = insumos_map.get(codigo)
-                if not ins:
-                    raise ValidationError(f"Insumo {codigo} no existe.")
-
-                insumo_objs.append(
-                    NotaEnsambleInsumo(
-                        nota=nota,
-                        insumo=ins,
-                        cantidad=cantidad
-                    )
+            # item["insumo"] ya viene resuelto (por lote) desde la validación
+            NotaEnsambleInsumo.objects.bulk_create([
+                NotaEnsambleInsumo(
+                    nota=nota,
+                    insumo=item["insumo"],
+                    cantidad=item["cantidad"]
                 )
-            NotaEnsambleInsumo.objects.bulk_create(insumo_objs)
+                for item in insumos_data
+            ])
+
+        # bulk_create no manda signals (tokens de versión / ETag)
+        versiones.tocar_al_confirmar(NotaEnsambleDetalle._meta.db_table, NotaEnsambleInsumo._meta.db_table)
 
         # 4. APLICAR CAMBIOS DE STOCK
         nota.refresh_from_db() # Para cargar relaciones si hace falta, aunque con bulk_create no están cacheadas en el objeto.
@@ -327,9 +461,12 @@ class InventoryService:
         # Aplicar insumos manuales
         InventoryService._aplicar_insumos_manuales(nota, signo=Decimal("1"))
 
+        InventoryService.actualizar_totales_nota(nota)
+
         return nota
 
     @staticmethod
+    @tracing.trazar("nota.editar")
     @transaction.atomic
     def update_assembly_note(nota, serializer, validated_data):
         # 1. Revertir anterior
@@ -338,6 +475,7 @@ class InventoryService:
         
         # Limpiar historial movimientos previos de esta nota
         InsumoMovimiento.objects.filter(nota_ensamble=nota).delete()
+        versiones.borrado(InsumoMovimiento)  # delete() por queryset no manda signals
 
         # 2. Actualizar Nota (Campos básicos)
         # Extraemos inputs especiales
@@ -351,6 +489,7 @@ class InventoryService:
         # 3. Recrear Detalles si vienen
         if detalles_data is not None:
             nota.detalles.all().delete()
+            versiones.borrado(NotaEnsambleDetalle)
             NotaEnsambleDetalle.objects.bulk_create(
                 [
                     NotaEnsambleDetalle(
@@ -366,27 +505,23 @@ class InventoryService:
         # 4. Recrear Insumos Manuales si vienen
         if insumos_data is not None:
             nota.insumos.all().delete()
-            codigos = [x["insumo_codigo"] for x in insumos_data]
-            insumos_qs = Insumo.objects.filter(codigo__in=codigos)
-            insumos_map = {i.codigo: i for i in insumos_qs}
-            
-            insumo_objs = []
-            for item in insumos_data:
-                codigo = item["insumo_codigo"]
-                ins = insumos_map.get(codigo)
-                if ins:
-                    insumo_objs.append(
-                        NotaEnsambleInsumo(
-                            nota=nota,
-                            insumo=ins,
-                            cantidad=item["cantidad"]
-                        )
-                    )
-            NotaEnsambleInsumo.objects.bulk_create(insumo_objs)
+            versiones.borrado(NotaEnsambleInsumo)
+            NotaEnsambleInsumo.objects.bulk_create([
+                NotaEnsambleInsumo(
+                    nota=nota,
+                    insumo=item["insumo"],
+                    cantidad=item["cantidad"]
+                )
+                for item in insumos_data
+            ])
+
+        versiones.tocar_al_confirmar(NotaEnsambleDetalle._meta.db_table, NotaEnsambleInsumo._meta.db_table)
 
         # 5. Aplicar Nuevo
         nota.refresh_from_db() # Recargar relaciones
         InventoryService._aplicar_detalles(nota, nota.detalles.all(), signo=Decimal("1"))
         InventoryService._aplicar_insumos_manuales(nota, signo=Decimal("1"))
 
+        InventoryService.actualizar_totales_nota(nota)
+
         return nota
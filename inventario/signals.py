@@ -0,0 +1,125 @@
+"""
+Signals de inventario.
+
+Cada save/delete (y los cambios de M2M) de un modelo de inventario:
+  - descarta en este proceso lo armado en memoria a partir de esa tabla
+    (autocompletado, escaneo, services/catalogo.py);
+  - al confirmar la transacción cambia el token de versión de la tabla, para
+    que los demás procesos también lo rehagan y para los ETag de las respuestas
+    (inventario/condicional.py).
+
+Un save con update_fields que no toca las columnas que leen esas memorias
+(save(update_fields=["cantidad"]) en el FIFO) solo cambia el token de los
+ETag: el índice de autocompletado no se rehace por cada movimiento.
+
+Además cuenta los movimientos de kardex escritos para /metrics (metricas.py)
+y las filas escritas en los spans abiertos (utils/tracing.py).
+
+El search_document de las notas copia nombre / SKU de sus productos y el
+nombre del tercero (inventario/busqueda.py): si cambian, se rehace el de las
+notas afectadas (busqueda_notas).
+
+bulk_create / bulk_update / update() no mandan signals: quien los usa llama
+versiones.tocar_al_confirmar(...) con las tablas que tocó.
+
+post_delete se conecta solo en los modelos que se borran de a una instancia
+(BORRADO_POR_INSTANCIA: destroy de la API, admin) y toca también las tablas
+de la cascada. En los demás un listener le quitaría a Django el borrado
+rápido: queryset.delete() traería cada fila a memoria y mandaría una signal
+por fila. Quien borra por queryset llama versiones.borrado(Modelo).
+"""
+from django.apps import apps
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from inventario import metricas
+from inventario.models import (
+    DatosAdicionalesProducto, Insumo, InsumoMovimiento, NotaEnsamble, NotaEnsambleDetalle, NotaSalidaProducto,
+    NotaSalidaProductoDetalle, PrecioProducto, Producto, ProductoInsumo, ProductoTerminadoMovimiento, Proveedor,
+    Tercero, VersionTabla,
+)
+from inventario.services import autocomplete, catalogo, escaneo  # noqa: F401 (registran sus memorias)
+from inventario.services.inventory_service import InventoryService
+from inventario.utils import tracing, versiones
+
+
+def tabla_cambio(sender, update_fields=None, **kwargs):
+    tracing.sumar("filas_escritas")
+    tabla = sender._meta.db_table
+    memorias = versiones.afecta_memorias(tabla, update_fields)
+    if memorias:
+        versiones.invalidar_local(tabla, campos=update_fields)
+    versiones.tocar_al_confirmar(tabla, memorias=memorias)
+
+
+def fila_borrada(sender, **kwargs):
+    tracing.sumar("filas_escritas")
+    versiones.borrado(sender)
+
+
+def m2m_cambio(sender, instance, action, model, **kwargs):
+    if action.startswith("post_"):
+        tablas = {sender._meta.db_table, type(instance)._meta.db_table, model._meta.db_table}
+        versiones.invalidar_local(*tablas)
+        versiones.tocar_al_confirmar(*tablas)
+
+
+KARDEX = {InsumoMovimiento: "insumo", ProductoTerminadoMovimiento: "terminado"}
+
+# destroy de la API (los demás viewsets hacen soft delete) y admin
+BORRADO_POR_INSTANCIA = (
+    NotaEnsamble, NotaSalidaProducto, PrecioProducto, DatosAdicionalesProducto, ProductoInsumo, Insumo, Proveedor,
+)
+
+# campos que las notas copian en su search_document
+CAMPOS_EN_NOTAS = {Producto: Producto.CAMPOS_BUSQUEDA, Tercero: ("nombre",)}
+
+
+def busqueda_previa(sender, instance, update_fields=None, **kwargs):
+    """Guarda los valores anteriores de CAMPOS_EN_NOTAS (si el save puede cambiarlos)."""
+    campos = CAMPOS_EN_NOTAS[sender]
+    instance._busqueda_previa = None
+    if instance._state.adding or (update_fields is not None and not set(update_fields) & set(campos)):
+        return
+    instance._busqueda_previa = sender._base_manager.filter(pk=instance.pk).values_list(*campos).first()
+
+
+def busqueda_notas(sender, instance, created, **kwargs):
+    previa = getattr(instance, "_busqueda_previa", None)
+    if previa is None or previa == tuple(getattr(instance, c) for c in CAMPOS_EN_NOTAS[sender]):
+        return
+    if sender is Tercero:
+        InventoryService.reconstruir_busqueda_notas(
+            NotaEnsamble.objects.filter(tercero=instance).values_list("id", flat=True)
+        )
+        return
+    InventoryService.reconstruir_busqueda_notas(
+        NotaEnsambleDetalle.objects.filter(producto=instance).values_list("nota_id", flat=True)
+    )
+    InventoryService.reconstruir_busqueda_salidas(
+        NotaSalidaProductoDetalle.objects.filter(producto=instance).values_list("salida_id", flat=True)
+    )
+
+
+def movimiento_creado(sender, instance, created, **kwargs):
+    if created:
+        metricas.movimiento_escrito(KARDEX[sender], instance.tipo)
+
+for _model in apps.get_app_config("inventario").get_models():
+    if _model is VersionTabla:  # los propios tokens
+        continue
+    post_save.connect(tabla_cambio, sender=_model, dispatch_uid=f"tabla_cambio_save_{_model.__name__}")
+    for _m2m in _model._meta.local_many_to_many:
+        m2m_changed.connect(
+            m2m_cambio, sender=_m2m.remote_field.through,
+            dispatch_uid=f"m2m_cambio_{_model.__name__}_{_m2m.name}",
+        )
+
+for _model in BORRADO_POR_INSTANCIA:
+    post_delete.connect(fila_borrada, sender=_model, dispatch_uid=f"fila_borrada_{_model.__name__}")
+
+for _model in KARDEX:
+    post_save.connect(movimiento_creado, sender=_model, dispatch_uid=f"movimiento_creado_{_model.__name__}")
+
+for _model in CAMPOS_EN_NOTAS:
+    pre_save.connect(busqueda_previa, sender=_model, dispatch_uid=f"busqueda_previa_{_model.__name__}")
+    post_save.connect(busqueda_notas, sender=_model, dispatch_uid=f"busqueda_notas_{_model.__name__}")
@@ -1,3 +1,1163 @@
-from django.test import TestCase
+"""
+Presupuesto de consultas SQL por endpoint: atrapar N+1 antes de salir.
 
-# Create your tests here.
+Cada caso siembra un lote de datos (Fabrica), hace el request una vez para
+calentar lo que se guarda en memoria (catálogo, autocompletado), cuenta las
+consultas, siembra más lotes y vuelve a contar. El número no puede cambiar con
+la cantidad de filas y no puede pasar el presupuesto del caso.
+
+Las importaciones escriben fila por fila: ahí el presupuesto es un fijo más
+un máximo de consultas por fila.
+"""
+import datetime
+import gzip
+import importlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from openpyxl import Workbook
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from inventario.models import (
+    Bodega, DatosAdicionalesProducto, Impuesto, Insumo, InsumoMovimiento, NotaEnsamble, NotaEnsambleDetalle,
+    NotaSalidaAfectacionStock, NotaSalidaProducto, NotaSalidaProductoDetalle, Operador, PrecioProducto, Producto,
+    ProductoInsumo, Proveedor, Talla, Tercero, TrasladoProducto, VersionTabla,
+)
+from inventario import renderers, replica
+from inventario.middleware.compresion import CompresionMiddleware
+from inventario.services import autocomplete, catalogo
+from inventario.services.inventory_service import InventoryService
+from inventario.utils import versiones
+
+LOTES_EXTRA = 3
+
+_log_consultas = logging.getLogger("inventario.consultas")
+_nivel_consultas = _log_consultas.level
+
+
+def setUpModule():
+    # las escrituras de Fabrica pasan el presupuesto de consultas: sin WARNING por request
+    # en la salida de los tests (middleware/consultas.py; assertLogs lo baja donde se mira)
+    _log_consultas.setLevel(logging.ERROR)
+
+
+def tearDownModule():
+    _log_consultas.setLevel(_nivel_consultas)
+
+
+class Fabrica:
+    """
+    Datos de prueba: un catálogo fijo (bodegas, tercero, tallas, impuesto, tela)
+    y lotes que agregan productos con precios y receta, y una nota de ensamble,
+    una salida y un traslado con todos los productos que hay hasta ese lote, más
+    una entrada de la tela. Así crecen a la vez las listas, el kardex y el
+    contenido de la bodega principal y los hijos de la última nota / salida.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.n = 0
+        self.bodega = Bodega.objects.create(codigo="B01", nombre="PRINCIPAL", ubicacion="Planta")
+        self.bodega2 = Bodega.objects.create(codigo="B02", nombre="PUNTO DE VENTA")
+        self.tercero = Tercero.objects.create(codigo="T01", nombre="CLIENTE MAYORISTA")
+        self.operador = Operador.objects.create(codigo="OP01", nombre="TALLER CONFECCION")
+        self.proveedor = Proveedor.objects.create(nombre="TEXTILES SAS")
+        self.iva = Impuesto.objects.create(nombre="IVA", valor=Decimal("19"))
+        self.tallas = [Talla.objects.create(nombre=n) for n in ("S", "M", "L")]
+        self.tela = self.insumo(codigo="TELA", nombre="Tela algodón")
+        self.principal = self.producto()
+        self.productos = [self.principal]
+
+    def sec(self):
+        self.n += 1
+        return self.n
+
+    def insumo(self, codigo=None, nombre=None):
+        i = self.sec()
+        codigo = codigo or f"INS-{i:04d}"
+        return Insumo.objects.create(
+            codigo=codigo, referencia=codigo, nombre=nombre or f"Botón {i}", bodega=self.bodega,
+            proveedor=self.proveedor, tercero=self.tercero, unidad_medida="UN",
+            cantidad=Decimal("100000"), costo_unitario=Decimal("150.00"),
+        )
+
+    def producto(self):
+        i = self.sec()
+        producto = Producto.objects.create(
+            codigo_sku=f"SKU-{i:04d}", nombre=f"Camisa {i}", unidad_medida="UN",
+            codigo_barras=f"77{i:08d}", tercero=self.tercero,
+        )
+        producto.impuestos.add(self.iva)
+        PrecioProducto.objects.create(producto=producto, nombre="Detal", valor=Decimal("59900.00"))
+        PrecioProducto.objects.create(producto=producto, nombre="Mayorista", valor=Decimal("42000.00"))
+        DatosAdicionalesProducto.objects.create(producto=producto, referencia=f"REF-{i}", stock_minimo=Decimal("5"))
+        ProductoInsumo.objects.create(producto=producto, insumo=self.tela, cantidad_por_unidad=Decimal("1.5"))
+        ProductoInsumo.objects.create(producto=producto, insumo=self.insumo(), cantidad_por_unidad=Decimal("6"))
+        return producto
+
+    def post(self, url, data):
+        response = self.client.post(url, data, format="json")
+        assert response.status_code in (200, 201), (url, response.status_code, response.content[:500])
+        return response.json()
+
+    def nota_ensamble(self, productos):
+        return self.post("/api/notas-ensamble/", {
+            "bodega_id": self.bodega.id, "tercero_id": self.tercero.id, "operador_id": self.operador.id,
+            "costo_servicio": "1500.00",
+            "detalles_input": [
+                {"producto_id": p.codigo_sku, "talla_id": t.nombre, "cantidad": "10"}
+                for p in productos for t in self.tallas
+            ],
+        })
+
+    def salida(self, productos):
+        return self.post("/api/salidas-producto/", {
+            "fecha": "2026-01-15", "bodega_id": self.bodega.id, "tercero_id": self.tercero.id,
+            "detalles_input": [
+                {"producto_id": p.codigo_sku, "talla": t.nombre, "cantidad": "2", "costo_unitario": "59900"}
+                for p in productos for t in self.tallas
+            ],
+        })
+
+    def traslado(self, productos):
+        return self.post("/api/traslados-producto/ejecutar-masivo/", {
+            "tercero_id": self.tercero.id, "bodega_origen_id": self.bodega.id, "bodega_destino_id": self.bodega2.id,
+            "items": [{"producto_id": p.codigo_sku, "talla_id": t.id, "cantidad": "1"} for p in productos for t in self.tallas],
+        })
+
+    def entrada_insumo(self, insumo):
+        return self.post(f"/api/insumos/{insumo.codigo}/movimiento/", {
+            "tipo": "ENTRADA", "tercero_id": self.tercero.id, "bodega_id": self.bodega.id,
+            "cantidad": "50", "costo_unitario": "150.00", "factura": "FAC-1",
+        })
+
+    def lote(self):
+        self.productos += [self.producto(), self.producto()]
+        self.nota_ensamble(self.productos)
+        self.salida(self.productos)
+        self.traslado(self.productos)
+        self.entrada_insumo(self.tela)
+
+
+def ultimo(model):
+    """pk del último registro (la última nota / salida tiene todos los productos)."""
+    return model.objects.order_by("-pk").values_list("pk", flat=True).first()
+
+
+def xlsx(filas, nombre="importacion.xlsx"):
+    wb = Workbook()
+    ws = wb.active
+    for fila in filas:
+        ws.append(fila)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return SimpleUploadedFile(nombre, buf.getvalue(), content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+
+class PresupuestoConsultasTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalogo.invalidar()
+        autocomplete.invalidar()
+        self.client = APIClient()
+        self.f = Fabrica(self.client)
+        self.f.lote()
+
+    def request(self, metodo, url, data=None, formato="json"):
+        response = getattr(self.client, metodo)(url, data, format=formato) if data is not None else getattr(self.client, metodo)(url)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{metodo.upper()} {url}: {response.status_code} {getattr(response, 'content', b'')[:300]}")
+        return response
+
+    def contar(self, fn):
+        fn()  # calienta catálogo / autocompletado en memoria
+        with CaptureQueriesContext(connection) as ctx:
+            fn()
+        return len(ctx.captured_queries)
+
+    def assertPresupuesto(self, casos):
+        """
+        casos: [(nombre, presupuesto, fn)]; fn hace el request. Mide con un lote,
+        agrega LOTES_EXTRA lotes y vuelve a medir.
+        """
+        antes = {nombre: self.contar(fn) for nombre, _, fn in casos}
+        for _ in range(LOTES_EXTRA):
+            self.f.lote()
+        for nombre, presupuesto, fn in casos:
+            with self.subTest(nombre):
+                despues = self.contar(fn)
+                self.assertEqual(
+                    despues, antes[nombre],
+                    f"{nombre}: {antes[nombre]} consultas con 1 lote, {despues} con {1 + LOTES_EXTRA} (¿N+1?)",
+                )
+                self.assertLessEqual(despues, presupuesto, f"{nombre}: {despues} consultas, presupuesto {presupuesto}")
+
+    def get(self, url):
+        """url puede ser una función: se arma en cada medición (p. ej. la última nota)."""
+        return lambda: self.request("get", url() if callable(url) else url)
+
+
+class ProductosConsultasTest(PresupuestoConsultasTestCase):
+    def test_productos(self):
+        p = self.f.principal
+        self.assertPresupuesto([
+            ("productos list", 5, self.get("/api/productos/")),
+            ("productos list fields", 2, self.get("/api/productos/?fields=codigo_sku,nombre,codigo_barras")),
+            ("productos list search", 5, self.get("/api/productos/?search=camisa")),
+            ("productos list cursor", 5, self.get("/api/productos/?paginacion=cursor")),
+            ("productos retrieve", 4, self.get(f"/api/productos/{p.pk}/")),
+            ("productos escanear", 1, self.get(f"/api/productos/escanear/?codigo={p.codigo_barras},{p.pk}")),
+            ("productos escanear bodega", 1,
+             self.get(f"/api/productos/escanear/?codigo={p.codigo_barras}&bodega_id={self.f.bodega.id}")),
+            ("productos stock-por-talla", 5, self.get(f"/api/productos/{p.pk}/stock-por-talla/")),
+            ("producto-precios list", 2, self.get("/api/producto-precios/")),
+            ("producto-datos-adicionales list", 2, self.get("/api/producto-datos-adicionales/")),
+            ("producto-insumos list", 2, self.get("/api/producto-insumos/")),
+        ])
+
+
+class InsumosConsultasTest(PresupuestoConsultasTestCase):
+    def test_insumos(self):
+        tela = self.f.tela
+        self.assertPresupuesto([
+            ("insumos list", 2, self.get("/api/insumos/")),
+            ("insumos list search", 2, self.get("/api/insumos/?search=boton")),
+            ("insumos retrieve", 1, self.get(f"/api/insumos/{tela.pk}/")),
+            ("insumos movimientos", 3, self.get(f"/api/insumos/{tela.pk}/movimientos/")),
+            ("insumos stock_por_bodega", 2, self.get(f"/api/insumos/{tela.pk}/stock_por_bodega/")),
+            ("insumo-movimientos list", 2, self.get("/api/insumo-movimientos/")),
+            ("insumo-movimientos list cursor", 1, self.get("/api/insumo-movimientos/?paginacion=cursor")),
+        ])
+
+
+class NotasEnsambleConsultasTest(PresupuestoConsultasTestCase):
+    def test_notas_ensamble(self):
+        self.assertPresupuesto([
+            ("notas-ensamble list", 2, self.get("/api/notas-ensamble/")),
+            ("notas-ensamble list search", 2, self.get("/api/notas-ensamble/?search=camisa")),
+            ("notas-ensamble retrieve", 13, self.get(lambda: f"/api/notas-ensamble/{ultimo(NotaEnsamble)}/")),
+        ])
+
+
+class SalidasConsultasTest(PresupuestoConsultasTestCase):
+    def test_salidas(self):
+        self.assertPresupuesto([
+            ("salidas-producto list", 2, self.get("/api/salidas-producto/")),
+            ("salidas-producto retrieve", 6, self.get(lambda: f"/api/salidas-producto/{ultimo(NotaSalidaProducto)}/")),
+            ("salidas-producto pdf", 4, self.get(lambda: f"/api/salidas-producto/{ultimo(NotaSalidaProducto)}/pdf/")),
+        ])
+
+
+class TrasladosConsultasTest(PresupuestoConsultasTestCase):
+    def test_traslados(self):
+        self.assertPresupuesto([
+            ("traslados-producto list", 4, self.get("/api/traslados-producto/")),
+            ("traslados-producto retrieve", 4, self.get(lambda: f"/api/traslados-producto/{ultimo(TrasladoProducto)}/")),
+        ])
+
+
+class BodegasConsultasTest(PresupuestoConsultasTestCase):
+    def test_bodegas(self):
+        bodega = self.f.bodega
+        self.assertPresupuesto([
+            ("bodegas list", 2, self.get("/api/bodegas/")),
+            ("bodegas retrieve", 1, self.get(f"/api/bodegas/{bodega.pk}/")),
+            ("bodegas contenido", 3, self.get(f"/api/bodegas/{bodega.pk}/contenido/")),
+            ("bodegas stock-terminado", 2, self.get(f"/api/bodegas/{bodega.pk}/stock-terminado/")),
+            ("bodegas stock-terminado sku", 2,
+             self.get(f"/api/bodegas/{bodega.pk}/stock-terminado/?sku={self.f.principal.pk}")),
+        ])
+
+
+class CatalogosConsultasTest(PresupuestoConsultasTestCase):
+    def test_catalogos(self):
+        self.assertPresupuesto([
+            ("terceros list", 2, self.get("/api/terceros/")),
+            ("operadores list", 2, self.get("/api/operadores/")),
+            ("proveedores list", 2, self.get("/api/proveedores/")),
+            ("impuestos list", 2, self.get("/api/impuestos/")),
+            ("tallas list", 2, self.get("/api/tallas/")),
+            ("autocomplete", 0, self.get("/api/autocomplete/?q=cam")),
+        ])
+
+
+class ReportesConsultasTest(PresupuestoConsultasTestCase):
+    def test_reportes(self):
+        self.assertPresupuesto([
+            ("reportes resumen", 13, self.get("/api/reportes/resumen/")),
+            ("reportes insumos top-comprados", 1, self.get("/api/reportes/insumos/top-comprados/")),
+            ("reportes insumos top-consumidos", 1, self.get("/api/reportes/insumos/top-consumidos/")),
+            ("reportes productos top-vendidos", 1, self.get("/api/reportes/productos/top-vendidos/")),
+            ("reportes productos serie-ventas", 1, self.get("/api/reportes/productos/serie-ventas/")),
+            ("reportes produccion top-producidos", 1, self.get("/api/reportes/produccion/top-producidos/")),
+            ("reportes bodegas stock", 3, self.get("/api/reportes/bodegas/stock/")),
+            ("reportes notas salidas resumen", 5, self.get("/api/reportes/notas/salidas/resumen/")),
+            ("reportes operadores resumen", 1, self.get("/api/reportes/operadores/resumen/")),
+            ("reportes exportar-excel", 7, self.get("/api/reportes/exportar-excel/")),
+            ("reportes bodegas stock columnar", 3, self.get("/api/reportes/bodegas/stock/?format=columnar")),
+        ])
+
+
+class ExcelConsultasTest(PresupuestoConsultasTestCase):
+    def test_kardex_y_plantillas(self):
+        sku = self.f.principal.pk
+        self.assertPresupuesto([
+            ("kardex-terminado", 1, self.get(f"/api/excel/kardex-terminado/?sku={sku}")),
+            ("kardex-terminado exportar csv", 1, self.get("/api/excel/kardex-terminado/exportar/?formato=csv")),
+            ("kardex-terminado exportar xlsx", 1, self.get("/api/excel/kardex-terminado/exportar/?formato=xlsx")),
+            ("plantilla-insumos", 0, self.get("/api/excel/plantilla-insumos/")),
+            ("plantilla-terminado", 0, self.get("/api/excel/plantilla-terminado/")),
+            ("plantilla-bodegas", 0, self.get("/api/excel/plantilla-bodegas/")),
+        ])
+
+
+class EscriturasConsultasTest(PresupuestoConsultasTestCase):
+    """Las acciones que escriben: el costo de una escritura no crece con lo que ya hay."""
+
+    def test_escrituras(self):
+        f = self.f
+        self.assertPresupuesto([
+            ("notas-ensamble create", 133, lambda: f.nota_ensamble([f.principal])),
+            ("salidas-producto create", 38, lambda: f.salida([f.principal])),
+            ("traslados-producto ejecutar-masivo", 24, lambda: f.traslado([f.principal])),
+            ("insumos movimiento", 10, lambda: f.entrada_insumo(f.tela)),
+            ("productos escanear POST", 1, lambda: f.post("/api/productos/escanear/", {
+                "bodega_id": f.bodega.id, "codigos": [f.principal.codigo_barras, f.principal.pk, "NO-EXISTE"],
+            })),
+        ])
+
+
+class ImportacionesConsultasTest(PresupuestoConsultasTestCase):
+    """
+    Importaciones: consultas(filas) = fijo + por_fila * filas. Se mide con FILAS
+    y con 2 * FILAS (filas nuevas cada vez) y se acotan las dos partes.
+    """
+    FILAS = 5
+
+    def importar(self, url, filas):
+        return self.request("post", url, {"file": xlsx(filas)}, formato="multipart")
+
+    def assertPresupuestoFilas(self, nombre, fijo, por_fila, url, armar):
+        """armar(desde, n) → filas del Excel (con encabezado) para n registros nuevos."""
+        self.importar(url, armar(0, 1))  # calienta el catálogo en memoria
+        medidas = []
+        desde = 1
+        for n in (self.FILAS, 2 * self.FILAS):
+            with CaptureQueriesContext(connection) as ctx:
+                self.importar(url, armar(desde, n))
+            medidas.append(len(ctx.captured_queries))
+            desde += n
+        pendiente = (medidas[1] - medidas[0]) / self.FILAS
+        base = medidas[0] - pendiente * self.FILAS
+        with self.subTest(nombre):
+            self.assertLessEqual(pendiente, por_fila, f"{nombre}: {pendiente} consultas por fila ({medidas})")
+            self.assertLessEqual(base, fijo, f"{nombre}: {base} consultas fijas ({medidas})")
+
+    def test_importaciones(self):
+        f = self.f
+
+        def insumos(desde, n):
+            encabezado = ["Codigo Producto", "Referencia", "Descripción", "Cantidad Entrada (Stock)",
+                          "Costo Unitario", "Marca (Proveedor)", "Bodega", "Tercero", "Unidad Medida"]
+            return [encabezado] + [
+                [f"IMP-{i:04d}", f"IMP-{i:04d}", f"Cierre {i}", 20, 350, f.proveedor.nombre,
+                 f.bodega.codigo, f.tercero.codigo, "UN"]
+                for i in range(desde, desde + n)
+            ]
+
+        def terminado(desde, n):
+            encabezado = ["fecha", "bodega_id", "tercero_id", "producto_sku", "talla", "cantidad", "costo_unitario"]
+            return [encabezado] + [
+                ["2026-02-01", f.bodega.id, f.tercero.id, f.principal.pk, f.tallas[i % 3].nombre, 4, 18000]
+                for i in range(desde, desde + n)
+            ]
+
+        def catalogo_codigo_nombre(prefijo):
+            def armar(desde, n):
+                return [["Codigo", "Nombre"]] + [[f"{prefijo}-{i:04d}", f"{prefijo} {i}"] for i in range(desde, desde + n)]
+            return armar
+
+        def catalogo_nombre(prefijo):
+            def armar(desde, n):
+                return [["Nombre"]] + [[f"{prefijo}{i}"] for i in range(desde, desde + n)]
+            return armar
+
+        self.assertPresupuestoFilas("importar-insumos", 2, 15, "/api/excel/importar-insumos/", insumos)
+        self.assertPresupuestoFilas("importar-terminado", 11, 9, "/api/excel/importar-terminado/", terminado)
+        self.assertPresupuestoFilas("importar-terceros", 2, 2, "/api/excel/importar-terceros/",
+                                    catalogo_codigo_nombre("TER"))
+        self.assertPresupuestoFilas("importar-bodegas", 2, 2, "/api/excel/importar-bodegas/",
+                                    catalogo_codigo_nombre("BOD"))
+        self.assertPresupuestoFilas("importar-proveedores", 2, 2, "/api/excel/importar-proveedores/",
+                                    catalogo_nombre("PROVEEDOR "))
+        self.assertPresupuestoFilas("importar-tallas", 2, 2, "/api/excel/importar-tallas/", catalogo_nombre("T"))
+
+
+def resumen_esperado(nombres):
+    nombres = list(dict.fromkeys(nombres))
+    if not nombres:
+        return "—"
+    return nombres[0] if len(nombres) == 1 else f"{nombres[0]} (+{len(nombres) - 1})"
+
+
+class TotalesNotaTestCase(TestCase):
+    """Totales guardados de NotaEnsamble (actualizar_totales_nota y backfill de 0024) contra los detalles."""
+
+    CAMPOS = ("costo_total", "total_cantidad", "items_count", "productos_resumen")
+
+    def setUp(self):
+        self.f = Fabrica(APIClient())
+        self.otro = self.f.producto()
+
+    def esperado(self, nota_id):
+        nota = NotaEnsamble.objects.get(pk=nota_id)
+        # solo líneas producidas: los traslados agregan detalles en destino con cantidad 0
+        detalles = list(nota.detalles.filter(cantidad__gt=0).select_related("producto").order_by("id"))
+        costo = InsumoMovimiento.objects.filter(nota_ensamble=nota).aggregate(x=Sum("total"))["x"] or Decimal("0")
+        return {
+            "costo_total": costo + nota.costo_servicio,
+            "total_cantidad": sum((d.cantidad for d in detalles), Decimal("0")),
+            "items_count": len(detalles),
+            "productos_resumen": resumen_esperado(d.producto.nombre for d in detalles),
+        }
+
+    def assertTotales(self, nota_id):
+        guardado = NotaEnsamble.objects.values(*self.CAMPOS).get(pk=nota_id)
+        self.assertEqual(guardado, self.esperado(nota_id))
+        return guardado
+
+    def test_crear_editar_borrar(self):
+        nota = self.f.nota_ensamble([self.f.principal, self.otro])
+        guardado = self.assertTotales(nota["id"])
+        self.assertEqual(guardado["items_count"], 6)
+        self.assertEqual(guardado["productos_resumen"], f"{self.f.principal.nombre} (+1)")
+        self.assertGreater(guardado["costo_total"], Decimal("1500"))
+
+        fila = next(n for n in self.f.client.get("/api/notas-ensamble/").json()["results"] if n["id"] == nota["id"])
+        self.assertEqual(Decimal(fila["costo_total"]), guardado["costo_total"])
+        self.assertEqual(fila["productos_resumen"], guardado["productos_resumen"])
+
+        # editar revierte y vuelve a aplicar: los totales salen de las líneas nuevas
+        response = self.f.client.patch(f"/api/notas-ensamble/{nota['id']}/", {
+            "costo_servicio": "900.00",
+            "detalles_input": [{"producto_id": self.otro.pk, "talla_id": "M", "cantidad": "4"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.content[:300])
+        guardado = self.assertTotales(nota["id"])
+        self.assertEqual((guardado["items_count"], guardado["total_cantidad"]), (1, Decimal("4")))
+        self.assertEqual(guardado["productos_resumen"], self.otro.nombre)
+
+        otra = self.f.nota_ensamble([self.f.principal])
+        antes = self.assertTotales(otra["id"])
+        response = self.f.client.delete(f"/api/notas-ensamble/{nota['id']}/")
+        self.assertEqual(response.status_code, 204, response.content[:300])
+        self.assertFalse(NotaEnsamble.objects.filter(pk=nota["id"]).exists())
+        self.assertEqual(self.assertTotales(otra["id"]), antes)
+
+    def test_traslado_no_suma_items(self):
+        nota = self.f.nota_ensamble([self.f.principal])
+        antes = self.assertTotales(nota["id"])
+        self.f.traslado([self.f.principal])
+        self.assertEqual(NotaEnsambleDetalle.objects.filter(nota_id=nota["id"]).count(), 6)
+
+        InventoryService.actualizar_totales_nota(NotaEnsamble.objects.get(pk=nota["id"]))
+        self.assertEqual(self.assertTotales(nota["id"]), antes)
+        self.assertEqual(antes["items_count"], 3)
+
+    def test_importar_terminado(self):
+        filas = [["fecha", "bodega_id", "tercero_id", "producto_sku", "talla", "cantidad", "costo_unitario"]] + [
+            ["2026-02-01", self.f.bodega.id, self.f.tercero.id, sku, talla, 4, 18000]
+            for sku, talla in ((self.f.principal.pk, "S"), (self.f.principal.pk, "S"), (self.otro.pk, "M"))
+        ]
+        response = self.f.client.post("/api/excel/importar-terminado/", {"file": xlsx(filas)}, format="multipart")
+        self.assertEqual(response.status_code, 200, response.content[:300])
+
+        guardado = self.assertTotales(ultimo(NotaEnsamble))
+        self.assertEqual((guardado["items_count"], guardado["total_cantidad"]), (2, Decimal("12")))
+
+    def test_backfill_0024(self):
+        ids = [self.f.nota_ensamble([self.f.principal, self.otro])["id"], self.f.nota_ensamble([self.otro])["id"]]
+        self.f.traslado([self.f.principal])
+        NotaEnsamble.objects.update(
+            costo_total=Decimal("0"), total_cantidad=Decimal("0"), items_count=0, productos_resumen="—"
+        )
+
+        importlib.import_module("inventario.migrations.0024_notaensamble_totales").backfill_totales(apps, None)
+        for nota_id in ids:
+            self.assertTotales(nota_id)
+
+
+class TotalesSalidaTestCase(TestCase):
+    """Totales guardados de NotaSalidaProducto (actualizar_totales_salida y backfill de 0025)."""
+
+    CAMPOS = ("total_cantidad", "total_valor", "items_count", "productos_resumen")
+
+    def setUp(self):
+        self.f = Fabrica(APIClient())
+        self.otro = self.f.producto()
+        self.f.nota_ensamble([self.f.principal, self.otro])
+
+    def esperado(self, salida_id):
+        detalles = list(
+            NotaSalidaProductoDetalle.objects.filter(salida_id=salida_id).select_related("producto").order_by("id")
+        )
+        return {
+            "total_cantidad": sum((d.cantidad for d in detalles), Decimal("0")),
+            "total_valor": sum((d.cantidad * d.costo_unitario for d in detalles), Decimal("0")),
+            "items_count": len(detalles),
+            "productos_resumen": resumen_esperado(d.producto.nombre for d in detalles),
+        }
+
+    def assertTotales(self, salida_id):
+        guardado = NotaSalidaProducto.objects.values(*self.CAMPOS).get(pk=salida_id)
+        self.assertEqual(guardado, self.esperado(salida_id))
+        return guardado
+
+    def test_crear_editar_borrar(self):
+        salida = self.f.salida([self.f.principal, self.otro])
+        guardado = self.assertTotales(salida["id"])
+        self.assertEqual((guardado["items_count"], guardado["total_cantidad"]), (6, Decimal("12")))
+        self.assertEqual(guardado["total_valor"], Decimal("718800"))
+
+        fila = next(n for n in self.f.client.get("/api/salidas-producto/").json()["results"] if n["id"] == salida["id"])
+        self.assertEqual(Decimal(fila["total_valor"]), guardado["total_valor"])
+        self.assertEqual(fila["productos_resumen"], f"{self.f.principal.nombre} (+1)")
+
+        # editar devuelve el stock de las líneas anteriores y aplica las nuevas
+        response = self.f.client.patch(f"/api/salidas-producto/{salida['id']}/", {
+            "detalles_input": [{"producto_id": self.otro.pk, "talla": "L", "cantidad": "3", "costo_unitario": "1000"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.content[:300])
+        guardado = self.assertTotales(salida["id"])
+        self.assertEqual(guardado, {
+            "total_cantidad": Decimal("3"), "total_valor": Decimal("3000"), "items_count": 1,
+            "productos_resumen": self.otro.nombre,
+        })
+
+        otra = self.f.salida([self.f.principal])
+        antes = self.assertTotales(otra["id"])
+        response = self.f.client.delete(f"/api/salidas-producto/{salida['id']}/")
+        self.assertEqual(response.status_code, 204, response.content[:300])
+        self.assertFalse(NotaSalidaProducto.objects.filter(pk=salida["id"]).exists())
+        self.assertEqual(self.assertTotales(otra["id"]), antes)
+
+    def test_backfill_0025(self):
+        ids = [self.f.salida([self.f.principal, self.otro])["id"], self.f.salida([self.otro])["id"]]
+        NotaSalidaProducto.objects.update(
+            total_cantidad=Decimal("0"), total_valor=Decimal("0"), items_count=0, productos_resumen="—"
+        )
+
+        importlib.import_module("inventario.migrations.0025_notasalida_totales").backfill_totales(apps, None)
+        for salida_id in ids:
+            self.assertTotales(salida_id)
+
+
+class BusquedaNotasTestCase(TestCase):
+    """search_document de las notas: sigue a los nombres de productos y terceros."""
+
+    def setUp(self):
+        self.f = Fabrica(APIClient())
+        self.f.nota_ensamble([self.f.principal])
+        self.f.salida([self.f.principal])
+
+    def buscar(self, url, texto):
+        return self.f.client.get(url, {"search": texto}).json()["count"]
+
+    def test_renombrar_producto(self):
+        producto = self.f.principal
+        anterior = producto.nombre
+        producto.nombre = "Chaqueta Impermeable"
+        producto.save()
+
+        for url in ("/api/notas-ensamble/", "/api/salidas-producto/"):
+            self.assertEqual(self.buscar(url, "impermeable"), 1, url)
+            self.assertEqual(self.buscar(url, anterior), 0, url)
+
+    def test_renombrar_tercero(self):
+        self.f.tercero.nombre = "Distribuidora Ñandú"
+        self.f.tercero.save()
+        self.assertEqual(self.buscar("/api/notas-ensamble/", "nandu"), 1)
+
+    def test_save_sin_campos_de_busqueda(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.f.tercero.save(update_fields=["es_activo"])
+        self.assertEqual(len(consultas), 1)
+
+
+class AutocompletadoTestCase(TestCase):
+    """El índice de autocompletado solo se rehace si cambian las columnas que lee."""
+
+    def setUp(self):
+        # los tokens se tocan al confirmar: en TestCase hay que correr los on_commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f = Fabrica(APIClient())
+        autocomplete.invalidar()
+
+    def buscar(self, q):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.f.client.get("/api/autocomplete/", {"tipo": "insumo", "q": q})
+        self.assertEqual(response.status_code, 200)
+        leyo = any('FROM "inventario_insumo"' in c["sql"] for c in consultas.captured_queries)
+        return [r["codigo"] for r in response.json()["results"]], leyo
+
+    def test_movimiento_de_stock(self):
+        self.buscar("tela")
+        etag = self.f.client.get("/api/insumos/").headers["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f.entrada_insumo(self.f.tela)
+
+        codigos, leyo = self.buscar("tela")
+        self.assertEqual(codigos, ["TELA"])
+        self.assertFalse(leyo)
+        # el ETag sí cambia: la cantidad está en la respuesta
+        self.assertNotEqual(self.f.client.get("/api/insumos/").headers["ETag"], etag)
+
+    def test_renombrar(self):
+        self.buscar("tela")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.f.client.patch(f"/api/insumos/{self.f.tela.codigo}/", {"nombre": "Lino crudo"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content[:300])
+
+        codigos, leyo = self.buscar("lino")
+        self.assertEqual(codigos, ["TELA"])
+        self.assertTrue(leyo)
+
+
+class CamposDinamicosTestCase(TestCase):
+    """campos.py: el camino .values() de ?fields= da lo mismo que el serializer."""
+
+    def setUp(self):
+        self.f = Fabrica(APIClient())
+        self.f.lote()
+        self.f.lote()
+
+    def resultados(self, url):
+        response = self.f.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content[:300])
+        return response.json()["results"]
+
+    def assertMismosCampos(self, url, campos):
+        separador = "&" if "?" in url else "?"
+        with CaptureQueriesContext(connection) as consultas:
+            parciales = self.resultados(f"{url}{separador}fields={','.join(campos)}")
+        completos = self.resultados(url)
+        self.assertTrue(completos)
+        self.assertEqual(parciales, [{c: fila[c] for c in campos} for fila in completos])
+        return consultas
+
+    def test_productos(self):
+        consultas = self.assertMismosCampos(
+            "/api/productos/", ["codigo_sku", "nombre", "codigo_barras", "unidad_medida", "creado_en", "es_activo"]
+        )
+        # .values(): ni prefetch de impuestos / precios / datos adicionales
+        self.assertFalse([c for c in consultas.captured_queries if "inventario_precioproducto" in c["sql"]])
+
+    def test_insumos(self):
+        self.assertMismosCampos(
+            "/api/insumos/", ["codigo", "nombre", "unidad_medida", "cantidad", "costo_unitario", "actualizado_en"]
+        )
+
+    def test_kardex_cursor_con_columnas_fk(self):
+        self.assertMismosCampos(
+            "/api/insumo-movimientos/?paginacion=cursor",
+            ["id", "fecha", "tipo", "cantidad", "total", "insumo_codigo", "insumo_nombre", "bodega_nombre", "tercero_nombre"],
+        )
+
+    def test_omit_quita_prefetch(self):
+        omitir = "impuestos,impuesto_ids,precios,datos_adicionales,price_breakdown,subtotal_sin_impuestos,precio_total"
+        with CaptureQueriesContext(connection) as completas:
+            self.resultados("/api/productos/")
+        with CaptureQueriesContext(connection) as consultas:
+            filas = self.resultados(f"/api/productos/?omit={omitir}")
+        self.assertTrue(filas)
+        self.assertNotIn("precios", filas[0])
+        self.assertLess(len(consultas), len(completas))
+        # el JOIN a datos adicionales de tiene_bajo_stock se queda; los prefetch no
+        sql = " ".join(c["sql"] for c in consultas.captured_queries)
+        for tabla in ("inventario_precioproducto", "inventario_datosadicionalesproducto", "inventario_impuesto"):
+            self.assertNotIn(f'FROM "{tabla}"', sql)
+
+
+@skipUnless(renderers.orjson, "orjson no instalado: FastJSONRenderer usa el de DRF")
+class FastJSONRendererTestCase(TestCase):
+    """renderers.FastJSONRenderer: los mismos bytes que el JSONRenderer de DRF."""
+
+    def test_decimales_y_fechas(self):
+        class Referencia(JSONRenderer):
+            encoder_class = renderers.DecimalStrEncoder  # Decimal → string, la regla de la API
+
+        datos = {
+            "decimales": [Decimal("1234.50"), Decimal("-0.001"), Decimal("0"), Decimal("1E+3")],
+            "con_zona": timezone.make_aware(datetime.datetime(2026, 1, 2, 3, 4, 5, 678901)),
+            "utc": datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            "sin_zona": datetime.datetime(2026, 1, 2, 3, 4, 5),
+            "fecha": datetime.date(2026, 1, 2),
+            "hora": datetime.time(3, 4, 5, 600),
+            "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "texto": 'Ñandú "x" \u2028 \u2029 </script>',
+            1: [None, True, 12, 0.5],
+        }
+        self.assertEqual(renderers.FastJSONRenderer().render(datos), Referencia().render(datos))
+
+    def test_respuestas(self):
+        f = Fabrica(APIClient())
+        f.lote()
+        for url in ("/api/productos/", "/api/notas-ensamble/", "/api/insumo-movimientos/?paginacion=cursor"):
+            with self.subTest(url):
+                response = f.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+class ColumnarTestCase(TestCase):
+    """?format=columnar: las mismas filas que la respuesta normal, sin repetir las claves."""
+
+    def setUp(self):
+        self.f = Fabrica(APIClient())
+        self.f.lote()
+
+    def filas(self, tabla):
+        return [dict(zip(tabla["columns"], fila)) for fila in tabla["data"]]
+
+    def test_reporte_stock(self):
+        normal = self.f.client.get("/api/reportes/bodegas/stock/").json()
+        columnar = self.f.client.get("/api/reportes/bodegas/stock/?format=columnar").json()
+
+        self.assertEqual(columnar["rows"]["insumos"]["columns"],
+                         ["bodega_id", "bodega", "codigo", "nombre", "unidad_medida", "cantidad"])
+        self.assertEqual(columnar["rows"]["productos"]["columns"],
+                         ["bodega_id", "bodega", "producto_id", "sku", "producto", "talla", "cantidad"])
+        for clave in ("insumos", "productos"):
+            with self.subTest(clave):
+                self.assertTrue(normal["rows"][clave])
+                self.assertEqual(self.filas(columnar["rows"][clave]), normal["rows"][clave])
+        self.assertEqual(columnar["kpis"], normal["kpis"])
+        self.assertEqual(columnar["charts"], normal["charts"])
+
+    def test_lista_paginada(self):
+        normal = self.f.client.get("/api/productos/").json()
+        columnar = self.f.client.get("/api/productos/?format=columnar").json()
+
+        self.assertEqual(columnar["count"], normal["count"])
+        self.assertEqual(self.filas(columnar["results"]), normal["results"])
+
+
+class CompresionTestCase(TestCase):
+    """middleware.compresion sobre el export CSV del kardex (StreamingHttpResponse)."""
+
+    URL = "/api/excel/kardex-terminado/exportar/?formato=csv"
+
+    def setUp(self):
+        self.f = Fabrica(APIClient())
+        filas = [["fecha", "bodega_id", "tercero_id", "producto_sku", "talla", "cantidad", "costo_unitario"]] + [
+            ["2026-02-01", self.f.bodega.id, self.f.tercero.id, self.f.principal.pk, talla.nombre, 4, 18000]
+            for talla in self.f.tallas
+        ]
+        response = self.f.client.post("/api/excel/importar-terminado/", {"file": xlsx(filas)}, format="multipart")
+        self.assertEqual(response.status_code, 200, response.content[:300])
+
+    def test_csv_streaming_gzip(self):
+        plano = self.f.client.get(self.URL)
+        self.assertTrue(plano.streaming)
+        self.assertNotIn("Content-Encoding", plano)
+        self.assertIn("Accept-Encoding", plano["Vary"])
+        csv_plano = b"".join(plano.streaming_content)
+        self.assertEqual(csv_plano.count(b"\n"), 1 + len(self.f.tallas))
+
+        response = self.f.client.get(self.URL, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertNotIn("Content-Length", response)
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), csv_plano)
+
+    def test_etag_fuerte_pasa_a_debil(self):
+        def vista(request):
+            response = StreamingHttpResponse(iter([b"a,b\n", b"1,2\n"]), content_type="text/csv")
+            response["ETag"] = '"abc"'
+            return response
+
+        request = RequestFactory().get("/x.csv", HTTP_ACCEPT_ENCODING="gzip")
+        response = CompresionMiddleware(vista)(request)
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), b"a,b\n1,2\n")
+
+        # sin Accept-Encoding no se comprime y el ETag queda fuerte
+        response = CompresionMiddleware(vista)(RequestFactory().get("/x.csv"))
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertNotIn("Content-Encoding", response)
+
+
+class ConditionalGetTestCase(TestCase):
+    """condicional.py: ETag, 304 con If-None-Match y ETag nuevo tras cada escritura."""
+
+    def setUp(self):
+        # los tokens se tocan al confirmar: en TestCase hay que correr los on_commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f = Fabrica(APIClient())
+
+    def etag(self, url="/api/productos/"):
+        response = self.f.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.headers["ETag"]
+
+    def test_304_mientras_no_cambie(self):
+        etag = self.etag()
+        response = self.f.client.get("/api/productos/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.etag(), etag)
+
+    def test_escritura_por_la_api(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.f.client.patch(
+                f"/api/productos/{self.f.principal.pk}/", {"nombre": "Camisa Oxford"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.content[:300])
+
+        response = self.f.client.get("/api/productos/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertIn("Camisa Oxford", [p["nombre"] for p in response.json()["results"]])
+
+    def test_if_modified_since_no_da_304(self):
+        # dos escrituras en el mismo segundo: una fecha no las distingue, solo el ETag
+        url = f"/api/productos/{self.f.principal.pk}/"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f.client.patch(url, {"nombre": "Camisa Lino"}, format="json")
+        primera = self.f.client.get(url)
+        self.assertNotIn("Last-Modified", primera.headers)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f.client.patch(url, {"nombre": "Camisa Seda"}, format="json")
+
+        response = self.f.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["nombre"], "Camisa Seda")
+        response = self.f.client.get(url, HTTP_IF_NONE_MATCH=primera.headers["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_cambio_m2m(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ico = Impuesto.objects.create(nombre="ICO", valor=Decimal("8"))
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f.principal.impuestos.add(ico)
+        self.assertNotEqual(self.etag(), etag)
+
+
+class BorradoTestCase(TestCase):
+    """signals.py: post_delete solo en BORRADO_POR_INSTANCIA; el resto borra rápido y llama versiones.borrado."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.f = Fabrica(APIClient())
+            self.nota = self.f.nota_ensamble([self.f.principal])
+
+    def test_tablas_borrado(self):
+        self.assertEqual(versiones.tablas_borrado(NotaEnsamble), {
+            "inventario_notaensamble", "inventario_notaensambledetalle", "inventario_notaensambleinsumo",
+            "inventario_insumomovimiento", "inventario_productoterminadomovimiento",
+        })
+        self.assertLessEqual(
+            {"inventario_producto_impuestos", "inventario_precioproducto", "inventario_productoinsumo"},
+            versiones.tablas_borrado(Producto),
+        )
+
+    def test_queryset_delete_sin_select(self):
+        # inventory_service.update_assembly_note / NotaEnsambleViewSet.destroy
+        movimientos = InsumoMovimiento.objects.filter(nota_ensamble_id=self.nota["id"])
+        self.assertTrue(movimientos.exists())
+        with CaptureQueriesContext(connection) as consultas:
+            movimientos.delete()
+        self.assertEqual([c["sql"].split()[0] for c in consultas.captured_queries], ["DELETE"])
+
+    def test_destroy_toca_la_cascada(self):
+        tabla = NotaEnsambleDetalle._meta.db_table
+        antes = versiones.version(tabla)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.f.client.delete(f"/api/notas-ensamble/{self.nota['id']}/")
+        self.assertEqual(response.status_code, 204, response.content[:300])
+        self.assertFalse(NotaEnsambleDetalle.objects.filter(nota_id=self.nota["id"]).exists())
+        self.assertNotEqual(versiones.version(tabla), antes)
+
+
+@override_settings(VERSIONES_EN_BD=True)
+class VersionesEnBDTestCase(TestCase):
+    """utils/versiones.py con los tokens en VersionTabla (PostgreSQL sin Redis)."""
+
+    TABLAS = [f"inventario_tabla{n}" for n in range(10)]
+
+    def test_tocar_un_upsert(self):
+        versiones.versiones(*self.TABLAS)
+        antes = versiones.versiones(*self.TABLAS)
+        with CaptureQueriesContext(connection) as consultas:
+            versiones.tocar(*self.TABLAS)
+        self.assertEqual(len(consultas), 1, [c["sql"] for c in consultas.captured_queries])
+        self.assertIn("ON CONFLICT", consultas.captured_queries[0]["sql"])
+
+        with CaptureQueriesContext(connection) as consultas:
+            despues = versiones.versiones(*self.TABLAS)
+        self.assertEqual(len(consultas), 1)
+        self.assertTrue(all(d > a for a, d in zip(antes, despues)))
+        self.assertEqual(VersionTabla.objects.count(), 2 * len(self.TABLAS))
+
+    def test_un_upsert_por_commit(self):
+        antes = versiones.versiones(*self.TABLAS)
+        memoria = versiones.versiones(*self.TABLAS, prefijo=versiones.PREFIJO_MEMORIA)
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                versiones.tocar_al_confirmar(*self.TABLAS[:5])
+                versiones.tocar_al_confirmar(*self.TABLAS[5:], memorias=False)
+        self.assertEqual(len(consultas), 1)
+        self.assertTrue(all(d > a for a, d in zip(antes, versiones.versiones(*self.TABLAS))))
+        # memorias=False deja el token de memoria como estaba
+        despues = versiones.versiones(*self.TABLAS, prefijo=versiones.PREFIJO_MEMORIA)
+        self.assertEqual(despues[5:], memoria[5:])
+        self.assertTrue(all(d > a for a, d in zip(memoria[:5], despues[:5])))
+
+
+class SeedInventarioTestCase(TestCase):
+    """seed_inventario arma a mano lo que bulk_create se salta: tiene que cuadrar."""
+
+    def test_datos_coherentes(self):
+        call_command("seed_inventario", escala=0.02, prefijo="T", stdout=io.StringIO())
+
+        self.assertFalse(NotaEnsambleDetalle.objects.filter(cantidad_disponible__lt=0).exists())
+        self.assertFalse(InsumoMovimiento.objects.filter(saldo_resultante__lt=0).exists())
+        self.assertFalse(Producto.objects.filter(search_document="").exists())
+        self.assertFalse(NotaSalidaProducto.objects.filter(numero="").exists())
+
+        # salidas: cantidad de las líneas = lo descontado FIFO = total guardado
+        vendido = NotaSalidaProductoDetalle.objects.aggregate(x=Sum("cantidad"))["x"]
+        self.assertEqual(vendido, NotaSalidaAfectacionStock.objects.aggregate(x=Sum("cantidad"))["x"])
+        self.assertEqual(vendido, NotaSalidaProducto.objects.aggregate(x=Sum("total_cantidad"))["x"])
+
+        # lo producido menos lo vendido queda disponible (los traslados solo lo mueven)
+        producido = NotaEnsambleDetalle.objects.aggregate(x=Sum("cantidad"))["x"]
+        disponible = NotaEnsambleDetalle.objects.aggregate(x=Sum("cantidad_disponible"))["x"]
+        self.assertEqual(producido - vendido, disponible)
+        self.assertEqual(disponible, DatosAdicionalesProducto.objects.aggregate(x=Sum("stock"))["x"])
+
+        # stock de insumos = último saldo del kardex
+        for insumo in Insumo.objects.all()[:20]:
+            ultimo_mov = insumo.movimientos.order_by("-fecha", "-id").first()
+            self.assertEqual(insumo.cantidad, ultimo_mov.saldo_resultante)
+
+
+class StressInventarioTestCase(TransactionTestCase):
+    """stress_inventario (en SQLite con --cualquier-bd): corre y las invariantes salen limpias."""
+
+    def test_humo(self):
+        destino = os.path.join(tempfile.mkdtemp(), "stress.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(destino))
+        # stderr aparte: en la BD en memoria de los tests SQLite a veces falla por bloqueos de
+        # la caché compartida (p. ej. al abrir las tablas FTS); lo que se exige son las invariantes
+        call_command("stress_inventario", cualquier_bd=True, hilos=2, duracion=1, salida=destino,
+                     stdout=io.StringIO(), stderr=io.StringIO())
+
+        with open(destino, encoding="utf-8") as fh:
+            informe = json.load(fh)
+        self.assertEqual(informe["hilos"], 2)
+        self.assertTrue(informe["invariantes"])
+        self.assertEqual({k: v for k, v in informe["invariantes"].items() if v}, {})
+        self.assertGreater(sum(op["ok"] for op in informe["operaciones"].values()), 0)
+        # el fixture se borra al terminar
+        self.assertFalse(Producto.objects.filter(codigo_sku__startswith="STRESS-").exists())
+
+
+class ConsultasLogTestCase(TestCase):
+    """middleware/consultas.py: la línea de log no lleva valores sensibles de la query string."""
+
+    def test_ruta_saneada(self):
+        with self.assertLogs("inventario.consultas", "INFO") as logs:
+            APIClient().get("/api/tallas/?search=M&token=abc")
+        datos = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(datos["ruta"], "/api/tallas/?search=M&token=***")
+        self.assertEqual(datos["vista"], "TallaViewSet.list")
+
+    @override_settings(CONSULTAS_PRESUPUESTO=0)
+    def test_warning_sobre_presupuesto(self):
+        with self.assertLogs("inventario.consultas", "WARNING") as logs:
+            APIClient().get("/api/tallas/")
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["presupuesto"], 0)
+
+
+class GrabacionTestCase(TestCase):
+    """middleware/grabacion.py: una línea JSON por request, sin datos sensibles."""
+
+    def setUp(self):
+        fd, self.archivo = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, self.archivo)
+
+    def registros(self):
+        with open(self.archivo, encoding="utf-8") as fh:
+            return [json.loads(linea) for linea in fh]
+
+    def test_graba_saneado(self):
+        with override_settings(GRABACION_ARCHIVO=self.archivo):
+            client = APIClient()  # el middleware se arma con el primer request del cliente
+            client.get("/api/tallas/?search=M&token=abc")
+            client.post("/api/tallas/", {"nombre": "XL", "password": "secreto"}, format="json")
+
+        get, post = self.registros()
+        self.assertEqual((get["metodo"], get["ruta"], get["vista"], get["status"]), ("GET", "/api/tallas/", "TallaViewSet.list", 200))
+        self.assertEqual(get["query"], "search=M&token=***")
+        self.assertEqual(post["cuerpo"], {"nombre": "XL", "password": "***"})
+        self.assertEqual((post["vista"], post["status"]), ("TallaViewSet.create", 201))
+
+    def test_apagado_sin_archivo(self):
+        APIClient().get("/api/tallas/")
+        self.assertEqual(self.registros(), [])
+
+
+class PerfiladoTestCase(TestCase):
+    """middleware/perfilado.py: solo con el header correcto; deja pstats, pilas y SQL."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def test_perfila_con_token(self):
+        with override_settings(PERFILADO_ACTIVO=True, PERFILADO_TOKEN="clave", PERFILADO_DIR=self.directorio):
+            client = APIClient()
+            sin_perfil = client.get("/api/tallas/", HTTP_X_PERFILAR="otra")
+            response = client.get("/api/tallas/", HTTP_X_PERFILAR="clave")
+
+        self.assertNotIn("X-Perfil", sin_perfil.headers)
+        id_perfil = response.headers["X-Perfil"]
+        self.assertEqual(
+            sorted(os.listdir(self.directorio)),
+            [f"{id_perfil}.{ext}" for ext in ("folded", "pstats", "sql.json", "txt")],
+        )
+        with open(os.path.join(self.directorio, f"{id_perfil}.sql.json"), encoding="utf-8") as fh:
+            linea = json.load(fh)
+        self.assertEqual(linea["vista"], "TallaViewSet.list")
+        self.assertTrue(linea["consultas"])
+
+
+class TracingTestCase(TestCase):
+    """utils/tracing.py: spans anidados con bloqueos y filas escritas acumulados."""
+
+    def test_nota_ensamble(self):
+        fd, archivo = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, archivo)
+        f = Fabrica(APIClient())
+        with override_settings(TRACING_ACTIVO=True, TRACING_ARCHIVO=archivo):
+            f.nota_ensamble([f.principal])
+            f.salida([f.principal])
+
+        with open(archivo, encoding="utf-8") as fh:
+            spans = [json.loads(linea) for linea in fh]
+        por_id = {s["context"]["span_id"]: s for s in spans}
+
+        def padre(s):
+            return por_id[s["parent_id"]]["name"]
+
+        descuento = next(s for s in spans if s["name"] == "insumo.descontar_global")
+        bom = por_id[descuento["parent_id"]]
+        self.assertEqual(bom["name"], "nota.consumir_bom")
+        self.assertEqual(padre(bom), "nota.aplicar_detalles")
+        self.assertEqual(padre(por_id[bom["parent_id"]]), "nota.crear")
+
+        nota = next(s for s in spans if s["name"] == "nota.crear")
+        self.assertIsNone(nota["parent_id"])
+        self.assertEqual(nota["attributes"]["detalles"], len(f.tallas))
+        self.assertGreaterEqual(nota["attributes"]["bloqueos"], descuento["attributes"]["bloqueos"])
+        self.assertGreater(nota["attributes"]["filas_escritas"], 0)
+
+        salida = next(s for s in spans if s["name"] == "salida.crear")
+        self.assertEqual(salida["attributes"]["capas"], len(f.tallas))
+        self.assertEqual(sum(s["name"] == "salida.linea" for s in spans), len(f.tallas))
+
+
+class ReplicaTestCase(TestCase):
+    """replica.py sin DATABASE_REPLICA_URL: todo al primario."""
+
+    @skipUnless(not replica.configurada(), "con DATABASE_REPLICA_URL lo cubre ReplicaEnrutadoTestCase")
+    def test_sin_replica(self):
+        Fabrica(APIClient())
+        response = APIClient().get("/api/reportes/resumen/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Leido-De", response.headers)
+        self.assertIn("ETag", response.headers)
+
+    def test_escrituras_al_primario(self):
+        router = replica.RouterReplica()
+        with replica.leyendo_replica():
+            self.assertEqual(replica.alias_lectura(), replica.ALIAS)
+            self.assertEqual(router.db_for_write(Producto), "default")
+            # TestCase corre dentro de una transacción: se lee de donde se escribe
+            self.assertEqual(router.db_for_read(Producto), "default")
+        self.assertEqual(replica.alias_lectura(), "default")
+
+
+@skipUnless(replica.configurada(), "DATABASE_REPLICA_URL (p. ej. sqlite:///db.sqlite3) para probar con una segunda BD")
+class ReplicaEnrutadoTestCase(TransactionTestCase):
+    """Con réplica (en los tests, espejo de default): qué lee de dónde."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        replica.olvidar()
+        self.addCleanup(replica.olvidar)
+        self.f = Fabrica(APIClient())
+        replica.atraso()  # ya medido: los requests no consultan la réplica por eso
+
+    def get(self, url):
+        with CaptureQueriesContext(connections["default"]) as primario, \
+                CaptureQueriesContext(connections[replica.ALIAS]) as secundario:
+            response = self.f.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(primario), len(secundario)
+
+    def test_lista_recien_escrita_va_al_primario(self):
+        response, primario, secundario = self.get("/api/productos/")
+        self.assertNotIn("X-Leido-De", response.headers)
+        self.assertEqual(secundario, 0)
+
+    def test_lista_al_dia_va_a_la_replica(self):
+        with override_settings(DB_REPLICA_ATRASO_MAX=0):
+            response, primario, secundario = self.get("/api/productos/")
+        self.assertEqual(response.headers["X-Leido-De"], replica.ALIAS)
+        self.assertEqual(primario, 0)
+        self.assertGreater(secundario, 0)
+        self.assertIn("ETag", response.headers)
+
+    def test_reporte_tolera_atraso(self):
+        self.f.nota_ensamble([self.f.principal])
+        response, primario, secundario = self.get("/api/reportes/resumen/")
+        self.assertEqual(response.headers["X-Leido-De"], replica.ALIAS)
+        self.assertEqual(primario, 0)
+        # las tablas cambiaron recién: sin validadores calculados con el primario
+        self.assertNotIn("ETag", response.headers)
+
+    def test_replica_atrasada(self):
+        with override_settings(DB_REPLICA_ATRASO_MAX=-1):
+            response, primario, secundario = self.get("/api/reportes/resumen/")
+        self.assertNotIn("X-Leido-De", response.headers)
+        self.assertEqual(secundario, 0)
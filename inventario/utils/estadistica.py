@@ -0,0 +1,7 @@
+"""Utilidades de los comandos de benchmark."""
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el rango más cercano; 0.0 si no hay valores."""
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, round(p / 100 * (len(orden) - 1)))] if orden else 0.0
@@ -0,0 +1,157 @@
+"""
+Spans anidados para ver qué paso de una operación se lleva el tiempo
+(create_assembly_note → _aplicar_detalles → consumir_insumos_por_delta →
+descontar_insumo_global, FIFO de salidas y traslados, importaciones Excel).
+
+    with tracing.span("salida.linea", producto=sku) as s:
+        ...
+        s.set_attribute("capas", n)
+
+    @tracing.trazar("nota.crear")
+    def create_assembly_note(...): ...
+
+Contadores: tracing.sumar("bloqueos") (metricas.bloqueo_stock, antes de cada
+select_for_update) y tracing.sumar("filas_escritas") (signals, cada
+save/delete) suman en el span actual y en todos sus padres, así cada span
+muestra lo suyo más lo de sus hijos.
+
+Apagado por defecto (TRACING_ACTIVO): entonces span() no hace nada. Encendido,
+cada span terminado sale como una línea JSON con el formato del
+ConsoleSpanExporter de OpenTelemetry (name, context.trace_id / span_id,
+parent_id, start_time, end_time, attributes) más duration_ms: al archivo
+TRACING_ARCHIVO o, sin archivo, al logger "inventario.tracing". No hace falta
+collector. Si opentelemetry-api está instalado, además se abre el span en el
+tracer global, así un SDK configurado en el despliegue los recibe también.
+"""
+import functools
+import json
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # opcional: sin opentelemetry-api solo el exportador propio
+    otel_trace = None
+
+logger = logging.getLogger("inventario.tracing")
+
+_actual = ContextVar("inventario_span", default=None)
+_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "padre", "attributes", "inicio", "inicio_ns", "otel")
+
+    def __init__(self, name, padre, attributes):
+        self.name = name
+        self.padre = padre
+        self.trace_id = padre.trace_id if padre else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes)
+        self.inicio = time.perf_counter()
+        self.inicio_ns = time.time_ns()
+        self.otel = None
+
+    def set_attribute(self, clave, valor):
+        self.attributes[clave] = valor
+        if self.otel is not None:
+            self.otel.set_attribute(clave, valor)
+
+    def exportar(self):
+        duracion = time.perf_counter() - self.inicio
+        fin_ns = self.inicio_ns + int(duracion * 1e9)
+        return {
+            "name": self.name,
+            "context": {"trace_id": f"0x{self.trace_id}", "span_id": f"0x{self.span_id}"},
+            "parent_id": f"0x{self.padre.span_id}" if self.padre else None,
+            "start_time": _iso(self.inicio_ns),
+            "end_time": _iso(fin_ns),
+            "duration_ms": round(duracion * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class _SpanNulo:
+    """Lo que devuelve span() con el tracing apagado."""
+
+    def set_attribute(self, clave, valor):
+        pass
+
+
+NULO = _SpanNulo()
+
+
+def _iso(ns):
+    return datetime.fromtimestamp(ns / 1e9, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def activo():
+    return getattr(settings, "TRACING_ACTIVO", False)
+
+
+def _exportar(span):
+    linea = json.dumps(span.exportar(), ensure_ascii=False, default=str)
+    archivo = getattr(settings, "TRACING_ARCHIVO", "")
+    if not archivo:
+        logger.info(linea)
+        return
+    with _lock, open(archivo, "a", encoding="utf-8") as fh:
+        fh.write(linea + "\n")
+
+
+@contextmanager
+def span(nombre, **atributos):
+    if not activo():
+        yield NULO
+        return
+
+    s = Span(nombre, _actual.get(), atributos)
+    token = _actual.set(s)
+    otel_cm = None
+    if otel_trace is not None:
+        otel_cm = otel_trace.get_tracer("inventario").start_as_current_span(nombre, attributes=atributos)
+        s.otel = otel_cm.__enter__()
+    try:
+        yield s
+    except Exception as exc:
+        s.set_attribute("error", f"{type(exc).__name__}: {exc}"[:300])
+        raise
+    finally:
+        _actual.reset(token)
+        if otel_cm is not None:
+            otel_cm.__exit__(None, None, None)
+        _exportar(s)
+
+
+def trazar(nombre):
+    """Decorador: la función corre dentro de span(nombre)."""
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            with span(nombre):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def anotar(**atributos):
+    """Atributos en el span actual (si hay)."""
+    s = _actual.get()
+    if s is not None:
+        for clave, valor in atributos.items():
+            s.set_attribute(clave, valor)
+
+
+def sumar(clave, n=1):
+    """Suma n al contador `clave` del span actual y de todos sus padres."""
+    s = _actual.get()
+    while s is not None:
+        s.set_attribute(clave, s.attributes.get(clave, 0) + n)
+        s = s.padre
@@ -0,0 +1,227 @@
+"""
+Tokens de versión por tabla, compartidos entre procesos y hosts.
+
+Cada vez que cambia una tabla (signals en inventario/signals.py) se guarda un
+token nuevo (time_ns). Lo que se arma en memoria a partir de una tabla (índices,
+catálogos) recuerda el token con que se armó y se rehace cuando no coincide.
+
+Hay dos tokens por tabla:
+  - el de la tabla (PREFIJO): cambia con cualquier escritura; de él salen los
+    ETag (inventario/condicional.py);
+  - el de memoria (PREFIJO_MEMORIA): el que vigila MemoriaVersionada. Un save
+    con update_fields que no toca las columnas que leen las memorias de esa
+    tabla (el stock de un insumo en el FIFO) no lo cambia, así no se rehace el
+    índice de autocompletado en cada movimiento.
+
+Dónde se guardan: en la cache de Django (Redis con REDIS_URL, archivos en
+SQLite local) o, con VERSIONES_EN_BD, en la tabla VersionTabla del primario.
+Ahí tocar() es un solo INSERT ... ON CONFLICT DO UPDATE por commit y
+versiones() un SELECT (DatabaseCache gastaba ~5 sentencias por clave).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import CASCADE, SET_DEFAULT, SET_NULL
+
+PREFIJO = "inventario:ver:"
+PREFIJO_MEMORIA = "inventario:mem:"
+
+_memorias = []  # MemoriaVersionada registradas (para invalidar_local)
+_local = threading.local()  # tablas por tocar al confirmar la transacción en curso
+
+
+def _clave(tabla, prefijo=PREFIJO):
+    return f"{prefijo}{tabla}"
+
+
+def _tabla_versiones():
+    from inventario.models import VersionTabla
+
+    # siempre del primario: un token viejo de la réplica dejaría contestar 304 con datos viejos
+    return VersionTabla.objects.using(DEFAULT_DB_ALIAS)
+
+
+def _leer(claves):
+    if settings.VERSIONES_EN_BD:
+        return dict(_tabla_versiones().filter(clave__in=claves).values_list("clave", "token"))
+    return cache.get_many(claves)
+
+
+def _crear(faltantes):
+    """Guarda las claves que no existían; si otro proceso las creó entre medio, vale la suya."""
+    if settings.VERSIONES_EN_BD:
+        from inventario.models import VersionTabla
+
+        _tabla_versiones().bulk_create(
+            [VersionTabla(clave=c, token=v) for c, v in faltantes.items()], ignore_conflicts=True
+        )
+        return _leer(list(faltantes))
+    # add() no pisa si otro proceso lo creó entre medio
+    return {c: v if cache.add(c, v, timeout=None) else cache.get(c, v) for c, v in faltantes.items()}
+
+
+def _guardar(claves):
+    if settings.VERSIONES_EN_BD:
+        from inventario.models import VersionTabla
+
+        # en orden: dos upserts concurrentes toman los locks de fila igual y no se bloquean entre sí
+        _tabla_versiones().bulk_create(
+            [VersionTabla(clave=c, token=v) for c, v in sorted(claves.items())],
+            update_conflicts=True, unique_fields=["clave"], update_fields=["token"],
+        )
+    else:
+        cache.set_many(claves, timeout=None)
+
+
+def versiones(*tablas, prefijo=PREFIJO):
+    """
+    Tokens actuales de las tablas, en el mismo orden. Si una tabla aún no tiene
+    token se crea uno (así todos los procesos arrancan con el mismo).
+    """
+    claves = [_clave(t, prefijo) for t in tablas]
+    actuales = _leer(claves)
+    faltantes = {c: time.time_ns() for c in claves if c not in actuales}
+    if faltantes:
+        actuales.update(_crear(faltantes))
+    return tuple(actuales[c] for c in claves)
+
+
+def version(tabla):
+    return versiones(tabla)[0]
+
+
+def _claves_nuevas(tablas, memorias, token):
+    claves = {_clave(t): token for t in tablas}
+    claves.update({_clave(t, PREFIJO_MEMORIA): token for t in memorias})
+    return claves
+
+
+def tocar(*tablas, memorias=True):
+    """Marca las tablas como cambiadas (token nuevo); con memorias=False, solo para los ETag."""
+    _guardar(_claves_nuevas(tablas, tablas if memorias else (), time.time_ns()))
+
+
+def tocar_al_confirmar(*tablas, memorias=True):
+    """
+    tocar() cuando la transacción actual haga commit (o ya, si no hay transacción):
+    así otro proceso no rehace su índice con datos aún sin confirmar.
+
+    Dentro de una transacción se junta todo en un solo on_commit (una nota con
+    30 líneas no escribe 30 veces en la cache).
+    """
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        tocar(*tablas, memorias=memorias)
+        return
+
+    pendiente = getattr(_local, "pendiente", None)
+    # si hubo rollback el callback ya no está en la lista: se registra otro
+    if pendiente is None or not any(hook[1] is pendiente for hook in conn.run_on_commit):
+        def pendiente():
+            _local.pendiente = None
+            # una sola escritura con los dos tokens (ETag y memoria) de todas las tablas
+            _guardar(_claves_nuevas(pendiente.tablas, pendiente.memorias, time.time_ns()))
+
+        pendiente.tablas = set()
+        pendiente.memorias = set()
+        _local.pendiente = pendiente
+        transaction.on_commit(pendiente)
+    pendiente.tablas.update(tablas)
+    if memorias:
+        pendiente.memorias.update(tablas)
+
+
+def tablas_borrado(modelo):
+    """
+    Tablas que cambian al borrar filas de `modelo`: la suya, las que se borran
+    en cascada (recursivo), las que quedan en NULL y las intermedias de M2M.
+    """
+    tablas, pendientes = set(), [modelo]
+    while pendientes:
+        actual = pendientes.pop()
+        if actual._meta.db_table in tablas:
+            continue
+        tablas.add(actual._meta.db_table)
+        tablas.update(f.remote_field.through._meta.db_table for f in actual._meta.local_many_to_many)
+        for rel in actual._meta.related_objects:
+            if rel.many_to_many:
+                tablas.add(rel.through._meta.db_table)
+            elif rel.on_delete is CASCADE:
+                pendientes.append(rel.related_model)
+            elif rel.on_delete in (SET_NULL, SET_DEFAULT):
+                tablas.add(rel.related_model._meta.db_table)
+    return tablas
+
+
+def borrado(modelo):
+    """
+    Se borraron filas de `modelo` sin signals (queryset.delete() de un modelo
+    sin post_delete, ver signals.py): invalida y toca sus tablas y las de la cascada.
+    """
+    tablas = tablas_borrado(modelo)
+    invalidar_local(*tablas)
+    tocar_al_confirmar(*tablas)
+
+
+def afecta_memorias(tabla, campos=None):
+    """
+    ¿Cambiar esos campos (update_fields; None = todos) de la tabla cambia algo
+    armado en memoria? Las memorias sin `columnas` leen todas.
+    """
+    return any(memoria.afectada(tabla, campos) for memoria in _memorias)
+
+
+def invalidar_local(*tablas, campos=None):
+    """Descarta en este proceso lo armado a partir de esas tablas (y de esos campos, si se dan)."""
+    for memoria in _memorias:
+        if any(memoria.afectada(tabla, campos) for tabla in tablas):
+            memoria.invalidar()
+
+
+class MemoriaVersionada:
+    """
+    Valor armado en memoria de este proceso a partir de una o más tablas.
+
+    Se rehace cuando se invalida localmente (signals) o cuando cambió el token de
+    memoria de alguna de sus tablas; el token compartido se lee como máximo cada
+    `verificar_cada` segundos, así que obtener() casi siempre no sale del proceso.
+
+    columnas: los campos que lee `construir` (None = todos). Un save con
+    update_fields fuera de ellos no la invalida.
+    """
+
+    def __init__(self, construir, *tablas, columnas=None, verificar_cada=1.0):
+        self.construir = construir
+        self.tablas = tablas
+        self.columnas = frozenset(columnas) if columnas is not None else None
+        self.verificar_cada = verificar_cada
+        self._valor = None
+        self._version = None
+        self._verificado = 0.0
+        self._lock = threading.Lock()
+        _memorias.append(self)
+
+    def afectada(self, tabla, campos=None):
+        if tabla not in self.tablas:
+            return False
+        return campos is None or self.columnas is None or bool(self.columnas & set(campos))
+
+    def invalidar(self):
+        self._valor = None
+
+    def obtener(self):
+        valor = self._valor
+        ahora = time.monotonic()
+        if valor is not None and ahora - self._verificado < self.verificar_cada:
+            return valor
+
+        with self._lock:
+            token = versiones(*self.tablas, prefijo=PREFIJO_MEMORIA)
+            if self._valor is None or token != self._version:
+                self._valor = self.construir()
+                self._version = token
+            self._verificado = ahora
+            return self._valor
@@ -7,14 +7,24 @@ from django.db import transaction
 from rest_framework.decorators import action
 from django.db.models import Sum, Count, Q, F, Case, When, DecimalField, Value, IntegerField
 from django.db.models.functions import Coalesce
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 from django.shortcuts import get_object_or_404
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
 from .renderers import XLSXRenderer
+from .pagination import KardexPagination, KeysetPagination
+from .busqueda import BusquedaFilter
+from .campos import CamposDinamicosMixin
+from .condicional import ConditionalGetMixin
+from .replica import LecturaReplicaMixin, alias_lectura
+from . import metricas
+from .services import catalogo, escaneo
+from .utils import tracing, versiones
 import io
+import csv
+import tempfile
 from datetime import datetime
 from django.utils import timezone
 
@@ -23,7 +33,7 @@ from .models import (
     Insumo, Proveedor, Producto, Bodega, Impuesto, PrecioProducto,
     Tercero, Operador, DatosAdicionalesProducto, Talla,
     NotaEnsamble, ProductoInsumo, NotaEnsambleDetalle, NotaEnsambleInsumo,
-    TrasladoProducto, NotaSalidaProducto, NotaSalidaAfectacionStock, InsumoMovimiento,
+    TrasladoProducto, NotaSalidaProducto, NotaSalidaProductoDetalle, NotaSalidaAfectacionStock, InsumoMovimiento,
     ProductoTerminadoMovimiento
 )
 from .filters import InsumoFilter, ProductoFilter, NotaEnsambleFilter, NotaSalidaProductoFilter
@@ -32,11 +42,15 @@ from .serializers import (
     ImpuestoSerializer, ProductoPrecioWriteSerializer,
     TerceroSerializer, OperadorSerializer, DatosAdicionalesWriteSerializer,
     TallaSerializer, NotaEnsambleSerializer, NotaEnsambleListSerializer, ProductoInsumoSerializer,
-    TrasladoProductoSerializer, NotaSalidaProductoSerializer, NotaSalidaProductoListSerializer,
+    TrasladoProductoSerializer, TrasladoMasivoSerializer, NotaSalidaProductoSerializer, NotaSalidaProductoListSerializer,
     InsumoMovimientoSerializer, InsumoMovimientoInputSerializer,
     ProductoTerminadoMovimientoSerializer
 )
 
+# Tablas de las que sale un producto serializado (ETag, ver condicional.py)
+MODELOS_PRODUCTO = (Producto, Tercero, Impuesto, PrecioProducto, DatosAdicionalesProducto)
+
+
 def consumir_insumos_manuales_por_delta(nota, signo=Decimal("1")):
     """
     signo = +1 descuenta los insumos manuales asociados a la nota
@@ -69,6 +83,7 @@ def consumir_insumos_manuales_por_delta(nota, signo=Decimal("1")):
 
     if ins_to_update:
         Insumo.objects.bulk_update(ins_to_update, ["cantidad"])
+        versiones.tocar_al_confirmar(Insumo._meta.db_table)  # bulk_update no manda signals
 
 def _decimal(v, field_name):
     try:
@@ -122,6 +137,7 @@ def aplicar_movimiento_insumo(*, insumo, tercero, tipo, cantidad, costo_unitario
     with transaction.atomic():
         # 🔒 Bloquear el insumo para evitar modificaciones concurrentes
         # en lugar de insumo.refresh_from_db()
+        metricas.bloqueo_stock(Insumo)
         insumo = Insumo.objects.select_for_update().get(pk=insumo.pk)
 
         if tipo in ("SALIDA", "CONSUMO_ENSAMBLE"):
@@ -260,12 +276,13 @@ class DebugValidationMixin:
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-from .services.inventory_service import InventoryService
+from .services.inventory_service import InventoryService, _d
 
-class NotaEnsambleViewSet(viewsets.ModelViewSet):
+class NotaEnsambleViewSet(LecturaReplicaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = NotaEnsamble.objects.all() # Fallback
     serializer_class = NotaEnsambleSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    etag_modelos = (NotaEnsambleDetalle, NotaEnsambleInsumo, InsumoMovimiento, Insumo, Talla, Bodega, Operador, *MODELOS_PRODUCTO)
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_class = NotaEnsambleFilter
     search_fields = [
         "observaciones", 
@@ -274,26 +291,22 @@ class NotaEnsambleViewSet(viewsets.ModelViewSet):
         "detalles__producto__codigo_sku"
     ]
     ordering_fields = ["id", "fecha_elaboracion", "creado_en"]
+    pagination_class = KardexPagination  # ?paginacion=cursor → keyset sin COUNT
 
     def get_queryset(self):
-        # ✅ SQL Annotations: costo_total e items_count
-        # Esto evita N+1 en la lista y cálculos costosos en Python
-        qs = NotaEnsamble.objects.annotate(
-            costo_total=Coalesce(Sum("insumomovimientos__total"), Value(0, output_field=DecimalField())) + F("costo_servicio"),
-            total_cantidad=Coalesce(Sum("detalles__cantidad"), Value(0, output_field=DecimalField())),
-            items_count=Count("detalles", distinct=True)
-        ).select_related("bodega", "tercero", "operador").order_by("-id")
-
-
-        if self.action == "list":
-            # Para el resumen de productos en la lista
-            qs = qs.prefetch_related("detalles__producto")
+        # ✅ costo_total, total_cantidad, items_count y productos_resumen están guardados
+        # en la nota (InventoryService.actualizar_totales_nota): la lista es un scan simple
+        qs = NotaEnsamble.objects.select_related("bodega", "tercero", "operador").order_by("-id")
 
         if self.action == "retrieve":
             # Para el detalle completo
             qs = qs.prefetch_related(
                 "detalles",
                 "detalles__producto",
+                # ProductoSerializer anidado: precios / impuestos / datos adicionales de cada producto
+                "detalles__producto__precios",
+                "detalles__producto__impuestos",
+                "detalles__producto__datos_adicionales",
                 "detalles__talla",
                 "insumos",
                 "insumos__insumo",
@@ -392,6 +405,8 @@ class NotaEnsambleViewSet(viewsets.ModelViewSet):
         # Estos tienen on_delete=SET_NULL, así que debemos eliminarlos explícitamente
         InsumoMovimiento.objects.filter(nota_ensamble=nota).delete()
         ProductoTerminadoMovimiento.objects.filter(nota_ensamble=nota).delete()
+        versiones.borrado(InsumoMovimiento)  # delete() por queryset no manda signals
+        versiones.borrado(ProductoTerminadoMovimiento)
 
         # 2. Revertir stock usando InventoryService
         obs_del = f"Eliminación nota #{nota.id}"
@@ -432,7 +447,7 @@ class DebugValidationMixin:
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ProveedorViewSet(viewsets.ModelViewSet):
+class ProveedorViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     # Ordenar por activos primero
     queryset = Proveedor.objects.all().order_by("-es_activo", "id")
     serializer_class = ProveedorSerializer
@@ -444,9 +459,10 @@ class ProveedorViewSet(viewsets.ModelViewSet):
         instance.save(update_fields=["es_activo"])
 
 
-class BodegaViewSet(viewsets.ModelViewSet):
+class BodegaViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Bodega.objects.all().order_by("-es_activo", "nombre")
     serializer_class = BodegaSerializer
+    etag_modelos = (Insumo, NotaEnsambleDetalle)  # insumos_count / productos_count
     filterset_fields = ["ubicacion"]
     search_fields = ["nombre", "codigo"]
     ordering_fields = ["nombre", "codigo", "es_activo"]
@@ -565,7 +581,7 @@ class BodegaViewSet(viewsets.ModelViewSet):
         })
 
 
-class TerceroViewSet(viewsets.ModelViewSet):
+class TerceroViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Tercero.objects.all().order_by("-es_activo", "codigo")
     serializer_class = TerceroSerializer
     search_fields = ["nombre", "codigo"]
@@ -576,7 +592,7 @@ class TerceroViewSet(viewsets.ModelViewSet):
         instance.save(update_fields=["es_activo"])
 
 
-class OperadorViewSet(viewsets.ModelViewSet):
+class OperadorViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Operador.objects.all().order_by("-es_activo", "codigo")
     serializer_class = OperadorSerializer
     search_fields = ["nombre", "codigo"]
@@ -587,7 +603,7 @@ class OperadorViewSet(viewsets.ModelViewSet):
         instance.save(update_fields=["es_activo"])
 
 
-class ImpuestoViewSet(viewsets.ModelViewSet):
+class ImpuestoViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Impuesto.objects.all().order_by("-es_activo", "nombre")
     serializer_class = ImpuestoSerializer
 
@@ -596,7 +612,7 @@ class ImpuestoViewSet(viewsets.ModelViewSet):
         instance.save(update_fields=["es_activo"])
 
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(LecturaReplicaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = (
         Producto.objects
         .select_related("tercero")
@@ -611,6 +627,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
         .order_by("-es_activo", "tiene_bajo_stock", "-creado_en")
     )
     serializer_class = ProductoSerializer
+    etag_modelos = MODELOS_PRODUCTO
     filterset_class = ProductoFilter
     search_fields = ["nombre", "codigo_sku", "codigo_barras"]
     ordering_fields = ["nombre", "creado_en", "es_activo"]
@@ -619,6 +636,41 @@ class ProductoViewSet(viewsets.ModelViewSet):
         instance.es_activo = False
         instance.save(update_fields=["es_activo"])
 
+    @action(detail=False, methods=["get", "post"], url_path="escanear")
+    def escanear(self, request):
+        """
+        Lectura rápida de códigos (pistola de bodega), sin el queryset pesado de productos.
+        GET  /productos/escanear/?codigo=770001&codigo=CAM-1&bodega_id=1   (o codigo=a,b,c)
+        POST /productos/escanear/  {"bodega_id": 1, "codigos": ["770001", "CAM-1", ...]}
+        Acepta codigo_barras o codigo_sku; responde SKU, nombre y stock por talla.
+        """
+        if request.method == "POST":
+            codigos = request.data.get("codigos") or []
+            bodega_id = request.data.get("bodega_id")
+        else:
+            codigos = [c for v in request.query_params.getlist("codigo") for c in v.split(",")]
+            bodega_id = request.query_params.get("bodega_id")
+
+        if not isinstance(codigos, list):
+            raise ValidationError({"codigos": "Debe ser una lista."})
+        codigos = [str(c).strip() for c in codigos if str(c).strip()]
+        if not codigos:
+            raise ValidationError({"codigos": "Envía al menos un código."})
+        if len(codigos) > escaneo.MAX_LOTE:
+            raise ValidationError({"codigos": f"Máximo {escaneo.MAX_LOTE} códigos por lote."})
+
+        if bodega_id in (None, ""):
+            bodega_id = None
+        elif not str(bodega_id).isdigit():
+            raise ValidationError({"bodega_id": "Debe ser un entero."})
+        else:
+            bodega_id = int(bodega_id)
+
+        return Response({
+            "bodega_id": bodega_id,
+            "resultados": escaneo.escanear(codigos, bodega_id=bodega_id),
+        })
+
     @action(detail=True, methods=["get"], url_path="stock-por-talla")
     def stock_por_talla(self, request, pk=None):
         producto = self.get_object()
@@ -663,17 +715,17 @@ class ProductoViewSet(viewsets.ModelViewSet):
         })
 
 
-class PrecioProductoViewSet(viewsets.ModelViewSet):
+class PrecioProductoViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = PrecioProducto.objects.select_related("producto").order_by("-id")
     serializer_class = ProductoPrecioWriteSerializer
 
 
-class DatosAdicionalesProductoViewSet(DebugValidationMixin, viewsets.ModelViewSet):
+class DatosAdicionalesProductoViewSet(ConditionalGetMixin, CamposDinamicosMixin, DebugValidationMixin, viewsets.ModelViewSet):
     queryset = DatosAdicionalesProducto.objects.select_related("producto").order_by("-id")
     serializer_class = DatosAdicionalesWriteSerializer
 
 
-class InsumoViewSet(viewsets.ModelViewSet):
+class InsumoViewSet(LecturaReplicaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     # Ordenar primero por activos vs inactivos, luego por bajo stock, luego nombre
     queryset = (
         Insumo.objects.select_related("bodega", "proveedor", "tercero")
@@ -687,6 +739,7 @@ class InsumoViewSet(viewsets.ModelViewSet):
         .order_by("-es_activo", "tiene_bajo_stock", "nombre")
     )
     serializer_class = InsumoSerializer
+    etag_modelos = (Bodega, Proveedor, Tercero)
     filterset_class = InsumoFilter
     search_fields = ["nombre", "codigo", "referencia", "observacion"]
     ordering_fields = ["nombre", "cantidad", "costo_unitario", "creado_en", "es_activo"]
@@ -743,7 +796,8 @@ class InsumoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], url_path="movimientos")
     def movimientos(self, request, pk=None):
         """
-        GET /insumos/{codigo}/movimientos/?page=... (paginación la da DRF si la tienes global)
+        GET /insumos/{codigo}/movimientos/?page=...
+        GET /insumos/{codigo}/movimientos/?paginacion=cursor  (keyset sobre -fecha, -id; sin COUNT)
         """
         insumo = self.get_object()
         qs = InsumoMovimiento.objects.select_related("insumo", "tercero", "bodega").filter(insumo=insumo)
@@ -760,11 +814,12 @@ class InsumoViewSet(viewsets.ModelViewSet):
         if bodega_id:
             qs = qs.filter(bodega_id=bodega_id)
 
-        # paginación DRF
-        page = self.paginate_queryset(qs.order_by("-fecha", "-id"))
+        # paginación de kardex (número de página o cursor)
+        paginator = KardexPagination()
+        page = paginator.paginate_queryset(qs.order_by("-fecha", "-id"), request, view=self)
         if page is not None:
             ser = InsumoMovimientoSerializer(page, many=True)
-            return self.get_paginated_response(ser.data)
+            return paginator.get_paginated_response(ser.data)
 
         return Response(InsumoMovimientoSerializer(qs, many=True).data)
 
@@ -831,10 +886,10 @@ class InsumoViewSet(viewsets.ModelViewSet):
         data = inp.validated_data
 
         tipo = data["tipo"]
-        tercero = Tercero.objects.get(id=data["tercero_id"])
+        tercero = catalogo.obtener(Tercero, data["tercero_id"]) or Tercero.objects.get(id=data["tercero_id"])
         bodega = None
         if data.get("bodega_id"):
-            bodega = Bodega.objects.get(id=data["bodega_id"])
+            bodega = catalogo.obtener(Bodega, data["bodega_id"]) or Bodega.objects.get(id=data["bodega_id"])
 
         # ENTRADA/SALIDA/AJUSTE afectan stock
         mov = aplicar_movimiento_insumo(
@@ -852,7 +907,7 @@ class InsumoViewSet(viewsets.ModelViewSet):
 
 
 
-class TallaViewSet(viewsets.ModelViewSet):
+class TallaViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Talla.objects.all().order_by("-es_activo", "nombre")
     serializer_class = TallaSerializer
     lookup_field = "nombre"
@@ -867,20 +922,25 @@ class TallaViewSet(viewsets.ModelViewSet):
     #  Si esa lógica era para otra cosa, me dices y la reubicamos bien.)
 
 
-class ProductoInsumoViewSet(viewsets.ModelViewSet):
+class ProductoInsumoViewSet(ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = ProductoInsumo.objects.select_related("producto", "insumo").all()
     serializer_class = ProductoInsumoSerializer
+    etag_modelos = (Producto, Insumo)
 
-class TrasladoProductoViewSet(viewsets.ReadOnlyModelViewSet):
+class TrasladoProductoViewSet(LecturaReplicaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ReadOnlyModelViewSet):
     """
     Historial de traslados (GET) y endpoint de ejecutar traslado (POST /traslados-producto/ejecutar/)
     """
     queryset = (
         TrasladoProducto.objects
-        .select_related("tercero", "bodega_origen", "bodega_destino", "producto", "talla", "detalle")
+        # tercero/bodegas/talla salen del catálogo en memoria (serializers anidados)
+        .select_related("producto", "producto__datos_adicionales", "detalle")
+        .prefetch_related("producto__precios", "producto__impuestos")
         .order_by("-id")
     )
     serializer_class = TrasladoProductoSerializer
+    etag_modelos = (Bodega, Talla, *MODELOS_PRODUCTO)
+    pagination_class = KardexPagination  # ?paginacion=cursor → keyset sin COUNT
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -894,6 +954,7 @@ class TrasladoProductoViewSet(viewsets.ReadOnlyModelViewSet):
         return qs
 
     @action(detail=False, methods=["post"], url_path="ejecutar-masivo")
+    @tracing.trazar("traslado.masivo")
     @transaction.atomic
     def ejecutar_masivo(self, request):
         """
@@ -908,114 +969,98 @@ class TrasladoProductoViewSet(viewsets.ReadOnlyModelViewSet):
           ]
         }
         """
-        data = request.data
-        tercero_id = data.get("tercero_id")
-        origen_id = data.get("bodega_origen_id")
-        destino_id = data.get("bodega_destino_id")
-        items = data.get("items", [])
-
-        if not items:
-            raise ValidationError({"items": "La lista de items está vacía."})
-
-        if origen_id == destino_id:
-            raise ValidationError({"bodega_destino_id": "Destino debe ser diferente a origen."})
+        # producto/talla de todas las líneas se resuelven por lote (un __in), no uno por item
+        ser = TrasladoMasivoSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        v = ser.validated_data
 
-        tercero = get_object_or_404(Tercero, pk=tercero_id)
-        b_origen = get_object_or_404(Bodega, pk=origen_id)
-        b_destino = get_object_or_404(Bodega, pk=destino_id)
+        tercero = v["tercero"]
+        b_origen = v["bodega_origen"]
+        b_destino = v["bodega_destino"]
 
         ok_count = 0
-        
-        for item in items:
-            sku = item.get("producto_id")
-            talla_id = item.get("talla_id")
-            cantidad_str = item.get("cantidad")
-            
-            try:
-                producto = Producto.objects.get(codigo_sku=sku)
-            except Producto.DoesNotExist:
-                raise ValidationError(f"Producto {sku} no existe.")
-
-            talla = None
-            if talla_id:
-                talla = Talla.objects.get(pk=talla_id)
-
-            cantidad = _d(cantidad_str)
-            if cantidad <= 0:
-                raise ValidationError(f"Cantidad inválida para {sku}.")
-
-            # --- Lógica de traslado (reutilizada de 'ejecutar') ---
-            qs = (
-                NotaEnsambleDetalle.objects
-                .select_related("nota", "nota__bodega", "bodega_actual")
-                .annotate(bodega_efectiva=Coalesce("bodega_actual_id", "nota__bodega_id"))
-                .filter(producto=producto)
-                .filter(bodega_efectiva=b_origen.id)
-                .order_by("nota__fecha_elaboracion", "id")
-            )
+        tracing.anotar(items=len(v["items"]))
+
+        for item in v["items"]:
+            producto = item["producto"]
+            talla = item.get("talla")
+            cantidad = _d(item["cantidad"])
+            with tracing.span("traslado.item", producto=producto.pk, talla=talla.nombre if talla else "", cantidad=str(cantidad)):
+                # --- Lógica de traslado (reutilizada de 'ejecutar') ---
+                qs = (
+                    NotaEnsambleDetalle.objects
+                    .select_related("nota", "nota__bodega", "bodega_actual")
+                    .annotate(bodega_efectiva=Coalesce("bodega_actual_id", "nota__bodega_id"))
+                    .filter(producto=producto)
+                    .filter(bodega_efectiva=b_origen.id)
+                    .order_by("nota__fecha_elaboracion", "id")
+                )
 
-            if talla is None:
-                qs = qs.filter(talla__isnull=True)
-            else:
-                qs = qs.filter(talla=talla)
+                if talla is None:
+                    qs = qs.filter(talla__isnull=True)
+                else:
+                    qs = qs.filter(talla=talla)
             
-            # Bloquear filas para evitar race conditions
-            qs = qs.select_for_update()
-
-            disponible_total = sum(_d(x.cantidad_disponible) for x in qs)
-            if disponible_total < cantidad:
-                talla_nombre = talla.nombre if talla else "Única"
-                raise ValidationError({
-                    "stock_insuficiente": {
-                        "producto": f"{producto.nombre} ({talla_nombre})",
-                        "disponible": str(disponible_total),
-                        "requerido": str(cantidad),
-                        "faltante": str(cantidad - disponible_total),
-                    }
-                })
-
-            restante = cantidad
-            for det in qs:
-                if restante <= 0: 
-                    break
+                # Bloquear filas para evitar race conditions
+                metricas.bloqueo_stock(NotaEnsambleDetalle)
+                qs = qs.select_for_update()
+
+                disponible_total = sum(_d(x.cantidad_disponible) for x in qs)
+                if disponible_total < cantidad:
+                    talla_nombre = talla.nombre if talla else "Única"
+                    raise ValidationError({
+                        "stock_insuficiente": {
+                            "producto": f"{producto.nombre} ({talla_nombre})",
+                            "disponible": str(disponible_total),
+                            "requerido": str(cantidad),
+                            "faltante": str(cantidad - disponible_total),
+                        }
+                    })
+
+                restante = cantidad
+                for det in qs:
+                    if restante <= 0: 
+                        break
                 
-                disponible_det = _d(det.cantidad_disponible)
-                mover = min(disponible_det, restante)
-                if mover <= 0:
-                    continue
+                    disponible_det = _d(det.cantidad_disponible)
+                    mover = min(disponible_det, restante)
+                    if mover <= 0:
+                        continue
                 
-                # 1. Restar origen
-                det.cantidad_disponible = disponible_det - mover
-                det.save(update_fields=["cantidad_disponible"])
-
-                # 2. Sumar destino
-                dest_det, _created = NotaEnsambleDetalle.objects.get_or_create(
-                    nota=det.nota,
-                    producto=det.producto,
-                    talla=det.talla,
-                    bodega_actual=b_destino,
-                    defaults={"cantidad": Decimal("0"), "cantidad_disponible": Decimal("0")}
-                )
-                dest_det.cantidad_disponible = _d(dest_det.cantidad_disponible) + mover
-                dest_det.save(update_fields=["cantidad_disponible"])
-
-                # 3. Historial
-                TrasladoProducto.objects.create(
-                    tercero=tercero,
-                    bodega_origen=b_origen,
-                    bodega_destino=b_destino,
-                    producto=producto,
-                    talla=talla,
-                    cantidad=mover,
-                    detalle=det
-                )
-                restante -= mover
-            
+                    # 1. Restar origen
+                    det.cantidad_disponible = disponible_det - mover
+                    det.save(update_fields=["cantidad_disponible"])
+
+                    # 2. Sumar destino
+                    dest_det, _created = NotaEnsambleDetalle.objects.get_or_create(
+                        nota=det.nota,
+                        producto=det.producto,
+                        talla=det.talla,
+                        bodega_actual=b_destino,
+                        defaults={"cantidad": Decimal("0"), "cantidad_disponible": Decimal("0")}
+                    )
+                    dest_det.cantidad_disponible = _d(dest_det.cantidad_disponible) + mover
+                    dest_det.save(update_fields=["cantidad_disponible"])
+
+                    # 3. Historial
+                    TrasladoProducto.objects.create(
+                        tercero=tercero,
+                        bodega_origen=b_origen,
+                        bodega_destino=b_destino,
+                        producto=producto,
+                        talla=talla,
+                        cantidad=mover,
+                        detalle=det
+                    )
+                    tracing.sumar("capas")
+                    restante -= mover
+
             ok_count += 1
 
         return Response({"ok": True, "items_movidos": ok_count}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"], url_path="ejecutar")
+    @tracing.trazar("traslado.ejecutar")
     @transaction.atomic
     def ejecutar(self, request):
         """
@@ -1039,6 +1084,7 @@ class TrasladoProductoViewSet(viewsets.ReadOnlyModelViewSet):
         producto = v["producto"]
         talla = v.get("talla", None)
         cantidad = _d(v["cantidad"])
+        tracing.anotar(producto=producto.pk, talla=talla.nombre if talla else "", cantidad=str(cantidad))
 
         if b_origen.id == b_destino.id:
             raise ValidationError({"bodega_destino_id": "La bodega destino debe ser diferente a la bodega origen."})
@@ -1111,29 +1157,27 @@ class TrasladoProductoViewSet(viewsets.ReadOnlyModelViewSet):
                 cantidad=mover,
                 detalle=det
             )
+            tracing.sumar("capas")
 
             restante -= mover
 
 
         return Response({"ok": True, "cantidad_movida": str(cantidad)}, status=status.HTTP_200_OK)
 
-class NotaSalidaProductoViewSet(viewsets.ModelViewSet):
+class NotaSalidaProductoViewSet(LecturaReplicaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = NotaSalidaProducto.objects.all()
     serializer_class = NotaSalidaProductoSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    etag_modelos = (NotaSalidaProductoDetalle, NotaSalidaAfectacionStock, Producto, Bodega, Tercero)
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_class = NotaSalidaProductoFilter
     search_fields = ["numero", "observacion", "detalles__producto__nombre", "detalles__producto__codigo_sku"]
     ordering_fields = ["id", "fecha", "creado_en"]
+    pagination_class = KardexPagination  # ?paginacion=cursor → keyset sin COUNT
 
     def get_queryset(self):
-        qs = NotaSalidaProducto.objects.annotate(
-            total_cantidad=Coalesce(Sum("detalles__cantidad"), Value(0, output_field=DecimalField())),
-            total_valor=Coalesce(Sum(F("detalles__cantidad") * F("detalles__costo_unitario")), Value(0, output_field=DecimalField())),
-            items_count=Count("detalles", distinct=True)
-        ).select_related("bodega", "tercero").order_by("-id")
-
-        if self.action == "list":
-            qs = qs.prefetch_related("detalles__producto")
+        # ✅ total_cantidad, total_valor, items_count y productos_resumen están guardados
+        # en la salida (InventoryService.actualizar_totales_salida)
+        qs = NotaSalidaProducto.objects.select_related("bodega", "tercero").order_by("-id")
 
         if self.action == "retrieve":
             qs = qs.prefetch_related(
@@ -1172,7 +1216,7 @@ class NotaSalidaProductoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], url_path="pdf")
     def pdf(self, request, pk=None):
         salida = get_object_or_404(
-            NotaSalidaProducto.objects.prefetch_related("detalles", "detalles__afectaciones"),
+            NotaSalidaProducto.objects.select_related("bodega", "tercero").prefetch_related("detalles__producto"),
             pk=pk
         )
 
@@ -1252,13 +1296,15 @@ class NotaSalidaProductoViewSet(viewsets.ModelViewSet):
         c.save()
         return response
 
-class InsumoMovimientoViewSet(viewsets.ReadOnlyModelViewSet):
+class InsumoMovimientoViewSet(LecturaReplicaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ReadOnlyModelViewSet):
     """
     Kardex global:
     GET /insumo-movimientos/?insumo=INS-001&tipo=ENTRADA&tercero_id=1&bodega_id=2
     """
     queryset = InsumoMovimiento.objects.select_related("insumo", "tercero", "bodega").all()
     serializer_class = InsumoMovimientoSerializer
+    etag_modelos = (Insumo, Tercero, Bodega)
+    pagination_class = KardexPagination  # ?paginacion=cursor → keyset (-fecha, -id) sin COUNT
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -1281,7 +1327,15 @@ class InsumoMovimientoViewSet(viewsets.ReadOnlyModelViewSet):
 
         return qs.order_by("-fecha", "-id")
 
-class ExcelImportViewSet(viewsets.ViewSet):
+def _kardex_fila(fila):
+    """Fila de values_list → celdas (fecha local sin tz para Excel)."""
+    fecha = fila[0]
+    if fecha is not None and timezone.is_aware(fecha):
+        fecha = timezone.localtime(fecha).replace(tzinfo=None)
+    return [fecha, *fila[1:]]
+
+
+class ExcelImportViewSet(LecturaReplicaMixin, viewsets.ViewSet):
     """
     Endpoints:
       GET  /api/excel/plantilla-insumos/
@@ -1290,7 +1344,13 @@ class ExcelImportViewSet(viewsets.ViewSet):
       POST /api/excel/importar-terminado/       (multipart: file)
 
       GET  /api/excel/kardex-terminado/?sku=...&bodega_id=...&tercero_id=...
+      GET  /api/excel/kardex-terminado/exportar/?formato=csv|xlsx  (mismos filtros)
+
+    El kardex y su exportación leen de la réplica (inventario/replica.py).
     """
+    replica_acciones = ("kardex_terminado",)
+    replica_acciones_atraso = ("kardex_terminado_exportar",)
+    replica_modelos = (ProductoTerminadoMovimiento,)
 
     @action(detail=False, methods=["get"], url_path="plantilla-insumos", renderer_classes=[XLSXRenderer])
     def plantilla_insumos(self, request):
@@ -1380,6 +1440,7 @@ class ExcelImportViewSet(viewsets.ViewSet):
         return response
 
     @action(detail=False, methods=["post"], url_path="importar-insumos")
+    @tracing.trazar("importar.insumos")
     @transaction.atomic
     def importar_insumos(self, request):
         file = request.FILES.get("file")
@@ -1399,19 +1460,21 @@ class ExcelImportViewSet(viewsets.ViewSet):
         if head[:2] != b"PK":
             raise ValidationError({"file": "El archivo no es un Excel válido (.xlsx)."})
 
-        try:
-            wb = load_workbook(filename=file, data_only=True)
-        except Exception as e:
-            raise ValidationError({"file": f"No se pudo leer el Excel: {str(e)}"})
+        with tracing.span("excel.leer", bytes=file.size) as span:
+            try:
+                wb = load_workbook(filename=file, data_only=True)
+            except Exception as e:
+                raise ValidationError({"file": f"No se pudo leer el Excel: {str(e)}"})
 
-        # Hoja activa
-        ws = wb.active
-        for sheet in wb.sheetnames:
-            if "Insumos" in sheet or "Inventario" in sheet:
-                ws = wb[sheet]
-                break
+            # Hoja activa
+            ws = wb.active
+            for sheet in wb.sheetnames:
+                if "Insumos" in sheet or "Inventario" in sheet:
+                    ws = wb[sheet]
+                    break
 
-        rows = list(ws.iter_rows(values_only=True))
+            rows = list(ws.iter_rows(values_only=True))
+            span.set_attribute("filas", len(rows))
         if not rows:
             raise ValidationError("El Excel está vacío.")
 
@@ -1478,23 +1541,26 @@ class ExcelImportViewSet(viewsets.ViewSet):
         movimientos_creados = []
 
         # Caches para evitar DB hits masivos
-        cache_bodegas = {b.nombre.lower(): b for b in Bodega.objects.all()} # nombre_lower -> obj
-        cache_bodegas_id = {str(b.id): b for b in cache_bodegas.values()}   # str(id) -> obj
-        cache_bodegas_cod = {b.codigo.lower(): b for b in cache_bodegas.values() if b.codigo} # codigo_lower -> obj
+        # (vienen del catálogo en memoria: sin consultas si el proceso ya lo tiene cargado)
+        bodegas = catalogo.todos(Bodega)
+        cache_bodegas = {b.nombre.lower(): b for b in bodegas} # nombre_lower -> obj
+        cache_bodegas_id = {str(b.id): b for b in bodegas}   # str(id) -> obj
+        cache_bodegas_cod = {b.codigo.lower(): b for b in bodegas if b.codigo} # codigo_lower -> obj
         
-        cache_terceros = {t.nombre.lower(): t for t in Tercero.objects.all()}
-        cache_terceros_id = {str(t.id): t for t in cache_terceros.values()}
-        cache_terceros_cod = {t.codigo.lower(): t for t in cache_terceros.values() if t.codigo}
+        terceros = catalogo.todos(Tercero)
+        cache_terceros = {t.nombre.lower(): t for t in terceros}
+        cache_terceros_id = {str(t.id): t for t in terceros}
+        cache_terceros_cod = {t.codigo.lower(): t for t in terceros if t.codigo}
         
-        cache_proveedores = {p.nombre.upper(): p for p in Proveedor.objects.all()}
+        cache_proveedores = {p.nombre.upper(): p for p in catalogo.todos(Proveedor)}
 
         default_bodega_obj = None
         if default_bodega_id:
-             default_bodega_obj = Bodega.objects.filter(pk=default_bodega_id).first()
+             default_bodega_obj = cache_bodegas_id.get(str(default_bodega_id))
 
         default_tercero_obj = None
         if default_tercero_id:
-             default_tercero_obj = Tercero.objects.filter(pk=default_tercero_id).first()
+             default_tercero_obj = cache_terceros_id.get(str(default_tercero_id))
 
         # Iterar desde la fila siguiente al header
         for i, r in enumerate(rows[header_row_idx+1:], start=header_row_idx+2):
@@ -1660,6 +1726,8 @@ class ExcelImportViewSet(viewsets.ViewSet):
                 
                 errores.append({"fila": i, "error": msg})
 
+        metricas.filas_importadas("insumos", ok, len(errores))
+        tracing.anotar(filas_ok=ok, filas_error=len(errores))
         return Response(
             {
                 "ok": True,
@@ -1695,18 +1763,21 @@ class ExcelImportViewSet(viewsets.ViewSet):
         return resp
 
     @action(detail=False, methods=["post"], url_path="importar-terminado")
+    @tracing.trazar("importar.terminado")
     def importar_terminado(self, request):
         file = request.FILES.get("file")
         if not file:
             raise ValidationError({"file": "Debe enviar un archivo .xlsx en multipart/form-data con key 'file'."})
 
-        try:
-            wb = load_workbook(filename=file, data_only=True)
-        except Exception as e:
-            raise ValidationError({"file": f"No se pudo leer el Excel: {str(e)}"})
+        with tracing.span("excel.leer", bytes=file.size) as span:
+            try:
+                wb = load_workbook(filename=file, data_only=True)
+            except Exception as e:
+                raise ValidationError({"file": f"No se pudo leer el Excel: {str(e)}"})
 
-        ws = wb["ProductoTerminado"] if "ProductoTerminado" in wb.sheetnames else wb.active
-        rows = list(ws.iter_rows(values_only=True))
+            ws = wb["ProductoTerminado"] if "ProductoTerminado" in wb.sheetnames else wb.active
+            rows = list(ws.iter_rows(values_only=True))
+            span.set_attribute("filas", len(rows))
         if not rows:
             raise ValidationError({"file": "El Excel está vacío."})
 
@@ -1732,8 +1803,8 @@ class ExcelImportViewSet(viewsets.ViewSet):
 
                     fecha = _parse_date(r[idx["fecha"]], "fecha") or timezone.now().date()
 
-                    bodega = Bodega.objects.get(id=int(r[idx["bodega_id"]]))
-                    tercero = Tercero.objects.get(id=int(r[idx["tercero_id"]]))
+                    bodega = catalogo.obtener(Bodega, r[idx["bodega_id"]]) or Bodega.objects.get(id=int(r[idx["bodega_id"]]))
+                    tercero = catalogo.obtener(Tercero, r[idx["tercero_id"]]) or Tercero.objects.get(id=int(r[idx["tercero_id"]]))
 
                     obs = str(r[idx["observacion"]] or "").strip() if "observacion" in idx else ""
                     producto_sku = str(r[idx["producto_sku"]]).strip()
@@ -1750,7 +1821,7 @@ class ExcelImportViewSet(viewsets.ViewSet):
 
                     talla_obj = None
                     if talla_txt:
-                        talla_obj = Talla.objects.filter(nombre=talla_txt).first()
+                        talla_obj = catalogo.por_campo(Talla, "nombre", talla_txt)
                         if not talla_obj:
                             raise ValidationError({"talla": f"La talla '{talla_txt}' no existe. Créala antes o deja vacío."})
 
@@ -1818,6 +1889,12 @@ class ExcelImportViewSet(viewsets.ViewSet):
             except Exception as e:
                 errores.append({"fila": i, "error": str(e)})
 
+        # Totales guardados de las notas creadas/actualizadas por la importación
+        for nota in NotaEnsamble.objects.filter(id__in=set(notas_cache.values())):
+            InventoryService.actualizar_totales_nota(nota)
+
+        metricas.filas_importadas("terminado", ok, len(errores))
+        tracing.anotar(filas_ok=ok, filas_error=len(errores))
         return Response(
             {
                 "ok": True,
@@ -1829,13 +1906,12 @@ class ExcelImportViewSet(viewsets.ViewSet):
             status=status.HTTP_200_OK
         )
 
-    @action(detail=False, methods=["get"], url_path="kardex-terminado")
-    def kardex_terminado(self, request):
-        qs = ProductoTerminadoMovimiento.objects.select_related("producto", "talla", "tercero", "bodega", "nota_ensamble").all()
+    def _kardex_terminado_qs(self, request):
+        qs = ProductoTerminadoMovimiento.objects.all()
 
         sku = (request.query_params.get("sku") or "").strip()
         if sku:
-            qs = qs.filter(producto__codigo_sku=sku)
+            qs = qs.filter(producto_id=sku)
 
         bodega_id = request.query_params.get("bodega_id")
         if bodega_id and str(bodega_id).isdigit():
@@ -1845,9 +1921,92 @@ class ExcelImportViewSet(viewsets.ViewSet):
         if tercero_id and str(tercero_id).isdigit():
             qs = qs.filter(tercero_id=int(tercero_id))
 
-        qs = qs.order_by("-fecha", "-id")[:200]  # límite seguro
+        # ✅ (-fecha, -id): lo sirven los índices (producto, -fecha) / (bodega, -fecha) / (tercero, -fecha)
+        return qs.order_by("-fecha", "-id")
+
+    @action(detail=False, methods=["get"], url_path="kardex-terminado")
+    def kardex_terminado(self, request):
+        """
+        GET /api/excel/kardex-terminado/?sku=...&bodega_id=...&tercero_id=...&page_size=...
+        Paginación keyset sobre (-fecha, -id): {next, previous, results}. Se sigue el link "next".
+        """
+        qs = self._kardex_terminado_qs(request).select_related("producto", "talla", "tercero", "bodega")
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(ProductoTerminadoMovimientoSerializer(page, many=True).data)
+
+    KARDEX_TERMINADO_COLUMNAS = [
+        ("Fecha", "fecha"),
+        ("Tipo", "tipo"),
+        ("SKU", "producto_id"),
+        ("Producto", "producto__nombre"),
+        ("Talla", "talla__nombre"),
+        ("Bodega", "bodega__nombre"),
+        ("Tercero", "tercero__nombre"),
+        ("Cantidad", "cantidad"),
+        ("Costo Unitario", "costo_unitario"),
+        ("Total", "total"),
+        ("Saldo Global", "saldo_global_resultante"),
+        ("Nota Ensamble", "nota_ensamble_id"),
+        ("Observación", "observacion"),
+    ]
+
+    @action(detail=False, methods=["get"], url_path="kardex-terminado/exportar")
+    def kardex_terminado_exportar(self, request):
+        """
+        GET /api/excel/kardex-terminado/exportar/?formato=csv|xlsx&sku=...&bodega_id=...&tercero_id=...
+        Kardex completo (mismos filtros). Se recorre con .iterator(): cursor del lado del
+        servidor en PostgreSQL, lotes de chunk_size en SQLite; nunca se carga entero en memoria.
+        """
+        formato = (request.query_params.get("formato") or "csv").lower()
+        if formato not in ("csv", "xlsx"):
+            return Response({"detail": "formato debe ser 'csv' o 'xlsx'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        headers = [h for h, _ in self.KARDEX_TERMINADO_COLUMNAS]
+        filas = (
+            self._kardex_terminado_qs(request)
+            # el CSV se recorre después de dispatch, ya fuera de leyendo_replica()
+            .using(alias_lectura())
+            .values_list(*[c for _, c in self.KARDEX_TERMINADO_COLUMNAS])
+            .iterator(chunk_size=2000)
+        )
+        stamp = timezone.localtime().strftime("%Y%m%d_%H%M")
+
+        if formato == "csv":
+            class _Echo:
+                def write(self, value):
+                    return value
 
-        return Response(ProductoTerminadoMovimientoSerializer(qs, many=True).data)
+            writer = csv.writer(_Echo())
+
+            def generar():
+                yield "\ufeff"  # BOM: Excel abre bien las tildes
+                yield writer.writerow(headers)
+                for fila in filas:
+                    yield writer.writerow(_kardex_fila(fila))
+
+            response = StreamingHttpResponse(generar(), content_type="text/csv; charset=utf-8")
+            response["Content-Disposition"] = f'attachment; filename="kardex_terminado_{stamp}.csv"'
+            return response
+
+        # xlsx es un zip: no se puede emitir por trozos, pero con write_only las filas
+        # van directo a disco (archivo temporal) y la memoria queda acotada.
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("KardexTerminado")
+        ws.append(headers)
+        for fila in filas:
+            ws.append(_kardex_fila(fila))
+
+        tmp = tempfile.TemporaryFile()
+        wb.save(tmp)
+        tmp.seek(0)
+        return FileResponse(
+            tmp,
+            as_attachment=True,
+            filename=f"kardex_terminado_{stamp}.xlsx",
+            content_type=XLSXRenderer.media_type,
+        )
 
     # =========================================================================
     #  CATÁLOGOS: PROVEEDORES
@@ -1944,17 +2103,20 @@ class ExcelImportViewSet(viewsets.ViewSet):
         wb.save(buf)
         return Response(buf.getvalue(), headers={'Content-Disposition': f'attachment; filename="{filename}"'}, content_type=XLSXRenderer.media_type)
 
+    @tracing.trazar("importar.catalogo")
     def _import_catalogo_generic(self, request, model, key_field, expected_keys, aliases={}, normalize_upper=True, update_fields=[]):
         file = request.FILES.get("file")
         if not file: raise ValidationError({"file": "No se envió archivo."})
 
-        try:
-            wb = load_workbook(filename=file, data_only=True)
-        except Exception as e:
-            raise ValidationError({"file": f"Error leyendo Excel: {e}"})
-        
-        ws = wb.active 
-        rows = list(ws.iter_rows(values_only=True))
+        with tracing.span("excel.leer", bytes=file.size) as span:
+            try:
+                wb = load_workbook(filename=file, data_only=True)
+            except Exception as e:
+                raise ValidationError({"file": f"Error leyendo Excel: {e}"})
+
+            ws = wb.active
+            rows = list(ws.iter_rows(values_only=True))
+            span.set_attribute("filas", len(rows))
         if not rows: raise ValidationError("Excel vacío.")
         
         # Header smart detection
@@ -2022,6 +2184,8 @@ class ExcelImportViewSet(viewsets.ViewSet):
             except Exception as e:
                 errores.append({"fila": i, "error": str(e)})
 
+        metricas.filas_importadas(model._meta.model_name, ok, len(errores))
+        tracing.anotar(filas_ok=ok, filas_error=len(errores))
         return Response({
             "ok": True,
             "procesadas_ok": ok,